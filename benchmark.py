@@ -0,0 +1,527 @@
+"""
+Benchmark pipeline SAW dan endpoint utama tanpa Supabase sungguhan.
+
+Pemakaian:
+    python benchmark.py kernel [--ukuran 100 1000 10000 100000 1000000]
+    python benchmark.py api [--pendaftar 1000] [--permintaan 200] [--konkurensi 10]
+    python benchmark.py semua --json hasil.json [--bandingkan hasil_lama.json]
+
+`kernel` mengukur tiap tahap SAW (matriks keputusan, normalisasi, skor, peringkat, top-K)
+pada data sintetis. `api` menjalankan aplikasi FastAPI di dalam proses dengan
+`SupabaseStub` sebagai pengganti client Supabase, lalu mengukur latensi p50/p95/p99
+`/beasiswa/rank`, `/siswa/all`, dan `/beasiswa/daftar/submit`.
+Dengan `--bandingkan`, metrik yang lebih lambat dari hasil lama melebihi `--toleransi`
+dilaporkan dan proses keluar dengan kode 1.
+"""
+import os
+import io
+import sys
+import copy
+import json
+import time
+import types
+import asyncio
+import argparse
+import resource
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# main.py dan calculate_saw.py membuat client Supabase saat diimpor; client tersebut
+# langsung diganti SupabaseStub sehingga nilai ini tidak pernah dipakai untuk koneksi.
+os.environ.setdefault("SUPABASE_API_URL_DSS", "http://localhost")
+os.environ.setdefault("SUPABASE_API_KEY_DSS", "eyJhbGciOiJIUzI1NiJ9.e30.benchmark")
+
+import calculate_saw
+from calculate_saw import (
+    ATURAN_KRITERIA, matriks_keputusan, normalisasi, hitung_saw,
+    PeringkatInkremental, HasilPeringkat
+)
+
+UKURAN_BAWAAN = [100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+# ===========================================================================
+# Data sintetis
+# ===========================================================================
+def buat_kriteria() -> List[dict]:
+    """Baris `kriteria_saw` sesuai kriteria C1-C5 pada aturan_kriteria.json."""
+    jenis = {"C1": "cost", "C2": "cost", "C3": "benefit", "C4": "cost", "C5": "benefit"}
+    bobot = {"C1": 0.3, "C2": 0.2, "C3": 0.2, "C4": 0.15, "C5": 0.15}
+    return [
+        {"id_kriteria": i, "kode_kriteria": kode, "nama_kriteria": kode, "jenis": jenis.get(kode, "benefit"),
+         "bobot": bobot.get(kode, 0.1), "normalize_bobot": bobot.get(kode, 0.1)}
+        for i, kode in enumerate(ATURAN_KRITERIA, start=1)
+    ]
+
+
+def buat_nilai_mentah(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Atribut mentah `pendaftaran` sebagai kolom numpy, agar 1 juta baris tetap murah dibuat."""
+    rng = np.random.default_rng(seed)
+    return {
+        "penghasilan_orangtua": rng.integers(0, 6_000_000, n),
+        "jumlah_tanggungan": rng.integers(0, 9, n),
+        "luas_rumah": rng.integers(15, 300, n),
+        "peringkat_kelas": rng.integers(1, 37, n),
+        "rerata_nilai": rng.integers(40, 101, n),
+    }
+
+
+def buat_tabel(n: int, seed: int = 0, id_periode: int = 1) -> Dict[str, List[dict]]:
+    """Isi tabel untuk SupabaseStub: `n` siswa, masing-masing dengan satu pendaftaran."""
+    rng = np.random.default_rng(seed)
+    mentah = buat_nilai_mentah(n, seed)
+    status_validasi = rng.choice(["valid", "valid", "valid", "belum divalidasi"], n)
+    kelas = [{"id_kelas": i, "nama_kelas": f"XII-{i}"} for i in range(1, 13)]
+    siswa = [
+        {"id_siswa": i, "id_kelas": 1 + i % len(kelas), "nis": f"{i:06d}", "nisn": f"{i:010d}",
+         "nik": f"{i:016d}", "nama_siswa": f"Siswa {i}", "tanggal_lahir": "2008-01-01",
+         "alamat_email": f"siswa{i}@contoh.sch.id", "no_telepon": "080000000000"}
+        for i in range(1, n + 1)
+    ]
+    pendaftaran = [
+        {"id_pendaftaran": i, "id_siswa": i, "id_periode": id_periode, "status_validasi": str(status_validasi[i - 1]),
+         **{kolom: int(nilai[i - 1]) for kolom, nilai in mentah.items()},
+         "file_keterangan_penghasilan": None, "file_kartu_keluarga": "kk.pdf", "file_pbb": None, "file_rapor": None}
+        for i in range(1, n + 1)
+    ]
+    return {
+        "kriteria_saw": buat_kriteria(),
+        "kelas": kelas,
+        "siswa": siswa,
+        "pendaftaran": pendaftaran,
+        "hasil_saw": [],
+        "periode_beasiswa": [{"id_periode": id_periode, "is_publish": False, "kuota": None}],
+    }
+
+
+# ===========================================================================
+# Stub client Supabase
+# ===========================================================================
+# (tabel asal, relasi) -> (tabel relasi, kolom di asal, kolom di relasi, banyak baris?)
+RELASI = {
+    ("pendaftaran", "siswa"): ("siswa", "id_siswa", "id_siswa", False),
+    ("siswa", "kelas"): ("kelas", "id_kelas", "id_kelas", False),
+    ("siswa", "pendaftaran"): ("pendaftaran", "id_siswa", "id_siswa", True),
+    ("hasil_saw", "pendaftaran"): ("pendaftaran", "id_pendaftaran", "id_pendaftaran", False),
+}
+KOLOM_ID = {"siswa": "id_siswa", "pendaftaran": "id_pendaftaran", "kelas": "id_kelas", "hasil_saw": "id_hasil"}
+
+
+def parse_select(teks: str) -> List[tuple]:
+    """Memecah select PostgREST menjadi daftar `(nama, join, anak)`; anak None untuk kolom biasa."""
+    hasil, i = [], 0
+    while i < len(teks):
+        j = i
+        while j < len(teks) and teks[j] not in ",(":
+            j += 1
+        nama = teks[i:j].strip()
+        if j < len(teks) and teks[j] == "(":
+            kedalaman, k = 1, j + 1
+            while kedalaman:
+                kedalaman += {"(": 1, ")": -1}.get(teks[k], 0)
+                k += 1
+            relasi, _, join = nama.partition("!")
+            hasil.append((relasi, join or "left", parse_select(teks[j + 1:k - 1])))
+            j = k
+        elif nama:
+            hasil.append((nama, None, None))
+        i = j + 1
+    return hasil
+
+
+class QueryStub:
+    def __init__(self, stub: "SupabaseStub", tabel: str):
+        self.stub, self.tabel = stub, tabel
+        self.filter: List[Callable[[dict], bool]] = []
+        self.filter_relasi: List[tuple] = []
+        self.select_ = "*"
+        self.op, self.payload = "select", None
+        self.urut, self.batas, self.tunggal = None, None, False
+
+    def select(self, kolom: str = "*", **kwargs):
+        self.select_ = kolom
+        return self
+
+    def eq(self, kolom, nilai):
+        return self._saring(kolom, lambda v: v == nilai)
+
+    def in_(self, kolom, nilai):
+        nilai = set(nilai)
+        return self._saring(kolom, lambda v: v in nilai)
+
+    def gt(self, kolom, nilai):
+        return self._saring(kolom, lambda v: v is not None and v > nilai)
+
+    def lt(self, kolom, nilai):
+        return self._saring(kolom, lambda v: v is not None and v < nilai)
+
+    def _saring(self, kolom, cocok):
+        if "." in kolom:
+            relasi, kolom = kolom.split(".", 1)
+            self.filter_relasi.append((relasi, kolom, cocok))
+        else:
+            self.filter.append(lambda row: cocok(row.get(kolom)))
+        return self
+
+    def order(self, kolom, desc=False):
+        self.urut = (kolom, desc)
+        return self
+
+    def limit(self, n):
+        self.batas = n
+        return self
+
+    def maybe_single(self):
+        self.tunggal = True
+        return self
+
+    def insert(self, data):
+        self.op, self.payload = "insert", data
+        return self
+
+    def upsert(self, data, **kwargs):
+        self.op, self.payload = "upsert", data
+        return self
+
+    def update(self, data):
+        self.op, self.payload = "update", data
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def execute(self):
+        self.stub.tunda()
+        rows = self.stub.tables.setdefault(self.tabel, [])
+        cocok = [row for row in rows if all(f(row) for f in self.filter)]
+
+        if self.op == "select":
+            if self.urut:
+                cocok.sort(key=lambda row: row[self.urut[0]], reverse=self.urut[1])
+            bagian = parse_select(self.select_)
+            inner = [nama for nama, join, anak in bagian if anak is not None and join == "inner"]
+            data = []
+            # Proyeksi (embed relasi) hanya untuk baris yang lolos sampai batas limit
+            for row in cocok:
+                row = self.stub.proyeksi(self.tabel, row, bagian)
+                for relasi, kolom, f in self.filter_relasi:
+                    row[relasi] = [anak for anak in row.get(relasi) or [] if f(anak.get(kolom))]
+                if all(row.get(relasi) for relasi in inner):
+                    data.append(row)
+                if self.batas is not None and len(data) >= self.batas:
+                    break
+            if self.tunggal:
+                data = data[0] if data else None
+            return types.SimpleNamespace(data=data)
+
+        if self.op in ("insert", "upsert"):
+            baru = [dict(row) for row in (self.payload if isinstance(self.payload, list) else [self.payload])]
+            kolom_id = KOLOM_ID.get(self.tabel)
+            for row in baru:
+                if kolom_id and row.get(kolom_id) is None:
+                    row[kolom_id] = self.stub.id_berikutnya(self.tabel, kolom_id)
+            rows.extend(baru)
+            return types.SimpleNamespace(data=copy.deepcopy(baru))
+
+        if self.op == "update":
+            for row in cocok:
+                row.update(self.payload)
+            return types.SimpleNamespace(data=copy.deepcopy(cocok))
+
+        dihapus = {id(row) for row in cocok}
+        self.stub.tables[self.tabel] = [row for row in rows if id(row) not in dihapus]
+        return types.SimpleNamespace(data=copy.deepcopy(cocok))
+
+
+class BucketStub:
+    def __init__(self, stub: "SupabaseStub"):
+        self.stub = stub
+
+    def upload(self, path, file, file_options=None):
+        self.stub.tunda()
+        data = file if isinstance(file, bytes) else file.read()
+        self.stub.objek[path] = len(data)
+
+    def remove(self, paths):
+        for path in paths:
+            self.stub.objek.pop(path, None)
+
+    def get_public_url(self, path):
+        return f"http://localhost/storage/{path}"
+
+
+class SupabaseStub:
+    """
+    Pengganti client Supabase di memori untuk query builder yang dipakai aplikasi:
+    select dengan embed relasi (`siswa(...)`, `pendaftaran!inner(...)`), filter, order,
+    limit, insert/update/upsert/delete, storage, dan rpc. `latensi` (detik) meniru round trip.
+    """
+
+    def __init__(self, tables: Dict[str, List[dict]], latensi: float = 0.0):
+        self.tables = tables
+        self.latensi = latensi
+        self.objek: Dict[str, int] = {}
+        self.storage = types.SimpleNamespace(from_=lambda bucket: BucketStub(self))
+        self._indeks: Dict[tuple, Dict] = {}
+
+    def tunda(self):
+        if self.latensi:
+            time.sleep(self.latensi)
+
+    def table(self, nama: str) -> QueryStub:
+        return QueryStub(self, nama)
+
+    def rpc(self, nama: str, params: Optional[dict] = None):
+        return types.SimpleNamespace(execute=lambda: types.SimpleNamespace(data=[]))
+
+    def id_berikutnya(self, tabel: str, kolom: str) -> int:
+        return max((row.get(kolom) or 0 for row in self.tables.get(tabel, [])), default=0) + 1
+
+    def _cari(self, tabel: str, kolom: str, nilai, banyak: bool):
+        # Indeks dibangun ulang saat jumlah baris berubah (insert/delete)
+        rows = self.tables.get(tabel, [])
+        kunci = (tabel, kolom)
+        indeks = self._indeks.get(kunci)
+        if indeks is None or indeks[0] != len(rows):
+            peta: Dict = {}
+            for row in rows:
+                peta.setdefault(row.get(kolom), []).append(row)
+            indeks = self._indeks[kunci] = (len(rows), peta)
+        hasil = indeks[1].get(nilai, [])
+        return hasil if banyak else (hasil[0] if hasil else None)
+
+    def proyeksi(self, tabel: str, row: dict, bagian: List[tuple]) -> dict:
+        hasil = {}
+        for nama, join, anak in bagian:
+            if anak is None:
+                if nama == "*":
+                    hasil.update(row)
+                else:
+                    hasil[nama] = row.get(nama)
+                continue
+            relasi = RELASI.get((tabel, nama))
+            if relasi is None:
+                raise ValueError(f"Relasi {tabel} -> {nama} tidak dikenal oleh stub.")
+            tabel_relasi, kolom_asal, kolom_relasi, banyak = relasi
+            terkait = self._cari(tabel_relasi, kolom_relasi, row.get(kolom_asal), banyak)
+            if banyak:
+                hasil[nama] = [self.proyeksi(tabel_relasi, r, anak) for r in terkait]
+            else:
+                hasil[nama] = self.proyeksi(tabel_relasi, terkait, anak) if terkait else None
+        return hasil
+
+
+# ===========================================================================
+# Pengukuran
+# ===========================================================================
+def ukur(fn: Callable, ulang: int) -> float:
+    """Median waktu (ms) dari `ulang` kali eksekusi."""
+    waktu = []
+    for _ in range(ulang):
+        mulai = time.perf_counter()
+        fn()
+        waktu.append((time.perf_counter() - mulai) * 1000)
+    return float(np.median(waktu))
+
+
+def persentil(latensi_ms: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(latensi_ms, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "maks_ms": float(max(latensi_ms))}
+
+
+def rss_maks_mb() -> float:
+    # ru_maxrss dalam KB di Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_kernel(n: int, ulang: int, maks_mesin: int, kuota: int) -> Dict[str, float]:
+    """Waktu tiap tahap SAW untuk `n` pendaftar sintetis, plus puncak memori satu perhitungan penuh."""
+    kriteria = pd.DataFrame(buat_kriteria())
+    kode = list(kriteria["kode_kriteria"])
+    kolom = [ATURAN_KRITERIA[k].kolom for k in kode]
+    data = buat_nilai_mentah(n)
+    mentah = np.column_stack([data[k] for k in kolom]).astype(float)
+    is_benefit = (kriteria["jenis"] == "benefit").to_numpy()
+    bobot = kriteria["normalize_bobot"].to_numpy(dtype=float)
+
+    matriks_x = matriks_keputusan(mentah, kode, ATURAN_KRITERIA)
+    matriks_r = normalisasi(matriks_x, is_benefit, matriks_x.max(axis=0), matriks_x.min(axis=0))
+    skor = (matriks_r * bobot).sum(axis=1)
+
+    hasil = {
+        "matriks_keputusan_ms": ukur(lambda: matriks_keputusan(mentah, kode, ATURAN_KRITERIA), ulang),
+        "normalisasi_ms": ukur(
+            lambda: normalisasi(matriks_x, is_benefit, matriks_x.max(axis=0), matriks_x.min(axis=0)), ulang),
+        "skor_ms": ukur(lambda: (matriks_r * bobot).sum(axis=1), ulang),
+        "peringkat_ms": ukur(lambda: np.argsort(-skor, kind="stable"), ulang),
+        "hitung_saw_ms": ukur(lambda: hitung_saw(mentah, kriteria), ulang),
+    }
+
+    tracemalloc.start()
+    hitung_saw(mentah, kriteria)
+    hasil["memori_puncak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    if n <= maks_mesin:
+        rows = [{"id_pendaftaran": i, "status_validasi": "valid", "nama_siswa": f"Siswa {i}",
+                 **{k: int(v[i]) for k, v in data.items()}} for i in range(n)]
+        mesin = PeringkatInkremental(kriteria)
+        hasil["mesin_bangun_ms"] = ukur(lambda: mesin.muat_ulang(rows), 1)
+        baris = dict(rows[n // 2])
+        hasil["mesin_upsert_ms"] = ukur(lambda: mesin.upsert(baris), max(ulang, 20))
+        # Pemenang diambil dari awal urutan mesin; seluruh peringkat hanya jika diminta
+        hasil["top_k_ms"] = ukur(lambda: HasilPeringkat.dari_mesin(0, mesin, kuota), ulang)
+        hasil["peringkat_penuh_ms"] = ukur(lambda: HasilPeringkat.dari_mesin(0, mesin, kuota).semua(), ulang)
+    return hasil
+
+
+def pasang_stub(stub: SupabaseStub):
+    import main
+    main.supabase = stub
+    calculate_saw.supabase = stub
+    calculate_saw.mesin_peringkat.clear()
+    main.rank_cache.clear()
+    return main
+
+
+def berkas_contoh() -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"%PDF-1.4\n%benchmark\n"
+    output = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+async def bench_api(pendaftar: int, permintaan: int, konkurensi: int, latensi_ms: float) -> Dict[str, Dict[str, float]]:
+    """Uji beban endpoint di dalam proses; setiap skenario dijalankan terpisah."""
+    import httpx
+
+    stub = SupabaseStub(buat_tabel(pendaftar), latensi=latensi_ms / 1000)
+    main = pasang_stub(stub)
+    berkas = berkas_contoh()
+    tipe_berkas = "image/png" if berkas.startswith(b"\x89PNG") else "application/pdf"
+
+    def submit(i: int) -> dict:
+        payload = {
+            "id_siswa": str(1 + i % pendaftar),
+            "personal_data": {"alamat_email": "siswa@contoh.sch.id", "no_telepon": "080000000000"},
+            "detailKeluarga": {"jumlah_tanggungan": 3, "luas_rumah": 60, "penghasilan_orangtua": 1_500_000,
+                               "peringkat_kelas": 4, "rerata_nilai": 88},
+        }
+        return {
+            "data": {"payload": json.dumps(payload)},
+            "files": {"file_kartu_keluarga": ("kk.png", berkas, tipe_berkas)},
+        }
+
+    skenario = {
+        "rank": ("GET", "/beasiswa/rank", lambda i: {}),
+        "siswa_all": ("GET", "/siswa/all", lambda i: {"params": {"limit": 100}}),
+        "submit": ("POST", "/beasiswa/daftar/submit", submit),
+    }
+
+    hasil = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for nama, (metode, path, argumen) in skenario.items():
+            # Pemanasan: memuat mesin peringkat dan cache seperti server yang sudah berjalan
+            respons = await client.request(metode, path, **argumen(0))
+            if respons.status_code >= 400:
+                raise RuntimeError(f"{nama}: {respons.status_code} {respons.text[:200]}")
+
+            semaphore = asyncio.Semaphore(konkurensi)
+            latensi: List[float] = []
+            gagal = 0
+
+            async def satu(i: int):
+                nonlocal gagal
+                async with semaphore:
+                    mulai = time.perf_counter()
+                    respons = await client.request(metode, path, **argumen(i))
+                    latensi.append((time.perf_counter() - mulai) * 1000)
+                    gagal += respons.status_code >= 400
+
+            mulai = time.perf_counter()
+            await asyncio.gather(*(satu(i) for i in range(permintaan)))
+            durasi = time.perf_counter() - mulai
+            hasil[nama] = {
+                **persentil(latensi),
+                "rps": permintaan / durasi,
+                "gagal": gagal,
+                "rss_maks_mb": rss_maks_mb(),
+            }
+
+    from compress_berkas import tutup_pool
+    tutup_pool()
+    return hasil
+
+
+# ===========================================================================
+# Laporan
+# ===========================================================================
+def cetak_tabel(judul: str, baris: Dict[str, Dict[str, float]]):
+    kolom = list(dict.fromkeys(k for nilai in baris.values() for k in nilai))
+    print(f"\n{judul}")
+    print(f"{'':>12} " + " ".join(f"{k:>20}" for k in kolom))
+    for nama, nilai in baris.items():
+        print(f"{nama:>12} " + " ".join(f"{nilai.get(k, float('nan')):>20.3f}" for k in kolom))
+
+
+def bandingkan(baru: dict, lama: dict, toleransi: float) -> List[str]:
+    """Metrik waktu (`*_ms`) yang naik lebih dari `toleransi` (rasio) dibanding hasil lama."""
+    regresi = []
+    for bagian, isi in baru.items():
+        for nama, metrik in isi.items():
+            for kunci, nilai in metrik.items():
+                nilai_lama = lama.get(bagian, {}).get(nama, {}).get(kunci)
+                if kunci.endswith("_ms") and nilai_lama and nilai > nilai_lama * (1 + toleransi):
+                    regresi.append(f"{bagian}/{nama}/{kunci}: {nilai_lama:.3f} -> {nilai:.3f}")
+    return regresi
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["kernel", "api", "semua"])
+    parser.add_argument("--ukuran", type=int, nargs="+", default=UKURAN_BAWAAN, help="jumlah pendaftar (kernel)")
+    parser.add_argument("--ulang", type=int, default=5, help="pengulangan per tahap, diambil median")
+    parser.add_argument("--maks-mesin", type=int, default=100_000, help="ukuran maksimum untuk benchmark mesin inkremental")
+    parser.add_argument("--kuota", type=int, default=calculate_saw.KUOTA_REKOMENDASI)
+    parser.add_argument("--pendaftar", type=int, default=1_000, help="jumlah pendaftar di stub (api)")
+    parser.add_argument("--permintaan", type=int, default=200, help="jumlah permintaan per endpoint (api)")
+    parser.add_argument("--konkurensi", type=int, default=10)
+    parser.add_argument("--latensi-ms", type=float, default=0.0, help="latensi tiruan per panggilan Supabase")
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    parser.add_argument("--bandingkan", help="file JSON hasil sebelumnya")
+    parser.add_argument("--toleransi", type=float, default=0.2, help="kenaikan waktu yang masih diterima (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    hasil = {}
+    if args.mode in ("kernel", "semua"):
+        hasil["kernel"] = {
+            str(n): bench_kernel(n, args.ulang, args.maks_mesin, args.kuota) for n in args.ukuran
+        }
+        cetak_tabel("Kernel SAW (median ms per tahap)", hasil["kernel"])
+    if args.mode in ("api", "semua"):
+        hasil["api"] = asyncio.run(bench_api(args.pendaftar, args.permintaan, args.konkurensi, args.latensi_ms))
+        cetak_tabel(f"API ({args.pendaftar} pendaftar, {args.permintaan} permintaan, "
+                    f"konkurensi {args.konkurensi})", hasil["api"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(hasil, f, indent=2)
+
+    if args.bandingkan:
+        with open(args.bandingkan) as f:
+            regresi = bandingkan(hasil, json.load(f), args.toleransi)
+        print("\n" + ("\n".join(["Regresi:"] + regresi) if regresi else "Tidak ada regresi."))
+        return 1 if regresi else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from metrics import CACHE_BACA
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Cache di memori dengan batas jumlah entri.
+
+    Entri yang paling lama tidak diakses dibuang ketika kapasitas `maxsize` terlampaui;
+    `saat_dibuang(key, value)`, jika diberikan, dipanggil untuk setiap entri yang dibuang.
+    """
+
+    def __init__(self, maxsize: int = 128, saat_dibuang: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.saat_dibuang = saat_dibuang
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            dibuang = self._data.popitem(last=False)
+            if self.saat_dibuang is not None:
+                self.saat_dibuang(*dibuang)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+
+_TIDAK_ADA = object()
+
+
+class TTLCache(LRUCache):
+    """
+    `LRUCache` yang entrinya kedaluwarsa setelah `ttl` detik.
+
+    TTL dapat diatur per entri lewat `set(..., ttl=...)`, mis. lebih pendek untuk
+    hasil negatif. Entri kedaluwarsa dibuang saat dibaca.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        super().__init__(maxsize=maxsize)
+        self.ttl = ttl
+
+    def __contains__(self, key: Hashable):
+        return self.get(key, _TIDAK_ADA) is not _TIDAK_ADA
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = super().get(key, _TIDAK_ADA)
+        if item is _TIDAK_ADA:
+            return default
+        kedaluwarsa, value = item
+        if time.monotonic() >= kedaluwarsa:
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        super().set(key, (time.monotonic() + (self.ttl if ttl is None else ttl), value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = super().pop(key, _TIDAK_ADA)
+        return default if item is _TIDAK_ADA else item[1]
+
+
+class MemoryCacheBackend:
+    """Backend cache di memori proses (`TTLCache`); tidak dibagi antar worker."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def __len__(self):
+        return len(self._cache)
+
+    async def ambil(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def simpan(self, key: str, value: Any, ttl: float):
+        self._cache.set(key, value, ttl=ttl)
+
+    async def hapus(self, *keys: str):
+        for key in keys:
+            self._cache.pop(key)
+
+    async def tutup(self):
+        self._cache.clear()
+
+
+class RedisCacheBackend:
+    """
+    Backend cache di server Redis (atau yang kompatibel, mis. Valkey/KeyDB) sehingga
+    beberapa worker hypercorn berbagi isi cache dan invalidasinya. Nilai disimpan sebagai JSON.
+    Membutuhkan paket opsional `redis`.
+    """
+
+    def __init__(self, url: str, prefix: str = "dss:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("Backend cache 'redis' membutuhkan paket `redis` (pip install redis).") from e
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def ambil(self, key: str) -> Any:
+        data = await self._redis.get(self.prefix + key)
+        return None if data is None else json.loads(data)
+
+    async def simpan(self, key: str, value: Any, ttl: float):
+        await self._redis.set(self.prefix + key, json.dumps(value, default=str), px=max(1, int(ttl * 1000)))
+
+    async def hapus(self, *keys: str):
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def tutup(self):
+        await self._redis.aclose()
+
+
+def buat_cache_backend(backend: str, maxsize: int, ttl: float, redis_url: Optional[str] = None):
+    """Membuat backend cache sesuai konfigurasi: "memory" (bawaan) atau "redis"."""
+    if backend == "redis":
+        return RedisCacheBackend(redis_url or "redis://localhost:6379/0")
+    if backend != "memory":
+        raise ValueError(f"Backend cache '{backend}' tidak dikenal.")
+    return MemoryCacheBackend(maxsize=maxsize, ttl=ttl)
+
+
+class ReadThroughCache:
+    """
+    Cache read-through di atas sebuah backend: nilai dibaca dari cache, dan hanya jika
+    belum ada dimuat lewat fungsi `muat` lalu disimpan. Nilai `None` tidak di-cache.
+
+    Kegagalan backend (mis. Redis tidak bisa dihubungi) hanya dicatat; permintaan tetap
+    dilayani langsung dari sumber datanya.
+    """
+
+    def __init__(self, nama: str, backend, ttl: float):
+        self.nama = nama
+        self.backend = backend
+        self.ttl = ttl
+
+    async def ambil_atau_muat(self, key: str, muat: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await self.backend.ambil(key)
+        except Exception:
+            logger.warning("Gagal membaca cache", extra={"cache": self.nama}, exc_info=True)
+            CACHE_BACA.inc(cache=self.nama, hasil="error")
+            return await muat()
+
+        if value is not None:
+            CACHE_BACA.inc(cache=self.nama, hasil="hit")
+            return value
+
+        CACHE_BACA.inc(cache=self.nama, hasil="miss")
+        value = await muat()
+        if value is not None:
+            try:
+                await self.backend.simpan(key, value, self.ttl)
+            except Exception:
+                logger.warning("Gagal menyimpan cache", extra={"cache": self.nama}, exc_info=True)
+        return value
+
+    async def hapus(self, *keys: str):
+        try:
+            await self.backend.hapus(*keys)
+        except Exception:
+            logger.warning("Gagal menghapus cache", extra={"cache": self.nama}, exc_info=True)
+
+    async def tutup(self):
+        await self.backend.tutup()
@@ -1,9 +1,16 @@
 import os
+import json
+import re
+import bisect
 import asyncio
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
 from supabase import create_client, Client
+import database
+from database import run_in_thread
+from metrics import span
 
 # --- KONFIGURASI SUPABASE ---
 load_dotenv()
@@ -17,165 +24,799 @@ DATABASE_URL = os.getenv("SUPABASE_DB_URL_DSS")
 
 supabase: Client = create_client(url, key)
 
-# Tentukan ID periode beasiswa yang akan dihitung
-ID_PERIODE_AKTIF = 1
-
-async def main():
-    """Fungsi utama untuk menjalankan seluruh proses perhitungan SAW dengan Supabase."""
-    print("--- Memulai Proses Perhitungan SAW (Supabase) ---")
-
-    # 1. Mengambil data dari Supabase secara bersamaan (concurrently)
-    print(f"\n1. Mengambil data untuk periode ID: {ID_PERIODE_AKTIF}...")
-
-    kriteria_response = supabase.table("kriteria_saw").select("*").order("id_kriteria").execute()
-
-    # Mengambil data pendaftar dan melakukan join ke tabel siswa
-    pendaftar_response = supabase.table("pendaftaran") \
-        .select(
-        "id_pendaftaran, id_siswa, id_periode, status_validasi, penghasilan_orangtua, jumlah_tanggungan,luas_rumah, rerata_nilai, peringkat_kelas, siswa(nama_siswa)") \
-        .eq("id_periode", ID_PERIODE_AKTIF) \
-        .eq("status_validasi", "valid") \
-        .execute()
-
-    # Menunggu semua query selesai
-    # kriteria_response, pendaftar_response = asyncio.gather(kriteria_task, pendaftar_task)
-
-    kriteria = pd.DataFrame(kriteria_response.data)
-    pendaftar = pd.DataFrame(pendaftar_response.data)
-
-    if pendaftar.empty:
-        print("\nTidak ada data pendaftar yang valid untuk dihitung pada periode ini.")
-
-    # Menggabungkan nama_siswa dari hasil join
-    pendaftar['nama_siswa'] = pendaftar['siswa'].apply(lambda x: x['nama_siswa'] if isinstance(x, dict) else None)
-    pendaftar = pendaftar.drop(columns=['siswa'])  # Hapus kolom join yang sudah tidak perlu
-
-    print(f"   - Ditemukan {len(kriteria)} kriteria.")
-    print(f"   - Ditemukan {len(pendaftar)} pendaftar yang valid.")
-
-    # 2. Membuat Matriks Keputusan (X) - Logika ini tidak berubah
-    print("\n2. Membuat Matriks Keputusan (X)...")
-    matriks_x = pd.DataFrame(pendaftar['id_pendaftaran'])
-
-    kolom_mapping = {
-        'C1': 'penghasilan_orangtua',
-        'C2': 'peringkat_kelas',
-        'C3': 'jumlah_tanggungan',
-        'C4': 'luas_rumah',
-        'C5': 'rerata_nilai'
+# ID periode bawaan bila pemanggil tidak menyebutkan periode
+ID_PERIODE_AKTIF = int(os.getenv("ID_PERIODE_AKTIF", 1))
+
+# Jumlah pendaftar yang direkomendasikan bila periode tidak punya kuota sendiri
+# (kolom `periode_beasiswa.kuota`, lihat sql/003_periode_kuota.sql)
+KUOTA_REKOMENDASI = int(os.getenv("KUOTA_REKOMENDASI", 5))
+
+# Engine perhitungan: "pandas" (mesin peringkat di memori) atau "sql" (dihitung di Postgres)
+SAW_ENGINE = os.getenv("SAW_ENGINE", "pandas")
+
+# Aturan penilaian (banding) setiap kriteria disimpan di file konfigurasi berversi,
+# sehingga menambah/mengubah kriteria tidak memerlukan perubahan kode.
+ATURAN_PATH = os.getenv("SAW_ATURAN_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "aturan_kriteria.json"))
+
+
+class AturanKriteria(NamedTuple):
+    """Aturan banding satu kriteria yang sudah dikompilasi menjadi tabel lookup."""
+    kolom: str
+    batas: np.ndarray
+    tabel: np.ndarray
+    # Keterangan setiap band (sejajar dengan `tabel`), mis. "<= 500000" atau "lainnya"
+    label: Tuple[str, ...] = ()
+    # Skor untuk nilai kosong (NaN/None), sama seperti `default` pada `np.select`
+    default: float = 0.0
+
+    def band(self, nilai: np.ndarray) -> np.ndarray:
+        """Indeks band (posisi di `tabel`) untuk setiap nilai mentah. NaN tidak punya band yang bermakna."""
+        return np.searchsorted(self.batas, nilai, side='left')
+
+    def skor(self, nilai: np.ndarray) -> np.ndarray:
+        """Mengubah nilai mentah menjadi skor dengan satu pencarian biner per elemen."""
+        nilai = np.asarray(nilai, dtype=float)
+        # searchsorted menaruh NaN di ujung tabel, yang untuk aturan batas bawah adalah skor tertinggi
+        return np.where(np.isnan(nilai), self.default, self.tabel[self.band(nilai)])
+
+
+def kompilasi_aturan(kolom: str, aturan: List[dict], default: float = 0.0) -> AturanKriteria:
+    """
+    Mengompilasi daftar aturan berurutan (dicocokkan dari atas seperti `np.select`)
+    menjadi array batas terurut dan tabel skor untuk `np.searchsorted`.
+
+    Aturan batas atas (`<`, `<=`) harus naik, aturan batas bawah (`>`, `>=`) harus turun.
+    Batas yang eksklusif/inklusif diubah ke bentuk `x <= b` atau `x > b` dengan `np.nextafter`.
+    """
+    ops = {item['op'] for item in aturan}
+    nilai = np.array([item['nilai'] for item in aturan], dtype=float)
+    skor = np.array([item['skor'] for item in aturan], dtype=float)
+    label = [f"{item['op']} {item['nilai']}" for item in aturan]
+
+    if ops <= {'<', '<='}:
+        # x < t  <=>  x <= nextafter(t, -inf)
+        batas = np.array([t if item['op'] == '<=' else np.nextafter(t, -np.inf)
+                          for t, item in zip(nilai, aturan)])
+        tabel = np.append(skor, default)
+        label = label + ['lainnya']
+    elif ops <= {'>', '>='}:
+        # x >= t  <=>  x > nextafter(t, -inf); dibalik agar batas terurut naik
+        batas = np.array([t if item['op'] == '>' else np.nextafter(t, -np.inf)
+                          for t, item in zip(nilai, aturan)])[::-1]
+        tabel = np.insert(skor[::-1], 0, default)
+        label = ['lainnya'] + label[::-1]
+    else:
+        raise ValueError(f"Aturan kolom '{kolom}' mencampur operator batas atas dan batas bawah.")
+
+    if np.any(np.diff(batas) <= 0):
+        raise ValueError(f"Batas aturan kolom '{kolom}' tidak terurut.")
+    return AturanKriteria(kolom=kolom, batas=batas, tabel=tabel, label=tuple(label), default=float(default))
+
+
+def muat_aturan_kriteria(path: str = ATURAN_PATH) -> Dict[str, AturanKriteria]:
+    """Membaca file konfigurasi aturan dan mengompilasinya sekali per kode kriteria."""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return {
+        kode: kompilasi_aturan(item['kolom'], item['aturan'], item.get('default', 0.0))
+        for kode, item in config['kriteria'].items()
     }
 
-    for _, krit in kriteria.iterrows():
-        kode = krit['kode_kriteria']
-        kolom = kolom_mapping[kode]
-
-        # Logika untuk setiap kriteria menggunakan np.select yang mudah dibaca
-        if kode == 'C1':  # Penghasilan Orang Tua
-            conditions = [
-                pendaftar[kolom] <= 500000,
-                pendaftar[kolom] <= 1000000,
-                pendaftar[kolom] <= 1500000,
-                pendaftar[kolom] <= 2000000,
-            ]
-            choices = [1.00, 0.75, 0.50, 0.25]
-            matriks_x[kode] = np.select(conditions, choices, default=0.00)
-
-        elif kode == 'C2':  # Rangking
-            conditions = [
-                pendaftar[kolom] <= 5,
-                pendaftar[kolom] <= 10,
-                pendaftar[kolom] <= 15,
-                pendaftar[kolom] <= 20,
-            ]
-            choices = [1.00, 0.75, 0.50, 0.25]
-            matriks_x[kode] = np.select(conditions, choices, default=0.00)
-
-        elif kode == 'C3':  # Jumlah Tanggungan
-            conditions = [
-                pendaftar[kolom] >= 5,
-                pendaftar[kolom] == 4,
-                pendaftar[kolom] == 3,
-                pendaftar[kolom] == 2,
-            ]
-            choices = [1.00, 0.75, 0.50, 0.25]
-            matriks_x[kode] = np.select(conditions, choices, default=0.00)
-
-        elif kode == 'C4':  # Luas Rumah
-            conditions = [
-                pendaftar[kolom] < 36,
-                pendaftar[kolom] <= 54,
-                pendaftar[kolom] <= 70,
-                pendaftar[kolom] <= 100,
-            ]
-            choices = [1.00, 0.75, 0.50, 0.25]
-            matriks_x[kode] = np.select(conditions, choices, default=0.00)
-
-        elif kode == 'C5':  # Nilai
-            conditions = [
-                pendaftar[kolom] > 90,
-                pendaftar[kolom] > 80,
-                pendaftar[kolom] > 70,
-                pendaftar[kolom] > 40,
+
+ATURAN_KRITERIA = muat_aturan_kriteria()
+
+
+def matriks_keputusan(nilai_mentah: np.ndarray, kode_kriteria: List[str], aturan: Dict[str, AturanKriteria]) -> np.ndarray:
+    """Membentuk Matriks Keputusan (X) dari atribut mentah menggunakan aturan banding."""
+    return np.column_stack([
+        aturan[kode].skor(nilai_mentah[:, j])
+        for j, kode in enumerate(kode_kriteria)
+    ])
+
+
+def normalisasi(matriks_x: np.ndarray, is_benefit: np.ndarray, max_val: np.ndarray, min_val: np.ndarray) -> np.ndarray:
+    """Normalisasi Matriks (R) untuk semua kolom sekaligus berdasarkan nilai ekstrem tiap kolom."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_benefit = np.where(max_val > 0, matriks_x / max_val, matriks_x)
+        r_cost = np.where(matriks_x > 0, min_val / matriks_x, np.where(min_val == 0, 1.0, 0.0))
+    return np.where(is_benefit, r_benefit, r_cost)
+
+
+def hitung_saw(nilai_mentah: np.ndarray, kriteria: pd.DataFrame, aturan: Dict[str, AturanKriteria] = None):
+    """
+    Kernel perhitungan SAW murni tanpa akses jaringan.
+
+    - **nilai_mentah**: array (n_pendaftar x n_kriteria) berisi atribut mentah,
+      urutan kolom mengikuti urutan baris pada `kriteria`.
+    - **kriteria**: DataFrame dengan kolom `kode_kriteria`, `jenis`, dan `normalize_bobot`.
+    - **aturan**: aturan banding terkompilasi, bawaan `ATURAN_KRITERIA`.
+
+    Mengembalikan tuple `(nilai_akhir, peringkat)`, keduanya sejajar dengan baris
+    `nilai_mentah`. Peringkat dimulai dari 1; nilai akhir yang sama diputus dengan
+    `urutan_peringkat` (nilai R kriteria berbobot terbesar, lalu urutan baris masukan).
+    """
+    aturan = aturan or ATURAN_KRITERIA
+    nilai_mentah = np.asarray(nilai_mentah, dtype=float)
+    n = nilai_mentah.shape[0]
+    if n == 0:
+        return np.empty(0), np.empty(0, dtype=int)
+
+    # 1. Matriks Keputusan (X)
+    with span("saw.matriks_x"):
+        matriks_x = matriks_keputusan(nilai_mentah, list(kriteria['kode_kriteria']), aturan)
+
+    # 2. Normalisasi Matriks (R)
+    with span("saw.normalisasi"):
+        is_benefit = (kriteria['jenis'] == 'benefit').to_numpy()
+        matriks_r = normalisasi(matriks_x, is_benefit, matriks_x.max(axis=0), matriks_x.min(axis=0))
+
+    # 3. Nilai Preferensi (V) dan peringkat.
+    # Dijumlahkan per baris (bukan matmul) agar skor satu baris identik dengan skor batch.
+    with span("saw.skor"):
+        bobot_w = kriteria['normalize_bobot'].to_numpy(dtype=float)
+        nilai_akhir = (matriks_r * bobot_w).sum(axis=1)
+
+    with span("saw.peringkat"):
+        urutan = urutan_peringkat(nilai_akhir, matriks_r, bobot_w)
+        peringkat = np.empty(n, dtype=int)
+        peringkat[urutan] = np.arange(1, n + 1)
+    return nilai_akhir, peringkat
+
+
+def kunci_sekunder(bobot: np.ndarray) -> np.ndarray:
+    """Urutan kolom kriteria untuk pemutus nilai seri: bobot terbesar lebih dulu."""
+    return np.argsort(-np.asarray(bobot, dtype=float), kind='stable')
+
+
+def urutan_peringkat(nilai_akhir: np.ndarray, matriks_r: np.ndarray, bobot: np.ndarray) -> np.ndarray:
+    """
+    Indeks baris dari peringkat terbaik: nilai akhir menurun, lalu nilai R setiap kriteria
+    (bobot terbesar lebih dulu) menurun, lalu urutan baris. Dipakai semua engine agar
+    nilai seri di batas kuota diputus dengan cara yang sama.
+    """
+    kolom = kunci_sekunder(bobot)
+    # lexsort memakai kunci terakhir sebagai kunci utama
+    return np.lexsort((
+        np.arange(len(nilai_akhir)),
+        *(-matriks_r[:, j] for j in kolom[::-1]),
+        -nilai_akhir,
+    ))
+
+
+class PeringkatInkremental:
+    """
+    Mesin peringkat SAW yang disimpan di memori dan diperbarui per pendaftar.
+
+    Menyimpan atribut mentah, nilai maksimum/minimum tiap kolom untuk normalisasi,
+    serta urutan skor terurut. Selama nilai ekstrem kolom tidak berubah, skor
+    pendaftar lain tidak berubah sehingga cukup menyisipkan/menghapus satu entri
+    dengan pencarian biner. Perhitungan ulang penuh hanya dilakukan ketika nilai
+    ekstrem yang dipakai normalisasi ikut berubah.
+    """
+
+    def __init__(self, kriteria: pd.DataFrame, aturan: Dict[str, AturanKriteria] = None):
+        self.aturan = aturan or ATURAN_KRITERIA
+        self.kriteria = kriteria.reset_index(drop=True)
+        self.kode = list(self.kriteria['kode_kriteria'])
+        self.kolom = [self.aturan[kode].kolom for kode in self.kode]
+        self.is_benefit = (self.kriteria['jenis'] == 'benefit').to_numpy()
+        self.bobot = self.kriteria['normalize_bobot'].to_numpy(dtype=float)
+        self.jumlah_hitung_penuh = 0
+        self._baris: Dict[int, dict] = {}
+        self._kunci = kunci_sekunder(self.bobot)
+        # (-nilai_akhir, -R kriteria berbobot terbesar..., id_pendaftaran), terurut naik
+        self._urutan: List[tuple] = []
+        self._ekstrem = None
+        self._jumlah_ekstrem = None
+        self._matriks_r = None  # (ids, R), dihitung ulang setelah ada perubahan
+
+    def __len__(self):
+        return len(self._baris)
+
+    def __contains__(self, id_pendaftaran: int):
+        return id_pendaftaran in self._baris
+
+    def muat_ulang(self, pendaftar: List[dict]):
+        """
+        Mengganti seluruh isi mesin dengan daftar pendaftar valid lalu menghitung penuh.
+        Matriks keputusan dibentuk sekali untuk semua baris; `_siapkan` hanya untuk upsert per baris.
+        """
+        mentah = np.array([[row[k] for k in self.kolom] for row in pendaftar], dtype=float)
+        mentah = mentah.reshape(len(pendaftar), len(self.kolom))
+        matriks_x = matriks_keputusan(mentah, self.kode, self.aturan) if len(pendaftar) else mentah
+        self._baris = {
+            row['id_pendaftaran']: {'mentah': m, 'x': x, 'nama_siswa': _nama_siswa(row)}
+            for row, m, x in zip(pendaftar, mentah, matriks_x)
+        }
+        self._hitung_penuh()
+
+    def upsert(self, row: dict):
+        """Menambah atau memperbarui satu pendaftar; pendaftar yang tidak valid dikeluarkan."""
+        self.upsert_banyak([row])
+
+    def upsert_banyak(self, rows: List[dict]):
+        """
+        Menerapkan banyak perubahan sekaligus. Perhitungan ulang penuh paling banyak
+        dilakukan sekali di akhir; setelah dipastikan perlu, baris sisanya cukup disimpan.
+        """
+        self._matriks_r = None
+        perlu_penuh = False
+        for row in rows:
+            id_pendaftaran = row['id_pendaftaran']
+            valid = row.get('status_validasi') == 'valid'
+            if perlu_penuh:
+                self._baris.pop(id_pendaftaran, None)
+                if valid:
+                    self._baris[id_pendaftaran] = self._siapkan(row)
+                continue
+
+            perlu_penuh = self._lepas(id_pendaftaran)
+            if valid:
+                perlu_penuh = self._pasang(id_pendaftaran, self._siapkan(row)) or perlu_penuh
+        if perlu_penuh:
+            self._hitung_penuh()
+
+    def hapus(self, id_pendaftaran: int):
+        """Mengeluarkan satu pendaftar dari peringkat."""
+        self._matriks_r = None
+        if self._lepas(id_pendaftaran):
+            self._hitung_penuh()
+
+    def peringkat(self, id_pendaftaran: int) -> Optional[int]:
+        """Peringkat satu pendaftar dalam O(log n), atau None jika tidak ada."""
+        baris = self._baris.get(id_pendaftaran)
+        if baris is None:
+            return None
+        return bisect.bisect_left(self._urutan, baris['urutan']) + 1
+
+    def hasil(self) -> List[dict]:
+        """Daftar pendaftar terurut berdasarkan peringkat."""
+        return self.potret()()
+
+    def potret(self) -> Callable[..., List[dict]]:
+        """
+        Pembaca baris peringkat `ambil(mulai=0, batas=None)` (posisi `[mulai, batas)` dalam urutan).
+        Urutan dan baris disalin dangkal, sehingga perubahan mesin setelahnya tidak ikut terbaca.
+        """
+        urutan, baris = list(self._urutan), dict(self._baris)
+
+        def ambil(mulai: int = 0, batas: Optional[int] = None) -> List[dict]:
+            return [
+                {
+                    'id_pendaftaran': id_pendaftaran,
+                    'nama_siswa': baris[id_pendaftaran]['nama_siswa'],
+                    'nilai_akhir': -neg_skor,
+                    'peringkat': posisi,
+                }
+                for posisi, (neg_skor, *_, id_pendaftaran) in enumerate(urutan[mulai:batas], start=mulai + 1)
             ]
-            choices = [1.00, 0.75, 0.50, 0.25]
-            matriks_x[kode] = np.select(conditions, choices, default=0.00)
-
-    print("   Matriks Keputusan (X):")
-    print(matriks_x)
-
-    # 3. Normalisasi Matriks (R) - Logika ini tidak berubah
-    print("\n3. Melakukan Normalisasi Matriks (R)...")
-    matriks_r = matriks_x.copy()
-    for _, krit in kriteria.iterrows():
-        kode = krit['kode_kriteria']
-        jenis = krit['jenis']
-
-        if jenis == 'benefit':
-            max_val = matriks_x[kode].max()
-            if max_val > 0:
-                matriks_r[kode] = matriks_x[kode] / max_val
-        elif jenis == 'cost':
-            min_val = matriks_x[kode].min()
-            matriks_r[kode] = matriks_x[kode].apply(lambda x: min_val / x if x > 0 else (1 if min_val == 0 else 0))
-
-    print("   Matriks Ternormalisasi (R):")
-    print(matriks_r.round(2))
-
-    # 4. Perangkingan (Menghitung Nilai Preferensi V) - Logika ini tidak berubah
-    print("\n4. Menghitung Nilai Akhir dan Perangkingan...")
-
-    bobot_w = kriteria.set_index('kode_kriteria')['normalize_bobot']
-    nilai_akhir = (matriks_r * bobot_w).sum(axis=1)
-
-    hasil = pd.DataFrame({
-        'id_pendaftaran': pendaftar['id_pendaftaran'],
-        'nama_siswa': pendaftar['nama_siswa'],
-        'nilai_akhir': nilai_akhir
-    }).sort_values(by='nilai_akhir', ascending=False).reset_index(drop=True)
-
-    # print(hasil)
-    # matriks_r
-
-    hasil['peringkat'] = hasil.index + 1
-    hasil['status_rekomendasi'] = hasil['peringkat'].apply(
-        lambda x: 'direkomendasikan' if x <= 5 else 'tidak direkomendasikan'
+        return ambil
+
+    def matriks_r(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matriks ternormalisasi R (pendaftar x kriteria) beserta `id_pendaftaran` tiap barisnya,
+        terurut naik berdasarkan id. Disimpan sampai ada perubahan pendaftar.
+        """
+        if self._matriks_r is None:
+            ids = np.array(sorted(self._baris), dtype=np.int64)
+            if len(ids) == 0:
+                self._matriks_r = ids, np.empty((0, len(self.kode)))
+            else:
+                matriks_x = np.vstack([self._baris[i]['x'] for i in ids])
+                max_val = np.where(self.is_benefit, self._ekstrem, 0.0)
+                min_val = np.where(self.is_benefit, 0.0, self._ekstrem)
+                self._matriks_r = ids, normalisasi(matriks_x, self.is_benefit, max_val, min_val)
+        return self._matriks_r
+
+    def _siapkan(self, row: dict) -> dict:
+        mentah = np.array([[row[k] for k in self.kolom]], dtype=float)
+        return {
+            'mentah': mentah[0],
+            'x': matriks_keputusan(mentah, self.kode, self.aturan)[0],
+            'nama_siswa': _nama_siswa(row),
+        }
+
+    def _hitung_penuh(self):
+        self.jumlah_hitung_penuh += 1
+        self._matriks_r = None
+        if not self._baris:
+            self._urutan, self._ekstrem, self._jumlah_ekstrem = [], None, None
+            return
+
+        # Urut berdasarkan id agar nilai seri diputus dengan cara yang sama seperti jalur inkremental
+        ids = sorted(self._baris)
+        baris = [self._baris[i] for i in ids]
+        matriks_x = np.array([b['x'] for b in baris])
+
+        # Sama dengan hitung_saw; R disimpan karena juga menjadi kunci pemutus nilai seri
+        matriks_r = normalisasi(matriks_x, self.is_benefit, matriks_x.max(axis=0), matriks_x.min(axis=0))
+        nilai_akhir = (matriks_r * self.bobot).sum(axis=1)
+        self._matriks_r = np.array(ids, dtype=np.int64), matriks_r
+
+        # Ekstrem yang relevan: maksimum untuk benefit, minimum untuk cost
+        self._ekstrem = np.where(self.is_benefit, matriks_x.max(axis=0), matriks_x.min(axis=0))
+        self._jumlah_ekstrem = (matriks_x == self._ekstrem).sum(axis=0)
+        skor = nilai_akhir.tolist()
+        kunci = (-matriks_r[:, self._kunci]).tolist()
+        for b, i, nilai, k in zip(baris, ids, skor, kunci):
+            b['nilai_akhir'] = nilai
+            b['urutan'] = (-nilai, *k, i)
+        urutan = urutan_peringkat(nilai_akhir, matriks_r, self.bobot).tolist()
+        self._urutan = [baris[k]['urutan'] for k in urutan]
+
+    def _lepas(self, id_pendaftaran: int) -> bool:
+        """Mengeluarkan satu baris; True jika nilai ekstrem kolom ikut hilang."""
+        baris = self._baris.pop(id_pendaftaran, None)
+        if baris is None:
+            return False
+        del self._urutan[bisect.bisect_left(self._urutan, baris['urutan'])]
+
+        sama = baris['x'] == self._ekstrem
+        self._jumlah_ekstrem = self._jumlah_ekstrem - sama
+        return bool(np.any(self._jumlah_ekstrem[sama] == 0))
+
+    def _pasang(self, id_pendaftaran: int, baris: dict) -> bool:
+        """Menyisipkan satu baris; True jika baris ini menggeser nilai ekstrem kolom."""
+        self._baris[id_pendaftaran] = baris
+        if self._ekstrem is None:
+            return True
+        x = baris['x']
+        if np.any(np.where(self.is_benefit, x > self._ekstrem, x < self._ekstrem)):
+            return True
+
+        self._jumlah_ekstrem = self._jumlah_ekstrem + (x == self._ekstrem)
+        max_val = np.where(self.is_benefit, self._ekstrem, 0.0)
+        min_val = np.where(self.is_benefit, 0.0, self._ekstrem)
+        matriks_r = normalisasi(x[None, :], self.is_benefit, max_val, min_val)
+        baris['nilai_akhir'] = float((matriks_r * self.bobot).sum(axis=1)[0])
+        baris['urutan'] = (-baris['nilai_akhir'], *(-matriks_r[0, self._kunci]).tolist(), id_pendaftaran)
+        bisect.insort(self._urutan, baris['urutan'])
+        return False
+
+
+def _nama_siswa(row: dict) -> Optional[str]:
+    return row.get('nama_siswa') or (row.get('siswa') or {}).get('nama_siswa')
+
+
+def hitung_inversi(p: np.ndarray) -> np.ndarray:
+    """
+    Jumlah inversi (pasangan i < j dengan p[i] > p[j]) setiap baris matriks permutasi
+    `p` (k x n, nilai 0..n-1), dalam O(k n log^2 n) dengan merge sort tervektorisasi:
+    di setiap level, elemen blok kanan dicari di blok kiri yang sudah terurut dengan
+    satu `searchsorted` global (blok dipisahkan dengan offset kelipatan m).
+    """
+    k, n = p.shape
+    m = 1 << max(n - 1, 0).bit_length()
+    # Padding dengan nilai yang lebih besar di akhir tidak menambah inversi
+    blok = np.hstack([p, np.broadcast_to(np.arange(n, m), (k, m - n))]).astype(np.int64)
+    inversi = np.zeros(k, dtype=np.int64)
+    w = 1
+    while w < m:
+        pasangan = blok.reshape(k, m // (2 * w), 2, w)
+        kiri, kanan = pasangan[:, :, 0, :], pasangan[:, :, 1, :]
+        offset = (np.arange(k * (m // (2 * w))) * m).reshape(k, -1, 1)
+        posisi = np.searchsorted((kiri + offset).ravel(), (kanan + offset).ravel(), side='right')
+        awal_blok = (np.arange(k * (m // (2 * w))) * w).repeat(w)
+        lebih_besar = w - (posisi - awal_blok)
+        inversi += lebih_besar.reshape(k, -1).sum(axis=1)
+        blok = np.sort(pasangan.reshape(k, m // (2 * w), 2 * w), axis=-1, kind='stable').reshape(k, m)
+        w *= 2
+    return inversi
+
+
+def urutan_skor(skor: np.ndarray) -> np.ndarray:
+    """
+    Indeks terurut dari skor tertinggi per baris; nilai seri diputus berdasarkan urutan kolom.
+    Skor dibulatkan dulu agar seri akibat aturan banding tidak pecah oleh galat pembulatan.
+    """
+    return np.argsort(-np.round(skor, 12), kind='stable')
+
+
+def analisis_sensitivitas(matriks_r: np.ndarray, bobot_dasar: np.ndarray, matriks_bobot: np.ndarray):
+    """
+    Menilai banyak skenario bobot sekaligus terhadap matriks R yang sama.
+
+    - **matriks_r**: (n_pendaftar x n_kriteria).
+    - **bobot_dasar**: (n_kriteria,) bobot yang berlaku sekarang.
+    - **matriks_bobot**: (n_kriteria x n_skenario).
+
+    Skor seluruh skenario dihitung dengan satu perkalian matriks. Mengembalikan tuple
+    `(urutan_dasar, urutan, kendall_tau)`: indeks baris terurut per peringkat untuk dasar
+    (n,) dan setiap skenario (n_skenario x n), serta Kendall tau tiap skenario terhadap dasar.
+    """
+    n = matriks_r.shape[0]
+    k = matriks_bobot.shape[1]
+    urutan_dasar = urutan_skor(matriks_r @ bobot_dasar)
+    # Dihitung sebagai (skenario x pendaftar) agar setiap baris berurutan di memori
+    urutan = urutan_skor(matriks_bobot.T @ matriks_r.T)
+    if n < 2:
+        return urutan_dasar, urutan, np.ones(k)
+
+    # Peringkat skenario untuk setiap pendaftar, dibaca dalam urutan peringkat dasar;
+    # inversinya adalah jumlah pasangan yang urutannya berbalik (discordant).
+    posisi = np.empty_like(urutan)
+    np.put_along_axis(posisi, urutan, np.broadcast_to(np.arange(n), (k, n)), axis=1)
+    diskordan = hitung_inversi(posisi[:, urutan_dasar])
+    kendall_tau = 1.0 - 4.0 * diskordan / (n * (n - 1))
+    return urutan_dasar, urutan, kendall_tau
+
+
+# Mesin peringkat per id_periode, dimuat saat pertama kali dibutuhkan
+mesin_peringkat: Dict[int, PeringkatInkremental] = {}
+# Penghitung perubahan pendaftar, untuk mendeteksi pemuatan yang berpapasan dengan penulisan
+_versi_perubahan = 0
+
+
+def _kolom_atribut() -> str:
+    return ", ".join(sorted({a.kolom for a in ATURAN_KRITERIA.values()}))
+
+
+async def ambil_data_periode(id_periode_list: List[int]) -> Tuple[pd.DataFrame, Dict[int, List[dict]]]:
+    """
+    Mengambil kriteria dan pendaftar valid untuk beberapa periode sekaligus.
+    Pendaftar semua periode diambil dengan satu query lalu dikelompokkan per `id_periode`.
+    """
+    # Kedua query dijalankan bersamaan.
+    # Kolom atribut diambil dari konfigurasi aturan agar kriteria baru ikut terbaca.
+    kriteria_response, pendaftar_response = await asyncio.gather(
+        run_in_thread(supabase.table("kriteria_saw").select("*").order("id_kriteria").execute),
+        run_in_thread(supabase.table("pendaftaran")
+                      .select(f"id_pendaftaran, id_siswa, id_periode, status_validasi, {_kolom_atribut()}, siswa(nama_siswa)")
+                      .in_("id_periode", id_periode_list)
+                      .eq("status_validasi", "valid")
+                      .execute),
     )
 
-    hasil_untuk_db = hasil[['id_pendaftaran', 'nilai_akhir', 'peringkat', 'status_rekomendasi']].copy()
-    hasil_untuk_db['id_periode'] = ID_PERIODE_AKTIF
-    hasil_untuk_db['is_publish'] = False
-
-    print("Hasil Akhir Perangkingan:")
-    hasil_for_beasiswa = hasil.to_json(orient='records')
-    hasil_for_database = hasil_untuk_db.to_json(orient='records')
-    print(hasil_for_database)
-
-    # 5. Menyimpan hasil ke Supabase
-    # save_results_to_db(hasil_untuk_db)
-
-    print("\n--- Proses Selesai ---")
-    return hasil_for_beasiswa,  hasil_for_database
+    per_periode = {id_periode: [] for id_periode in id_periode_list}
+    for row in pendaftar_response.data:
+        per_periode[int(row['id_periode'])].append(row)
+    return pd.DataFrame(kriteria_response.data), per_periode
+
+
+def bangun_mesin(kriteria: pd.DataFrame, pendaftar: List[dict]) -> PeringkatInkremental:
+    """
+    Membangun mesin peringkat satu periode. Dijalankan di proses ini: mengirim mesin jadi
+    dari process pool (pickle dict per pendaftar) lebih lambat daripada membangunnya.
+    """
+    mesin = PeringkatInkremental(kriteria)
+    mesin.muat_ulang(pendaftar)
+    return mesin
+
+
+async def muat_mesin_peringkat(id_periode_list: List[int]) -> Dict[int, PeringkatInkremental]:
+    """Mengambil kriteria dan pendaftar valid dari Supabase lalu membangun mesin peringkat per periode."""
+    versi_awal = _versi_perubahan
+    with span("saw.fetch"):
+        kriteria, per_periode = await ambil_data_periode(id_periode_list)
+    with span("saw.bangun_mesin"):
+        mesin = {id_periode: bangun_mesin(kriteria, rows) for id_periode, rows in per_periode.items()}
+
+    # Jika ada perubahan pendaftar selama query berjalan, data yang diambil mungkin
+    # sudah basi: pakai untuk panggilan ini saja, jangan disimpan sebagai mesin aktif.
+    if _versi_perubahan == versi_awal:
+        mesin_peringkat.update(mesin)
+    return mesin
+
+
+async def ambil_mesin(id_periode: int) -> PeringkatInkremental:
+    """Mesin peringkat satu periode, dimuat dari database jika belum ada."""
+    mesin = mesin_peringkat.get(id_periode)
+    if mesin is None:
+        mesin = (await muat_mesin_peringkat([id_periode]))[id_periode]
+    return mesin
+
+
+def _mesin_untuk(row: dict) -> Optional[PeringkatInkremental]:
+    """Mesin peringkat periode milik baris `pendaftaran`, atau None jika periodenya belum dimuat."""
+    if row.get('id_periode') is not None:
+        return mesin_peringkat.get(int(row['id_periode']))
+    return next((m for m in mesin_peringkat.values() if row['id_pendaftaran'] in m), None)
+
+
+async def perbarui_pendaftar(row: dict):
+    """Meneruskan perubahan satu baris `pendaftaran` ke mesin peringkat periodenya jika sudah dimuat."""
+    global _versi_perubahan
+    _versi_perubahan += 1
+    if not mesin_peringkat:
+        return
+    if row.get('id_periode') is not None and int(row['id_periode']) not in mesin_peringkat:
+        return
+    if row.get('status_validasi') == 'valid' and 'siswa' not in row:
+        # Nama siswa dibutuhkan untuk hasil peringkat, ambil baris lengkapnya sekali
+        response = await run_in_thread(supabase.table("pendaftaran") \
+            .select(f"id_pendaftaran, id_siswa, id_periode, status_validasi, {_kolom_atribut()}, siswa(nama_siswa)") \
+            .eq("id_pendaftaran", row['id_pendaftaran']) \
+            .maybe_single() \
+            .execute)
+        if not response.data:
+            hapus_pendaftar(row['id_pendaftaran'])
+            return
+        row = response.data
+    mesin = _mesin_untuk(row)
+    if mesin is not None:
+        mesin.upsert(row)
+
+
+def perbarui_banyak_pendaftar(rows: List[dict]):
+    """
+    Meneruskan banyak perubahan `pendaftaran` ke mesin peringkat sekaligus, dikelompokkan per periode.
+    Setiap baris harus sudah memuat `nama_siswa` (atau `siswa.nama_siswa`).
+    """
+    global _versi_perubahan
+    _versi_perubahan += 1
+    per_mesin: Dict[int, Tuple[PeringkatInkremental, List[dict]]] = {}
+    for row in rows:
+        mesin = _mesin_untuk(row)
+        if mesin is not None:
+            per_mesin.setdefault(id(mesin), (mesin, []))[1].append(row)
+    for mesin, rows_mesin in per_mesin.values():
+        mesin.upsert_banyak(rows_mesin)
+
+
+def hapus_pendaftar(id_pendaftaran: int):
+    """Mengeluarkan pendaftar yang dihapus dari mesin peringkat yang memuatnya."""
+    global _versi_perubahan
+    _versi_perubahan += 1
+    for mesin in mesin_peringkat.values():
+        mesin.hapus(id_pendaftaran)
+
+
+def _sql_float(nilai: float) -> str:
+    # repr() float adalah representasi terpendek yang kembali persis ke nilai yang sama
+    return f"{float(nilai)!r}::float8"
+
+
+def _sql_kolom(nama: str) -> str:
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", nama):
+        raise ValueError(f"Nama kolom '{nama}' tidak valid.")
+    return f'"{nama}"'
+
+
+def susun_query_saw(kriteria: pd.DataFrame, aturan: Dict[str, AturanKriteria] = None) -> str:
+    """
+    Menyusun satu query SQL yang menjalankan seluruh tahapan SAW di Postgres:
+    CASE banding dari aturan terkompilasi yang sama dengan `hitung_saw`, MAX/MIN window
+    untuk normalisasi, penjumlahan berbobot, lalu ROW_NUMBER() sebagai peringkat.
+    Setiap periode dihitung di partisinya sendiri.
+
+    Parameter `$1` adalah array `id_periode`. Urutan penjumlahan dan pemutusan nilai seri
+    (nilai R kriteria berbobot terbesar, lalu `id_pendaftaran`, lihat `urutan_peringkat`)
+    sama dengan engine pandas sehingga hasilnya identik.
+    """
+    aturan = aturan or ATURAN_KRITERIA
+    kolom_x, kolom_ekstrem, kolom_r, suku_skor = [], [], [], []
+    for j, krit in enumerate(kriteria.itertuples(index=False)):
+        a = aturan[krit.kode_kriteria]
+        nilai = f"p.{_sql_kolom(a.kolom)}::float8"
+        # Sama dengan AturanKriteria.skor: NULL mendapat skor default, selainnya
+        # tabel[searchsorted(batas, x, side='left')], yaitu batas pertama yang >= x
+        cabang = f"WHEN {nilai} IS NULL THEN {_sql_float(a.default)} " + " ".join(
+            f"WHEN {nilai} <= {_sql_float(b)} THEN {_sql_float(t)}" for b, t in zip(a.batas, a.tabel)
+        )
+        kolom_x.append(f"CASE {cabang} ELSE {_sql_float(a.tabel[-1])} END AS x{j}")
+        kolom_ekstrem.append(f"MAX(x{j}) OVER periode AS max{j}, MIN(x{j}) OVER periode AS min{j}")
+
+        if krit.jenis == 'benefit':
+            r = f"(CASE WHEN max{j} > 0 THEN x{j} / max{j} ELSE x{j} END)"
+        else:
+            r = f"(CASE WHEN x{j} > 0 THEN min{j} / x{j} WHEN min{j} = 0 THEN 1::float8 ELSE 0::float8 END)"
+        kolom_r.append(f"{r} AS r{j}")
+        suku_skor.append(f"r{j} * {_sql_float(krit.normalize_bobot)}")
+    pemutus = "".join(f"r{j} DESC, " for j in kunci_sekunder(kriteria['normalize_bobot'].to_numpy(dtype=float)))
+
+    # 0 + ... menyamakan urutan akumulasi dengan penjumlahan numpy
+    return f"""
+        WITH x AS (
+            SELECT p.id_periode, p.id_pendaftaran, s.nama_siswa, {", ".join(kolom_x)}
+            FROM pendaftaran p
+            LEFT JOIN siswa s ON s.id_siswa = p.id_siswa
+            WHERE p.id_periode = ANY($1::int[]) AND p.status_validasi = 'valid'
+        ), ekstrem AS (
+            SELECT x.*, {", ".join(kolom_ekstrem)} FROM x
+            WINDOW periode AS (PARTITION BY id_periode)
+        ), r AS (
+            SELECT id_periode, id_pendaftaran, nama_siswa, {", ".join(kolom_r)} FROM ekstrem
+        ), skor AS (
+            SELECT r.*, (0::float8 + {" + ".join(suku_skor)}) AS nilai_akhir FROM r
+        )
+        SELECT id_periode, id_pendaftaran, nama_siswa, nilai_akhir,
+               ROW_NUMBER() OVER (
+                   PARTITION BY id_periode ORDER BY nilai_akhir DESC, {pemutus}id_pendaftaran
+               ) AS peringkat
+        FROM skor
+        ORDER BY id_periode, peringkat
+    """
+
+
+async def hitung_saw_sql_banyak(id_periode_list: List[int]) -> Dict[int, List[dict]]:
+    """Engine SQL: menjalankan perhitungan SAW beberapa periode di Postgres dalam satu query."""
+    if database.pool is None:
+        raise RuntimeError("Engine SQL membutuhkan pool database (SUPABASE_DB_URL_DSS).")
+    async with database.pool.acquire(timeout=database.DB_POOL_ACQUIRE_TIMEOUT) as conn:
+        kriteria = pd.DataFrame(
+            [dict(r) for r in await conn.fetch(
+                "SELECT kode_kriteria, jenis, normalize_bobot::float8 AS normalize_bobot "
+                "FROM kriteria_saw ORDER BY id_kriteria"
+            )],
+            columns=['kode_kriteria', 'jenis', 'normalize_bobot'],
+        )
+        with span("saw.sql"):
+            rows = await conn.fetch(susun_query_saw(kriteria), list(id_periode_list))
+
+    per_periode = {id_periode: [] for id_periode in id_periode_list}
+    for r in rows:
+        row = dict(r)
+        per_periode[row.pop('id_periode')].append(row)
+    return per_periode
+
+
+async def hitung_saw_sql(id_periode: int) -> List[dict]:
+    """Engine SQL untuk satu periode: hanya baris peringkat yang diambil dari Postgres."""
+    return (await hitung_saw_sql_banyak([id_periode]))[id_periode]
+
+
+async def bandingkan_engine(id_periode: int = ID_PERIODE_AKTIF) -> List[str]:
+    """
+    Menjalankan engine pandas dan engine SQL pada data yang sama lalu membandingkan
+    urutan peringkat dan nilai akhir. Mengembalikan daftar perbedaan (kosong jika identik).
+    """
+    kriteria, per_periode = await ambil_data_periode([id_periode])
+    hasil_pandas = bangun_mesin(kriteria, per_periode[id_periode]).hasil()
+    hasil_sql = await hitung_saw_sql(id_periode)
+
+    perbedaan = []
+    if len(hasil_pandas) != len(hasil_sql):
+        perbedaan.append(f"Jumlah baris berbeda: pandas={len(hasil_pandas)}, sql={len(hasil_sql)}")
+    for p, s in zip(hasil_pandas, hasil_sql):
+        if p['id_pendaftaran'] != s['id_pendaftaran'] or p['nilai_akhir'] != s['nilai_akhir']:
+            perbedaan.append(
+                f"Peringkat {p['peringkat']}: pandas=({p['id_pendaftaran']}, {p['nilai_akhir']}) "
+                f"sql=({s['id_pendaftaran']}, {s['nilai_akhir']})"
+            )
+    return perbedaan
+
+
+class HasilPeringkat:
+    """
+    Hasil peringkat satu periode dalam urutan engine: nilai akhir menurun, nilai seri diputus
+    dengan kriteria berbobot terbesar lalu `id_pendaftaran` (`urutan_peringkat`, sama dengan
+    `PeringkatInkremental.peringkat()` dan ROW_NUMBER() engine SQL). Karena sudah terurut, `kuota` pemenang cukup diambil dari awal urutan;
+    sisa peringkat baru dibentuk saat diminta lewat `sisa()` atau `semua()`.
+    """
+
+    def __init__(self, id_periode: int, jumlah: int, kuota: int, ambil_baris: Callable[..., List[dict]]):
+        self.id_periode = id_periode
+        self.jumlah = jumlah
+        self.kuota = min(max(kuota, 0), jumlah)
+        self._ambil_baris = ambil_baris
+        self._sisa: Optional[List[dict]] = None
+        self.rekomendasi = self._tandai(ambil_baris(0, self.kuota), 'direkomendasikan')
+
+    @classmethod
+    def dari_mesin(cls, id_periode: int, mesin: PeringkatInkremental, kuota: int) -> 'HasilPeringkat':
+        return cls(id_periode, len(mesin), kuota, mesin.potret())
+
+    @classmethod
+    def dari_baris(cls, id_periode: int, baris_hasil: List[dict], kuota: int) -> 'HasilPeringkat':
+        """`baris_hasil` sudah terurut berdasarkan peringkat (mis. dari engine SQL)."""
+        return cls(id_periode, len(baris_hasil), kuota, lambda mulai=0, batas=None: baris_hasil[mulai:batas])
+
+    def __len__(self):
+        return self.jumlah
+
+    @staticmethod
+    def _tandai(baris: List[dict], status_rekomendasi: str) -> List[dict]:
+        for row in baris:
+            row['status_rekomendasi'] = status_rekomendasi
+        return baris
+
+    def sisa(self) -> List[dict]:
+        """Pendaftar di luar kuota, dibentuk sekali saat pertama diminta."""
+        if self._sisa is None:
+            self._sisa = self._tandai(self._ambil_baris(self.kuota, None), 'tidak direkomendasikan')
+        return self._sisa
+
+    def semua(self) -> List[dict]:
+        """Seluruh peringkat: pemenang lalu sisa pendaftar."""
+        return self.rekomendasi + self.sisa()
+
+    def baris_database(self) -> List[dict]:
+        """Baris `hasil_saw` untuk seluruh peringkat, belum dipublikasikan."""
+        return [
+            {
+                'id_pendaftaran': row['id_pendaftaran'],
+                'nilai_akhir': row['nilai_akhir'],
+                'peringkat': row['peringkat'],
+                'status_rekomendasi': row['status_rekomendasi'],
+                'id_periode': self.id_periode,
+                'is_publish': False,
+            }
+            for row in self.semua()
+        ]
+
+
+async def ambil_kuota(id_periode_list: List[int]) -> Dict[int, int]:
+    """Kuota rekomendasi per periode dari `periode_beasiswa.kuota`, bawaan `KUOTA_REKOMENDASI`."""
+    response = await run_in_thread(supabase.table("periode_beasiswa")
+                                   .select("id_periode, kuota")
+                                   .in_("id_periode", id_periode_list)
+                                   .execute)
+    kuota = {id_periode: KUOTA_REKOMENDASI for id_periode in id_periode_list}
+    kuota.update({int(row['id_periode']): int(row['kuota']) for row in response.data if row.get('kuota') is not None})
+    return kuota
+
+
+async def hitung_banyak_periode(id_periode_list: Iterable[int], engine: str = None,
+                                muat_ulang: bool = False, kuota: Optional[int] = None) -> Dict[int, HasilPeringkat]:
+    """
+    Menghitung peringkat beberapa periode sekaligus dan mengembalikan hasil per `id_periode`.
+
+    - **engine**: "pandas" atau "sql", bawaan dari env `SAW_ENGINE`.
+    - **muat_ulang**: bangun ulang mesin pandas dari database (mis. setelah kriteria berubah).
+    - **kuota**: jumlah pendaftar yang direkomendasikan; bawaan dari kuota tiap periode.
+    """
+    engine = engine or SAW_ENGINE
+    id_periode_list = list(dict.fromkeys(int(p) for p in id_periode_list))
+    if engine not in ('sql', 'pandas'):
+        raise ValueError(f"Engine SAW '{engine}' tidak dikenal.")
+
+    # Kuota diambil bersamaan dengan perhitungan
+    kuota_task = asyncio.ensure_future(ambil_kuota(id_periode_list)) if kuota is None else None
+    try:
+        if engine == 'sql':
+            # Seluruh perhitungan dijalankan di Postgres, satu query untuk semua periode
+            per_periode = await hitung_saw_sql_banyak(id_periode_list)
+            susun = HasilPeringkat.dari_baris
+        else:
+            # Data hanya diambil dari Supabase untuk periode yang mesinnya belum dimuat;
+            # setelahnya mesin diperbarui per pendaftar oleh endpoint yang mengubah data.
+            belum = id_periode_list if muat_ulang else [p for p in id_periode_list if p not in mesin_peringkat]
+            mesin = {**mesin_peringkat, **(await muat_mesin_peringkat(belum) if belum else {})}
+            per_periode = {p: mesin[p] for p in id_periode_list}
+            susun = HasilPeringkat.dari_mesin
+        kuota_periode = await kuota_task if kuota_task else dict.fromkeys(id_periode_list, kuota)
+    finally:
+        if kuota_task and not kuota_task.done():
+            kuota_task.cancel()
+
+    with span("saw.top_k"):
+        return {p: susun(p, per_periode[p], kuota_periode[p]) for p in id_periode_list}
+
+
+async def main(engine: str = None, id_periode: int = ID_PERIODE_AKTIF, kuota: Optional[int] = None,
+               muat_ulang: bool = False) -> HasilPeringkat:
+    """
+    Fungsi utama untuk menjalankan seluruh proses perhitungan SAW dengan Supabase.
+
+    - **engine**: "pandas" atau "sql", bawaan dari env `SAW_ENGINE`.
+    - **id_periode**: periode yang dihitung, bawaan `ID_PERIODE_AKTIF`.
+    - **kuota**: jumlah pendaftar yang direkomendasikan, bawaan kuota periode.
+    - **muat_ulang**: baca ulang kriteria dan pendaftar dari database alih-alih memakai mesin di memori.
+    """
+    return (await hitung_banyak_periode([id_periode], engine, muat_ulang=muat_ulang, kuota=kuota))[id_periode]
+
+
+async def _cli(bandingkan: bool, id_periode_list: List[int]):
+    await database.open_pool()
+    try:
+        if bandingkan:
+            for id_periode in id_periode_list:
+                perbedaan = await bandingkan_engine(id_periode)
+                print("\n".join(perbedaan) or f"Periode {id_periode}: engine pandas dan SQL menghasilkan peringkat yang identik.")
+        else:
+            hasil = await hitung_banyak_periode(id_periode_list)
+            for id_periode, hasil_periode in hasil.items():
+                if len(hasil) > 1:
+                    print(f"# Periode {id_periode}")
+                print(json.dumps(hasil_periode.semua()))
+    finally:
+        await database.close_pool()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    import sys
+    # Pemakaian: python calculate_saw.py [--bandingkan] [id_periode ...]
+    asyncio.run(_cli(
+        bandingkan="--bandingkan" in sys.argv,
+        id_periode_list=[int(arg) for arg in sys.argv[1:] if arg.isdigit()] or [ID_PERIODE_AKTIF],
+    ))
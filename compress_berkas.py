@@ -0,0 +1,113 @@
+import io
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+# Pillow dan pikepdf bersifat opsional: jika tidak terpasang, berkas diunggah apa adanya
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+# Konfigurasi kompresi berkas pendukung
+KOMPRESI_AKTIF = os.getenv("KOMPRESI_AKTIF", "true").lower() == "true"
+KOMPRESI_MAX_DIMENSI = int(os.getenv("KOMPRESI_MAX_DIMENSI", 2000))
+KOMPRESI_KUALITAS = int(os.getenv("KOMPRESI_KUALITAS", 80))
+KOMPRESI_WORKERS = int(os.getenv("KOMPRESI_WORKERS", 2))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def deteksi_tipe(header: bytes) -> Optional[str]:
+    """Mendeteksi content type dari beberapa byte pertama file (tidak percaya pada header klien)."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header.startswith(b"%PDF"):
+        return "application/pdf"
+    return None
+
+
+def kompres_gambar(data: bytes, max_dimensi: int, kualitas: int) -> Tuple[bytes, str]:
+    """Memperkecil gambar ke `max_dimensi` lalu menyimpannya ulang sebagai JPEG (atau PNG jika transparan)."""
+    with Image.open(io.BytesIO(data)) as gambar:
+        # Foto dari HP sering tersimpan miring dengan orientasi di EXIF
+        gambar = ImageOps.exif_transpose(gambar)
+        gambar.thumbnail((max_dimensi, max_dimensi))
+
+        output = io.BytesIO()
+        if gambar.mode in ("RGBA", "LA") or (gambar.mode == "P" and "transparency" in gambar.info):
+            gambar.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "image/png"
+
+        gambar.convert("RGB").save(output, format="JPEG", quality=kualitas, optimize=True, progressive=True)
+        return output.getvalue(), "image/jpeg"
+
+
+def kompres_pdf(data: bytes) -> bytes:
+    """Menyimpan ulang PDF dengan stream terkompresi dan object stream."""
+    output = io.BytesIO()
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        pdf.save(
+            output,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        )
+    return output.getvalue()
+
+
+def kompres_berkas(data: bytes, content_type: str, max_dimensi: int, kualitas: int) -> Tuple[bytes, str]:
+    """
+    Dijalankan di process pool. Mengembalikan `(data, content_type)` hasil kompresi,
+    atau data asli jika format tidak didukung, gagal diproses, atau hasilnya tidak lebih kecil.
+    """
+    try:
+        if content_type.startswith("image/") and Image is not None:
+            hasil, tipe_hasil = kompres_gambar(data, max_dimensi, kualitas)
+        elif content_type == "application/pdf" and pikepdf is not None:
+            hasil, tipe_hasil = kompres_pdf(data), content_type
+        else:
+            return data, content_type
+    except Exception:
+        # Berkas rusak/tidak dikenali tetap diunggah apa adanya untuk diperiksa validator
+        return data, content_type
+
+    if len(hasil) >= len(data):
+        return data, content_type
+    return hasil, tipe_hasil
+
+
+def bisa_dikompres(content_type: Optional[str]) -> bool:
+    if not KOMPRESI_AKTIF or content_type is None:
+        return False
+    if content_type.startswith("image/"):
+        return Image is not None
+    return content_type == "application/pdf" and pikepdf is not None
+
+
+async def kompres(data: bytes, content_type: str) -> Tuple[bytes, str]:
+    """Menjalankan `kompres_berkas` di process pool agar tidak membebani worker API."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=KOMPRESI_WORKERS)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _pool, kompres_berkas, data, content_type, KOMPRESI_MAX_DIMENSI, KOMPRESI_KUALITAS
+    )
+
+
+def tutup_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
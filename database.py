@@ -0,0 +1,110 @@
+import os
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+import asyncpg
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+from metrics import span
+
+load_dotenv()
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("SUPABASE_DB_URL_DSS")
+
+# Konfigurasi pool koneksi Postgres
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 5))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 30))
+# Koneksi idle lebih lama dari ini ditutup agar tidak diputus sepihak oleh pooler Supabase
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", 300))
+
+pool: Optional[asyncpg.Pool] = None
+
+
+async def open_pool():
+    """Membuat pool koneksi aplikasi dan memastikan database dapat dihubungi."""
+    global pool
+    if not DATABASE_URL:
+        logger.warning("SUPABASE_DB_URL_DSS tidak diset, pool database tidak dibuat")
+        return
+    pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        # statement cache dimatikan karena Supabase memakai pgbouncer mode transaksi
+        statement_cache_size=0,
+    )
+    await check_pool()
+    logger.info("Pool database siap", extra={"min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE})
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+async def check_pool() -> bool:
+    """Health check: menjalankan `SELECT 1` melalui pool."""
+    if pool is None:
+        return False
+    async with pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT) as conn:
+        return await conn.fetchval("SELECT 1") == 1
+
+
+async def get_db() -> AsyncIterator[asyncpg.Connection]:
+    """Dependency FastAPI: meminjam satu koneksi dari pool dan selalu mengembalikannya."""
+    if pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Koneksi database belum tersedia."
+        )
+    try:
+        conn = await pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    except (asyncio.TimeoutError, TimeoutError):
+        # asyncpg melempar asyncio.TimeoutError; baru sama dengan TimeoutError sejak Python 3.11
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Semua koneksi database sedang dipakai, coba lagi."
+        )
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+# Klien Supabase (supabase-py) bersifat sinkron. Setiap panggilan dijalankan di
+# thread pool terbatas agar event loop hypercorn tidak tertahan selama round trip HTTP.
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", 16))
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_MAX_WORKERS, thread_name_prefix="supabase")
+
+
+def _nama_span(fn: Callable) -> str:
+    # Query builder postgrest menyimpan method dan path (tabel atau /rpc/...);
+    # method storage dan fungsi lain dinamai dari nama fungsinya
+    pemilik = getattr(fn, "__self__", None)
+    nama = getattr(fn, "__name__", "call")
+    if getattr(pemilik, "http_method", None) and getattr(pemilik, "path", None):
+        return f"supabase {pemilik.http_method} {pemilik.path}"
+    if type(pemilik).__module__.startswith("storage3"):
+        return f"supabase storage.{nama}"
+    return f"thread {nama}"
+
+
+async def run_in_thread(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Menjalankan fungsi sinkron (mis. `query.execute`) di thread pool Supabase, diukur sebagai span."""
+    loop = asyncio.get_running_loop()
+    with span(_nama_span(fn)):
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,275 @@
+import os
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel
+
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Backend penyimpanan status job: "memory" (bawaan) atau "sqlite" agar status job tetap
+# terbaca setelah restart dan dari worker hypercorn lain pada mesin yang sama.
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_SQLITE_PATH = os.getenv("JOB_SQLITE_PATH", "jobs.sqlite3")
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", 256))
+# Job aktif yang tidak melapor progress selama ini (detik) dianggap terhenti, mis. karena
+# worker yang menjalankannya mati, sehingga tidak menahan deduplikasi selamanya.
+JOB_KEDALUWARSA = float(os.getenv("JOB_KEDALUWARSA", 600))
+# Selama berjalan, `diperbarui` disegarkan setiap sekian detik walaupun job tidak melapor
+# progress, agar job yang lama tapi masih hidup tidak dianggap terhenti.
+JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", 30))
+
+STATUS_AKTIF = ("antri", "berjalan")
+
+
+class Job(BaseModel):
+    id: str
+    jenis: str
+    kunci: str
+    # Kunci deduplikasi yang dipegang selama job aktif, mis. satu per periode untuk job
+    # banyak periode; bawaannya hanya `kunci`.
+    klaim: List[str] = []
+    status: Literal["antri", "berjalan", "selesai", "gagal"] = "antri"
+    progress: float = 0.0
+    pesan: Optional[str] = None
+    hasil: Optional[Dict[str, Any]] = None
+    dibuat: datetime
+    diperbarui: datetime
+
+    @property
+    def aktif(self) -> bool:
+        return self.status in STATUS_AKTIF
+
+
+def _hentikan(job: Job):
+    job.status, job.pesan, job.diperbarui = "gagal", "Job terhenti", datetime.now()
+
+
+class MemoryJobStore:
+    """Menyimpan job di memori proses, riwayat dibatasi `JOB_HISTORY_SIZE`."""
+
+    def __init__(self, maxsize: int = JOB_HISTORY_SIZE):
+        self._jobs = LRUCache(maxsize=maxsize)
+        self._aktif: Dict[str, str] = {}
+
+    def simpan(self, job: Job):
+        self._jobs.set(job.id, job)
+        for kunci in job.klaim:
+            if job.aktif:
+                self._aktif[kunci] = job.id
+            elif self._aktif.get(kunci) == job.id:
+                del self._aktif[kunci]
+
+    def ambil(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def aktif_untuk(self, kunci: str) -> Optional[Job]:
+        job_id = self._aktif.get(kunci)
+        return self._jobs.get(job_id) if job_id else None
+
+    def klaim(self, job: Job, batas: datetime) -> Optional[Job]:
+        """
+        Menyimpan `job` baru beserta klaimnya, atau mengembalikan job aktif yang sudah memegang
+        salah satu klaim. Pemegang yang tidak diperbarui sejak `batas` dianggap terhenti.
+        """
+        pemegang = [lama for lama in map(self.aktif_untuk, job.klaim) if lama is not None]
+        for lama in pemegang:
+            if lama.diperbarui >= batas:
+                return lama
+        for lama in pemegang:
+            _hentikan(lama)
+            self.simpan(lama)
+        self.simpan(job)
+        return None
+
+
+class _KlaimDipegang(Exception):
+    def __init__(self, job: Job):
+        self.job = job
+
+
+class SqliteJobStore:
+    """
+    Menyimpan job di file SQLite lokal.
+
+    Klaim job aktif disimpan di tabel `job_klaim` dengan unique index parsial, sehingga satu
+    kunci hanya bisa dipegang satu job aktif walaupun beberapa worker mengirim bersamaan.
+    """
+
+    def __init__(self, path: str = JOB_SQLITE_PATH):
+        # Transaksi diatur sendiri (BEGIN IMMEDIATE saat klaim)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job (id TEXT PRIMARY KEY, kunci TEXT, status TEXT, data TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_kunci_status ON job (kunci, status)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_klaim (id TEXT, kunci TEXT, status TEXT, diperbarui REAL)"
+            )
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_job_klaim_aktif ON job_klaim (kunci) "
+                "WHERE status IN ('antri', 'berjalan')"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_klaim_id ON job_klaim (id)")
+
+    @contextmanager
+    def _transaksi(self, mode: str = "DEFERRED"):
+        with self._lock:
+            self._conn.execute(f"BEGIN {mode}")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _tulis(conn: sqlite3.Connection, job: Job):
+        conn.execute(
+            "INSERT OR REPLACE INTO job (id, kunci, status, data) VALUES (?, ?, ?, ?)",
+            (job.id, job.kunci, job.status, job.json())
+        )
+        conn.execute(
+            "UPDATE job_klaim SET status = ?, diperbarui = ? WHERE id = ?",
+            (job.status, job.diperbarui.timestamp(), job.id)
+        )
+
+    def simpan(self, job: Job):
+        with self._transaksi() as conn:
+            self._tulis(conn, job)
+
+    def ambil(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM job WHERE id = ?", (job_id,)).fetchone()
+        return Job.parse_raw(row[0]) if row else None
+
+    @staticmethod
+    def _pemegang(conn: sqlite3.Connection, kunci: str) -> Optional[Job]:
+        row = conn.execute(
+            "SELECT j.data FROM job_klaim k JOIN job j ON j.id = k.id "
+            "WHERE k.kunci = ? AND k.status IN ('antri', 'berjalan')", (kunci,)
+        ).fetchone()
+        return Job.parse_raw(row[0]) if row else None
+
+    def aktif_untuk(self, kunci: str) -> Optional[Job]:
+        with self._lock:
+            return self._pemegang(self._conn, kunci)
+
+    def klaim(self, job: Job, batas: datetime) -> Optional[Job]:
+        """Sama dengan `MemoryJobStore.klaim`, dalam satu transaksi tulis (BEGIN IMMEDIATE)."""
+        tanda = ", ".join("?" * len(job.klaim))
+        try:
+            with self._transaksi("IMMEDIATE") as conn:
+                basi = conn.execute(
+                    f"SELECT DISTINCT j.data FROM job_klaim k JOIN job j ON j.id = k.id "
+                    f"WHERE k.kunci IN ({tanda}) AND k.status IN ('antri', 'berjalan') AND k.diperbarui < ?",
+                    (*job.klaim, batas.timestamp())
+                ).fetchall()
+                for (data,) in basi:
+                    lama = Job.parse_raw(data)
+                    _hentikan(lama)
+                    self._tulis(conn, lama)
+
+                self._tulis(conn, job)
+                for kunci in job.klaim:
+                    tersimpan = conn.execute(
+                        "INSERT OR IGNORE INTO job_klaim (id, kunci, status, diperbarui) VALUES (?, ?, ?, ?)",
+                        (job.id, kunci, job.status, job.diperbarui.timestamp())
+                    ).rowcount
+                    if not tersimpan:
+                        raise _KlaimDipegang(self._pemegang(conn, kunci))
+        except _KlaimDipegang as e:
+            return e.job
+        return None
+
+
+class JobManager:
+    """
+    Menjalankan job sebagai task asyncio di dalam proses.
+
+    Job dengan klaim yang sama (mis. perhitungan peringkat untuk satu periode) tidak
+    dijalankan dua kali: selama masih aktif, pengiriman berikutnya mendapat job yang sama.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or (SqliteJobStore() if JOB_BACKEND == "sqlite" else MemoryJobStore())
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, jenis: str, kunci: str,
+               fn: Callable[[Callable[[float, str], None]], Awaitable[Dict[str, Any]]],
+               klaim: Optional[List[str]] = None) -> Job:
+        """
+        Mengirim job baru, atau mengembalikan job aktif yang sudah memegang salah satu `klaim`
+        (bawaannya `[kunci]`). `fn` menerima fungsi `lapor(progress, pesan)` dan mengembalikan dict hasil.
+        """
+        sekarang = datetime.now()
+        job = Job(id=uuid.uuid4().hex, jenis=jenis, kunci=kunci, klaim=klaim or [kunci],
+                  dibuat=sekarang, diperbarui=sekarang)
+        aktif = self.store.klaim(job, sekarang - timedelta(seconds=JOB_KEDALUWARSA))
+        if aktif is not None:
+            return aktif
+
+        task = asyncio.create_task(self._jalankan(job, fn))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        logger.info("Job dikirim", extra={"job_id": job.id, "jenis": jenis, "kunci": kunci})
+        return job
+
+    def aktif_untuk(self, kunci: str) -> Optional[Job]:
+        """Job aktif yang memegang `kunci`, kecuali yang sudah dianggap terhenti."""
+        job = self.store.aktif_untuk(kunci)
+        if job is None or (datetime.now() - job.diperbarui).total_seconds() > JOB_KEDALUWARSA:
+            return None
+        return job
+
+    def ambil(self, job_id: str) -> Optional[Job]:
+        return self.store.ambil(job_id)
+
+    async def tunggu(self, job_id: str, interval: float = 0.5) -> Optional[Job]:
+        """
+        Menunggu job sampai selesai atau gagal. Job milik proses lain (backend SQLite)
+        ditunggu dengan membaca ulang statusnya setiap `interval` detik.
+        """
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        job = self.ambil(job_id)
+        while job is not None and job.aktif:
+            await asyncio.sleep(interval)
+            job = self.ambil(job_id)
+        return job
+
+    async def _jalankan(self, job: Job, fn):
+        def lapor(progress: float, pesan: str):
+            job.progress, job.pesan, job.diperbarui = progress, pesan, datetime.now()
+            self.store.simpan(job)
+
+        async def detak():
+            while True:
+                await asyncio.sleep(JOB_HEARTBEAT)
+                job.diperbarui = datetime.now()
+                self.store.simpan(job)
+
+        job.status = "berjalan"
+        lapor(0.0, "Dimulai")
+        detak_task = asyncio.create_task(detak())
+        try:
+            job.hasil = await fn(lapor)
+            job.status = "selesai"
+            lapor(1.0, "Selesai")
+            logger.info("Job selesai", extra={"job_id": job.id, "jenis": job.jenis})
+        except Exception as e:
+            job.status = "gagal"
+            lapor(job.progress, str(e))
+            logger.exception("Job gagal", extra={"job_id": job.id, "jenis": job.jenis})
+        finally:
+            detak_task.cancel()
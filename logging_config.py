@@ -0,0 +1,39 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" untuk log terstruktur (satu objek JSON per baris) atau "text" untuk pengembangan lokal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Atribut bawaan LogRecord; atribut lain berasal dari `extra=` dan ikut ditulis sebagai field
+_ATRIBUT_BAWAAN = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "waktu": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "pesan": record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in _ATRIBUT_BAWAAN})
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL, format: str = LOG_FORMAT):
+    """Mengonfigurasi root logger sekali untuk seluruh aplikasi."""
+    handler = logging.StreamHandler()
+    if format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # Client Supabase mencatat setiap request httpx di level INFO; sudah terwakili oleh span
+    logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -1,31 +1,67 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, status
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, status, Depends, Query, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel, ValidationError
 
 import asyncpg
+import asyncio
+import logging
 import os
+import time
+import io
+import csv
+import math
+import hashlib
 from dotenv import load_dotenv
 from datetime import date
-from typing import Optional, Dict, Annotated, List, Literal
+from typing import Optional, Dict, Annotated, List, Literal, AsyncIterator, Tuple
 import hypercorn
+import numpy as np
+import pandas as pd
 from supabase import create_client, Client
-from calculate_saw import main
+from calculate_saw import (
+    main, hitung_banyak_periode, HasilPeringkat, perbarui_pendaftar, perbarui_banyak_pendaftar, hapus_pendaftar,
+    ambil_mesin, analisis_sensitivitas, ID_PERIODE_AKTIF
+)
+from cache import LRUCache, TTLCache, ReadThroughCache, buat_cache_backend
 import json
 from datetime import datetime
+from contextlib import asynccontextmanager
+from database import get_db, open_pool, close_pool, check_pool, run_in_thread
+from compress_berkas import deteksi_tipe, bisa_dikompres, kompres, tutup_pool
+from jobs import Job, JobManager
+from statistik import StatistikPendaftaran
+from publikasi import CachePublikasi
+import database
+from metrics import registry, span, HTTP_DURASI, HTTP_TOTAL
+from logging_config import setup_logging
 
 load_dotenv()  # loads from .env file
 
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Connect Supabase via API
 url : str = os.environ.get('SUPABASE_API_URL_DSS')
 key : str = os.environ.get('SUPABASE_API_KEY_DSS')
 
-DATABASE_URL = os.getenv("SUPABASE_DB_URL_DSS")
-
 supabase: Client = create_client(url, key)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool koneksi Postgres dibuat sekali untuk seluruh aplikasi
+    await open_pool()
+    yield
+    await close_pool()
+    await siswa_cache.tutup()
+    tutup_pool()
+
 app = FastAPI(
     title="Scholarship Decision Support System API",
     version="1.0.0",
-    description="Dokumentasi API untuk sistem penunjang keputusan beasiswa"
+    description="Dokumentasi API untuk sistem penunjang keputusan beasiswa",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -34,10 +70,96 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-async def get_db():
-    return await asyncpg.connect(DATABASE_URL, statement_cache_size=0)
+# Cache hasil peringkat, dikunci dengan (id_periode, versi_data, fresh).
+# versi_data dinaikkan setiap kali ada penulisan ke pendaftaran/siswa/kriteria_saw/hasil_saw,
+# sehingga hasil yang dihitung sebelum penulisan tidak akan terbaca lagi. versi_data hanya
+# berlaku di worker ini; penulisan lewat worker lain baru terlihat setelah RANK_CACHE_TTL detik.
+RANK_CACHE_TTL = float(os.getenv("RANK_CACHE_TTL", 30))
+rank_cache = TTLCache(maxsize=int(os.getenv("RANK_CACHE_MAXSIZE", 8)), ttl=RANK_CACHE_TTL)
+versi_data = 0
+
+def invalidasi_ranking():
+    global versi_data
+    versi_data += 1
+    rank_cache.clear()
+    publikasi.invalidasi_hasil()
+
+# Cache hasil verifikasi /siswa/check. Kuncinya hash SHA-256 dari data identitas sehingga
+# NISN/NIK tidak tersimpan mentah di memori. Hasil "tidak ditemukan" juga di-cache
+# (negative caching) dengan TTL lebih pendek agar percobaan ulang dengan data yang salah
+# tidak selalu sampai ke database. TTL pendek yang sama dipakai untuk `sudah_mendaftar=False`,
+# karena pendaftaran lewat worker lain tidak ikut menginvalidasi cache di worker ini.
+SISWA_CHECK_TTL = float(os.getenv("SISWA_CHECK_TTL", 300))
+SISWA_CHECK_TTL_NEGATIF = float(os.getenv("SISWA_CHECK_TTL_NEGATIF", 30))
+SISWA_CHECK_CACHE_MAXSIZE = int(os.getenv("SISWA_CHECK_CACHE_MAXSIZE", 10000))
+siswa_check_cache = TTLCache(maxsize=SISWA_CHECK_CACHE_MAXSIZE, ttl=SISWA_CHECK_TTL)
+
+def _buang_check_siswa(id_siswa: int, kunci_siswa: set):
+    # id_siswa yang keluar dari indeks tidak bisa diinvalidasi lagi, jadi entrinya ikut dibuang
+    for kunci in kunci_siswa:
+        siswa_check_cache.pop(kunci)
+
+# id_siswa -> kunci cache miliknya, agar entri bisa dibuang saat status pendaftarannya berubah
+kunci_check_per_siswa = LRUCache(maxsize=SISWA_CHECK_CACHE_MAXSIZE, saat_dibuang=_buang_check_siswa)
+
+# Cache read-through per siswa untuk /siswa/detail dan /pendaftaran/status, dikunci dengan
+# id_siswa. Backend "memory" (bawaan) hanya berlaku di satu worker; "redis" dibagi oleh semua
+# worker hypercorn sehingga invalidasi dari satu worker langsung terlihat di worker lain.
+SISWA_CACHE_BACKEND = os.getenv("SISWA_CACHE_BACKEND", "memory")
+SISWA_CACHE_TTL = float(os.getenv("SISWA_CACHE_TTL", 60))
+SISWA_CACHE_MAXSIZE = int(os.getenv("SISWA_CACHE_MAXSIZE", 10000))
+siswa_cache = ReadThroughCache(
+    "siswa",
+    buat_cache_backend(SISWA_CACHE_BACKEND, SISWA_CACHE_MAXSIZE, SISWA_CACHE_TTL, os.getenv("SISWA_CACHE_REDIS_URL")),
+    ttl=SISWA_CACHE_TTL
+)
+
+async def lupakan_siswa(id_siswa):
+    """Membuang data cache milik satu siswa setelah datanya atau pendaftarannya berubah."""
+    if id_siswa is not None:
+        await siswa_cache.hapus(f"siswa:{id_siswa}:detail", f"siswa:{id_siswa}:pendaftaran")
+
+# Job perhitungan peringkat berjalan di latar belakang, satu job aktif per periode
+job_manager = JobManager()
+
+# Agregat statistik pendaftaran per periode, diperbarui bersama mesin peringkat
+statistik = StatistikPendaftaran(supabase)
+
+registry.gauge("dss_rank_cache_entries", "Jumlah entri cache hasil peringkat.", lambda: len(rank_cache))
+registry.gauge("dss_siswa_check_cache_entries", "Jumlah entri cache verifikasi siswa.",
+               lambda: len(siswa_check_cache))
+registry.gauge("dss_publikasi_periode", "Jumlah periode yang status publikasinya di-cache.",
+               lambda: len(publikasi))
+registry.gauge("dss_statistik_pendaftar", "Jumlah pendaftaran yang tercakup agregat statistik.",
+               lambda: len(statistik))
+registry.gauge("dss_db_pool_size", "Jumlah koneksi di pool database.",
+               lambda: database.pool.get_size() if database.pool else None)
+registry.gauge("dss_db_pool_idle", "Jumlah koneksi menganggur di pool database.",
+               lambda: database.pool.get_idle_size() if database.pool else None)
+
+@app.middleware("http")
+async def ukur_permintaan(request: Request, call_next):
+    """Mencatat durasi dan jumlah permintaan per route (template path, bukan URL mentah)."""
+    mulai = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        durasi = time.perf_counter() - mulai
+        route = request.scope.get("route")
+        label = {
+            "method": request.method,
+            "route": getattr(route, "path", "tidak_dikenal"),
+            "status": str(status_code),
+        }
+        HTTP_DURASI.observe(durasi, **label)
+        HTTP_TOTAL.inc(**label)
+        logger.debug("request", extra={**label, "durasi_ms": round(durasi * 1000, 3)})
 
 # ===========================================================================
 # Models
@@ -53,11 +175,16 @@ class IsPublishResponse(BaseModel):
 class PublishStatusUpdate(BaseModel):
     is_publish: bool
 
+class KuotaUpdate(BaseModel):
+    # None mengembalikan periode ke kuota bawaan
+    kuota: Optional[int] = None
+
 class SiswaCheckRequest(BaseModel):
     nisn: str
     nis: str
     nik: str
     tanggal_lahir: date
+    id_periode: int = ID_PERIODE_AKTIF
 
 # Model untuk data yang dikembalikan oleh server jika sukses
 class SiswaCheckResponse(BaseModel):
@@ -115,36 +242,53 @@ class SubmissionPayload(BaseModel):
     id_siswa: str
     personal_data: PersonalData
     detailKeluarga: DetailKeluarga = None
+    id_periode: int = ID_PERIODE_AKTIF
 
 # Model untuk output statistik
 class StatistikPendaftaranResponse(BaseModel):
     jumlah_pendaftar: int
     rerata_nilai: float
     rerata_peringkat: float
+    per_status: Dict[str, int] = {}
+    per_kelas: Dict[str, int] = {}
+
+class BandKriteria(BaseModel):
+    label: str
+    skor: float
+    jumlah: int
+
+class DistribusiKriteriaResponse(BaseModel):
+    kode: str
+    kolom: str
+    jumlah: int
+    rerata: Optional[float] = None
+    simpangan_baku: Optional[float] = None
+    band: List[BandKriteria]
 
+# Field dibuat opsional agar proyeksi kolom (`fields=`) dapat mengembalikan sebagian data
 class PersonalData(BaseModel):
     id_siswa: int
     nis: Optional[str] = None
     nisn: Optional[str] = None
     nik: Optional[str] = None
     tanggal_lahir: Optional[date] = None
-    nama_siswa: str
+    nama_siswa: Optional[str] = None
     kelas: Optional[str] = "Belum ada kelas"
     alamat_email: Optional[str] = None
     no_telepon: Optional[str] = None
 
 class PendaftaranData(BaseModel):
     id_pendaftaran: int
-    status_validasi: str
-    penghasilan_orangtua : int
-    jumlah_tanggungan : int
-    luas_rumah : int
-    peringkat_kelas : int
-    rerata_nilai : int
-    file_keterangan_penghasilan : str
-    file_kartu_keluarga : str
-    file_pbb : str
-    file_rapor : str
+    status_validasi: Optional[str] = None
+    penghasilan_orangtua : Optional[int] = None
+    jumlah_tanggungan : Optional[int] = None
+    luas_rumah : Optional[int] = None
+    peringkat_kelas : Optional[int] = None
+    rerata_nilai : Optional[int] = None
+    file_keterangan_penghasilan : Optional[str] = None
+    file_kartu_keluarga : Optional[str] = None
+    file_pbb : Optional[str] = None
+    file_rapor : Optional[str] = None
     # Tambahkan field lain dari tabel 'pendaftaran' jika perlu
     # contoh: tanggal_daftar, dll.
 
@@ -156,6 +300,13 @@ class StatusUpdateRequest(BaseModel):
     # Gunakan Literal untuk membatasi nilai yang diterima
     status_validasi: Literal['valid', 'tidak valid']
 
+class StatusUpdateItem(StatusUpdateRequest):
+    id_pendaftaran: int
+
+class BulkStatusUpdateResponse(BaseModel):
+    diperbarui: List[int]
+    tidak_ditemukan: List[int]
+
 class RankDetailResponse(BaseModel):
     nama_siswa: str
     kelas: Optional[str] = "N/A"
@@ -167,30 +318,87 @@ class RankDetailResponse(BaseModel):
     skor: float
     status_rekomendasi: str
 
+class SkenarioBobot(BaseModel):
+    nama: Optional[str] = None
+    # kode_kriteria -> bobot; kriteria yang tidak disebut memakai bobot saat ini
+    bobot: Dict[str, float]
+
+class WhatIfRequest(BaseModel):
+    id_periode: int = ID_PERIODE_AKTIF
+    top_n: int = 5
+    sertakan_peringkat: bool = False
+    skenario: List[SkenarioBobot]
+
+class HasilSkenario(BaseModel):
+    nama: Optional[str] = None
+    bobot: Dict[str, float]
+    kendall_tau: float
+    top_n: List[int]
+    masuk_top_n: List[int]
+    keluar_top_n: List[int]
+    peringkat: Optional[List[int]] = None
+
+class WhatIfResponse(BaseModel):
+    id_periode: int
+    jumlah_pendaftar: int
+    bobot_dasar: Dict[str, float]
+    top_n_dasar: List[int]
+    skenario: List[HasilSkenario]
+
 class SuccessResponse(BaseModel):
     message: str
     records_processed: int
 
+class SaveRankResponse(SuccessResponse):
+    diinsert: int
+    diupdate: int
+    dihapus: int
+
+class BulkImportError(BaseModel):
+    baris: int
+    nisn: Optional[str] = None
+    nik: Optional[str] = None
+    pesan: str
+
+class BulkImportResponse(BaseModel):
+    jumlah_baris: int
+    berhasil: int
+    gagal: List[BulkImportError]
+
 # ===========================================================================
 # Auth
 # ===========================================================================
 
 @app.post("/login", tags=["OAuth"])
-async def login(data: LoginRequest):
+async def login(data: LoginRequest, conn: asyncpg.Connection = Depends(get_db)):
     """Endpoint login untuk mengakses Platform.
 
     - **email**: String email
     - **password**: String password
     """
 
-    conn = await get_db()
     result = await conn.fetchrow('SELECT nama FROM "admin" WHERE username=$1 AND password=$2', data.email, data.password)
 
-    await conn.close()
     if not result:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return {"message": "Login successful", "data": dict(result)}
 
+@app.get("/health", tags=["Health"])
+async def health():
+    """Memeriksa apakah pool koneksi database dapat menjalankan query."""
+    try:
+        db_ok = await check_pool()
+    except Exception:
+        db_ok = False
+    if not db_ok:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Database tidak dapat dihubungi.")
+    return {"status": "ok"}
+
+@app.get("/metrics", tags=["Health"], response_class=Response)
+async def metrics():
+    """Histogram dan counter dalam format teks Prometheus."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
+
 # ===========================================================================
 # Pendaftaran Beasiswa
 # ===========================================================================
@@ -206,7 +414,7 @@ async def delete_pendaftaran(id_pendaftaran: int):
     Endpoint untuk menghapus sebuah record pendaftaran berdasarkan ID-nya.
     """
     try:
-        delete_response = supabase.table("pendaftaran").delete().eq("id_pendaftaran", id_pendaftaran).execute()
+        delete_response = await run_in_thread(supabase.table("pendaftaran").delete().eq("id_pendaftaran", id_pendaftaran).execute)
 
         if not delete_response.data:
             raise HTTPException(
@@ -214,6 +422,12 @@ async def delete_pendaftaran(id_pendaftaran: int):
                 detail="Gagal menghapus record dari database (mungkin sudah terhapus)."
             )
 
+        hapus_pendaftar(id_pendaftaran)
+        statistik.hapus(id_pendaftaran)
+        lupakan_check_siswa(delete_response.data[0].get("id_siswa"))
+        await lupakan_siswa(delete_response.data[0].get("id_siswa"))
+        invalidasi_ranking()
+
         return DeleteResponse(
             message="Data pendaftaran dan file terkait berhasil dihapus.",
             id_pendaftaran_dihapus=id_pendaftaran
@@ -225,105 +439,317 @@ async def delete_pendaftaran(id_pendaftaran: int):
             detail=f"Terjadi kesalahan pada server: {str(e)}"
         )
 
+HASIL_SAW_KOLOM = ["nilai_akhir", "peringkat", "status_rekomendasi", "is_publish"]
+
+def hasil_berubah(lama: dict, baru: dict) -> bool:
+    return (
+        not math.isclose(float(lama["nilai_akhir"]), float(baru["nilai_akhir"]), rel_tol=0, abs_tol=1e-12)
+        or lama["peringkat"] != baru["peringkat"]
+        or lama["status_rekomendasi"] != baru["status_rekomendasi"]
+        or lama["is_publish"] != baru["is_publish"]
+    )
+
+async def simpan_hasil_saw(conn: asyncpg.Connection, id_periode: int, data_baru: List[dict]) -> Dict[str, int]:
+    """
+    Menyimpan hasil peringkat satu periode secara atomik dan hanya menulis baris yang berubah.
+
+    Hasil lama dikunci (`FOR UPDATE`) lalu dibandingkan dengan hasil baru di dalam satu
+    transaksi, sehingga pembaca selalu melihat peringkat lama atau baru secara utuh.
+    Mengembalikan jumlah baris yang di-insert, di-update, dan dihapus.
+    """
+    async with conn.transaction():
+        lama = {
+            row["id_pendaftaran"]: dict(row)
+            for row in await conn.fetch(
+                "SELECT id_pendaftaran, nilai_akhir, peringkat, status_rekomendasi, is_publish "
+                "FROM hasil_saw WHERE id_periode = $1 FOR UPDATE",
+                id_periode
+            )
+        }
+        baru = {row["id_pendaftaran"]: row for row in data_baru}
+
+        dihapus = [id_pendaftaran for id_pendaftaran in lama if id_pendaftaran not in baru]
+        diinsert = [row for id_pendaftaran, row in baru.items() if id_pendaftaran not in lama]
+        diupdate = [row for id_pendaftaran, row in baru.items()
+                    if id_pendaftaran in lama and hasil_berubah(lama[id_pendaftaran], row)]
+
+        if dihapus:
+            await conn.execute(
+                "DELETE FROM hasil_saw WHERE id_periode = $1 AND id_pendaftaran = ANY($2::int[])",
+                id_periode, dihapus
+            )
+        if diupdate:
+            await conn.execute(
+                """
+                UPDATE hasil_saw h
+                SET nilai_akhir = v.nilai_akhir, peringkat = v.peringkat,
+                    status_rekomendasi = v.status_rekomendasi, is_publish = v.is_publish
+                FROM unnest($2::int[], $3::float8[], $4::int[], $5::text[], $6::bool[])
+                    AS v(id_pendaftaran, nilai_akhir, peringkat, status_rekomendasi, is_publish)
+                WHERE h.id_periode = $1 AND h.id_pendaftaran = v.id_pendaftaran
+                """,
+                id_periode, *[[row[k] for row in diupdate] for k in ["id_pendaftaran"] + HASIL_SAW_KOLOM]
+            )
+        if diinsert:
+            await conn.execute(
+                """
+                INSERT INTO hasil_saw (id_periode, id_pendaftaran, nilai_akhir, peringkat, status_rekomendasi, is_publish)
+                SELECT $1, * FROM unnest($2::int[], $3::float8[], $4::int[], $5::text[], $6::bool[])
+                """,
+                id_periode, *[[row[k] for row in diinsert] for k in ["id_pendaftaran"] + HASIL_SAW_KOLOM]
+            )
+
+    return {"diinsert": len(diinsert), "diupdate": len(diupdate), "dihapus": len(dihapus)}
+
+async def simpan_hasil_periode(id_periode: int, hasil: HasilPeringkat) -> dict:
+    """Menyimpan hasil perhitungan satu periode (dari `main`) ke `hasil_saw`."""
+    data_to_insert = hasil.baris_database()
+    try:
+        async with database.pool.acquire(timeout=database.DB_POOL_ACQUIRE_TIMEOUT) as conn:
+            jumlah = await simpan_hasil_saw(conn, id_periode, data_to_insert)
+        invalidasi_ranking()
+    except Exception as e:
+        raise RuntimeError(f"Error saat menyimpan hasil periode {id_periode} ke database: {str(e)}")
+
+    return {
+        "message": f"Berhasil menyimpan hasil peringkat untuk periode {id_periode}.",
+        "records_processed": len(data_to_insert),
+        **jumlah
+    }
+
+async def jalankan_simpan_rank(id_periode: int, lapor) -> dict:
+    """Isi job perhitungan: menjalankan SAW lalu menyimpan perubahan hasilnya ke `hasil_saw`."""
+    lapor(0.1, "Menghitung peringkat SAW")
+    try:
+        # Hasil yang disimpan selalu dihitung dari isi database terkini, bukan dari mesin
+        # di memori yang bisa tertinggal dari perubahan bobot atau penulisan worker lain
+        hasil = await main(id_periode=id_periode, muat_ulang=True)
+    except Exception as e:
+        raise RuntimeError(f"Gagal saat menjalankan perhitungan: {str(e)}")
+
+    lapor(0.6, "Menyimpan hasil peringkat")
+    return await simpan_hasil_periode(id_periode, hasil)
+
+async def jalankan_simpan_rank_banyak(id_periode_list: List[int], lapor) -> dict:
+    """Isi job perhitungan ulang beberapa periode: satu pengambilan data, lalu disimpan per periode."""
+    lapor(0.1, f"Menghitung peringkat SAW untuk {len(id_periode_list)} periode")
+    try:
+        # Mesin dibangun ulang dari database karena job ini dipakai setelah kriteria berubah
+        hasil = await hitung_banyak_periode(id_periode_list, muat_ulang=True)
+    except Exception as e:
+        raise RuntimeError(f"Gagal saat menjalankan perhitungan: {str(e)}")
+
+    per_periode = {}
+    for i, (id_periode, hasil_periode) in enumerate(hasil.items()):
+        lapor(0.5 + 0.5 * i / len(hasil), f"Menyimpan hasil periode {id_periode}")
+        per_periode[str(id_periode)] = await simpan_hasil_periode(id_periode, hasil_periode)
+    return {"periode": per_periode}
+
+def pastikan_pool_database():
+    if database.pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Koneksi database tidak tersedia."
+        )
+
+def kirim_job_rank(id_periode: int) -> Job:
+    """Mengirim job simpan peringkat; job aktif untuk periode yang sama dipakai ulang."""
+    pastikan_pool_database()
+    return job_manager.submit(
+        "simpan_rank", f"rank:{id_periode}",
+        lambda lapor: jalankan_simpan_rank(id_periode, lapor)
+    )
+
 @app.post(
     "/beasiswa/rank/save",
-    response_model=SuccessResponse,
+    response_model=SaveRankResponse,
     tags=["Perhitungan Beasiswa"],
     summary="Simpan Hasil Peringkat Beasiswa",
-    description="Menjalankan perhitungan SAW, lalu menyimpan hasilnya ke database."
+    description="Menjalankan perhitungan SAW, lalu menyimpan perubahan hasilnya ke database dalam satu transaksi. "
+                "Permintaan bersamaan untuk periode yang sama menunggu job yang sama."
 )
-async def save_rank_beasiswa():
+async def save_rank_beasiswa(id_periode: int = ID_PERIODE_AKTIF):
     """
-    Menjalankan perhitungan SAW, lalu menghapus hasil lama dan menyimpan
-    satu set hasil perhitungan yang baru untuk periode yang relevan.
+    Menjalankan perhitungan SAW, lalu membandingkan hasilnya dengan hasil tersimpan
+    untuk periode yang relevan dan hanya menulis baris yang berubah.
+    Untuk perhitungan yang lama, gunakan `POST /beasiswa/rank/jobs` lalu polling statusnya.
     """
-    try:
-        # 1. Jalankan fungsi utama untuk mendapatkan hasil perhitungan
-        # Asumsi: main() mengembalikan JSON string dari hasil DataFrame
-        rank_results_str, hasil_for_database = await main()
-        # Parse string JSON menjadi list of dictionaries
-        data_to_insert = json.loads(hasil_for_database)
-        print(data_to_insert)
-        # 2. Pastikan ada data untuk diproses
-        if not data_to_insert:
-            return SuccessResponse(message="Tidak ada data untuk disimpan.", records_processed=0)
-
-        # 3. Dapatkan id_periode secara dinamis dari data pertama
-        # Ini lebih aman daripada menggunakan variabel global
-        id_periode = 1
-        if not id_periode:
-             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Data hasil perhitungan tidak mengandung 'id_periode'."
-            )
+    job = await job_manager.tunggu(kirim_job_rank(id_periode).id)
 
-    except Exception as e:
-         raise HTTPException(
+    if job is None or job.status != "selesai":
+        raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Gagal saat menjalankan atau mem-parsing hasil perhitungan: {str(e)}"
+            detail=job.pesan if job else "Job perhitungan tidak ditemukan."
         )
+    return SaveRankResponse(**job.hasil)
 
-    try:
-        # 4. Hapus hasil lama untuk periode ini (tambahkan await)
-        print(f"Menghapus hasil lama untuk periode ID: {id_periode}...")
-        supabase.table("hasil_saw").delete().eq("id_periode", id_periode).execute()
+@app.post(
+    "/beasiswa/rank/jobs",
+    response_model=Job,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Perhitungan Beasiswa"],
+    summary="Jalankan Perhitungan Peringkat di Latar Belakang",
+    description="Mengirim job perhitungan dan penyimpanan peringkat, lalu langsung mengembalikan id job. "
+                "Jika job untuk periode yang sama masih berjalan, job tersebut yang dikembalikan."
+)
+async def submit_rank_job(id_periode: int = ID_PERIODE_AKTIF):
+    return kirim_job_rank(id_periode)
 
-        # 5. Masukkan hasil baru menggunakan upsert (tambahkan await)
-        # 'data_to_insert' sudah dalam format yang benar (list of dicts)
-        print(f"Memasukkan {len(data_to_insert)} hasil baru...")
-        print(data_to_insert)
-        response = supabase.table("hasil_saw").upsert(data_to_insert).execute()
+@app.get(
+    "/beasiswa/rank/jobs/{job_id}",
+    response_model=Job,
+    tags=["Perhitungan Beasiswa"],
+    summary="Status Job Perhitungan Peringkat",
+    description="Mengembalikan status, progress, dan hasil (jika sudah selesai) dari job perhitungan peringkat."
+)
+async def get_rank_job(job_id: str):
+    job = job_manager.ambil(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job dengan ID {job_id} tidak ditemukan."
+        )
+    return job
 
-        if not response.data:
-             raise HTTPException(
+@app.post(
+    "/beasiswa/rank/jobs/semua",
+    response_model=Job,
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Perhitungan Beasiswa"],
+    summary="Hitung Ulang Peringkat Banyak Periode",
+    description="Mengirim satu job yang menghitung ulang dan menyimpan peringkat beberapa periode sekaligus. "
+                "Tanpa parameter `id_periode`, semua periode di `periode_beasiswa` dihitung ulang."
+)
+async def submit_rank_job_semua(id_periode: Optional[List[int]] = Query(None)):
+    """
+    Dipakai setelah kriteria berubah. Pendaftar semua periode diambil dengan satu query,
+    lalu peringkat setiap periode dihitung (paralel untuk kohort besar) dan disimpan per periode.
+    """
+    pastikan_pool_database()
+    if not id_periode:
+        try:
+            response = await run_in_thread(
+                supabase.table("periode_beasiswa").select("id_periode").order("id_periode").execute
+            )
+        except Exception as e:
+            raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Gagal menyimpan data baru ke Supabase."
+                detail=f"Terjadi kesalahan saat mengambil data periode: {str(e)}"
             )
+        id_periode = [row["id_periode"] for row in response.data]
+
+    # Klaim per periode, sehingga job ini dan job satu periode (`rank:{id_periode}`) saling
+    # mendeduplikasi. Periode yang sedang dihitung job lain dilewati.
+    id_periode = sorted(set(id_periode))
+    sisa = [p for p in id_periode if job_manager.aktif_untuk(f"rank:{p}") is None]
+    if id_periode and not sisa:
+        job_aktif = job_manager.aktif_untuk(f"rank:{id_periode[0]}")
+        if job_aktif is not None:
+            return job_aktif
+    id_periode = sisa or id_periode
+    return job_manager.submit(
+        "simpan_rank_banyak", "rank:" + ",".join(map(str, id_periode)),
+        lambda lapor: jalankan_simpan_rank_banyak(id_periode, lapor),
+        klaim=[f"rank:{p}" for p in id_periode]
+    )
+
+def query_rank_snapshot(id_periode: int):
+    """Query `hasil_saw` untuk satu periode, di-join ke pendaftaran/siswa/kelas dan terurut berdasarkan peringkat."""
+    return supabase.table("hasil_saw") \
+        .select(
+        "nilai_akhir, peringkat, status_rekomendasi, "
+        "pendaftaran(penghasilan_orangtua, jumlah_tanggungan, luas_rumah, rerata_nilai, peringkat_kelas, "
+        "siswa(nama_siswa, kelas(nama_kelas)))") \
+        .eq("id_periode", id_periode) \
+        .order("peringkat")
+
+def rank_detail_dari_snapshot(item: dict) -> Optional[RankDetailResponse]:
+    """Mengubah satu baris snapshot `hasil_saw` menjadi RankDetailResponse."""
+    detail_data = item.get('pendaftaran')
+    if not detail_data:
+        return None  # Pendaftaran sudah dihapus setelah snapshot disimpan
+
+    siswa_data = detail_data.get('siswa') or {}
+    kelas_data = siswa_data.get('kelas')
+    return RankDetailResponse(
+        nama_siswa=siswa_data.get('nama_siswa'),
+        kelas=kelas_data.get('nama_kelas') if kelas_data else "N/A",
+        penghasilan_orangtua=detail_data.get('penghasilan_orangtua'),
+        jumlah_tanggungan=detail_data.get('jumlah_tanggungan'),
+        luas_rumah=detail_data.get('luas_rumah'),
+        rerata_nilai=detail_data.get('rerata_nilai'),
+        peringkat_kelas=detail_data.get('peringkat_kelas'),
+        skor=item.get('nilai_akhir'),
+        status_rekomendasi=item.get('status_rekomendasi')
+    )
+
+async def get_rank_snapshot(id_periode: int) -> Optional[List[RankDetailResponse]]:
+    """
+    Membaca hasil peringkat yang sudah disimpan di `hasil_saw` dengan satu query join.
+    Mengembalikan None jika belum ada snapshot untuk periode tersebut.
+    """
+    response = await run_in_thread(query_rank_snapshot(id_periode).execute)
 
-        return SuccessResponse(
-            message=f"Berhasil menyimpan hasil peringkat untuk periode {id_periode}.",
-            records_processed=len(response.data)
-        )
+    if not response.data:
+        return None
 
-    except Exception as e:
-        # Gunakan HTTPException untuk mengembalikan error yang proper
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error saat menyimpan hasil ke Supabase: {str(e)}"
-        )
+    final_response = [rank_detail_dari_snapshot(item) for item in response.data]
+    return [item for item in final_response if item is not None]
 
 @app.get(
     "/beasiswa/rank",
     response_model=List[RankDetailResponse],
     tags=["Perhitungan Beasiswa"],
     summary="Dapatkan Hasil Peringkat Beasiswa Lengkap",
-    description="Menjalankan perhitungan SAW dan mengembalikan hasil peringkat beserta data detail pendaftar."
+    description="Mengembalikan hasil peringkat tersimpan beserta data detail pendaftar, "
+                "atau menjalankan perhitungan SAW jika belum ada snapshot atau `fresh=true`."
 )
-async def get_rank_beasiswa():
+async def get_rank_beasiswa(id_periode: int = ID_PERIODE_AKTIF, fresh: bool = False):
     """
-    Endpoint ini melakukan dua langkah utama:
+    Secara bawaan hasil dibaca dari snapshot `hasil_saw` yang disimpan oleh
+    `POST /beasiswa/rank/save`. Perhitungan langsung hanya dijalankan jika
+    snapshot belum ada atau `fresh=true`:
     1. Menjalankan fungsi perhitungan SAW untuk mendapatkan peringkat dasar.
     2. Mengambil data detail pendaftar dari database berdasarkan hasil peringkat.
     3. Menggabungkan kedua data tersebut untuk respons yang lengkap.
+
+    Hasil disimpan di cache sampai ada penulisan data yang memengaruhi peringkat.
+    `fresh=true` melewati cache tersebut dan membangun ulang mesin peringkat dari
+    database, sehingga perubahan yang tidak lewat API ini juga ikut terhitung.
     """
+    kunci_cache = (id_periode, versi_data, fresh)
+    hasil_cache = None if fresh else rank_cache.get(kunci_cache)
+    if hasil_cache is not None:
+        return hasil_cache
+
+    if not fresh:
+        try:
+            snapshot = await get_rank_snapshot(id_periode)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Terjadi kesalahan: {str(e)}"
+            )
+        if snapshot is not None:
+            rank_cache.set(kunci_cache, snapshot)
+            return snapshot
+
     try:
-        # 1. Jalankan fungsi perhitungan SAW Anda
-        # Asumsi: main() sekarang mengembalikan list of dictionaries, bukan JSON string
-        # Jika main() masih mengembalikan JSON string, kita parse dulu
-        rank_results_str,  hasil_for_database_str = await main()  # Ganti 'main' dengan nama fungsi Anda jika berbeda
-        rank_results = json.loads(rank_results_str)
+        # 1. Jalankan fungsi perhitungan SAW; seluruh peringkat dibutuhkan untuk respons ini
+        rank_results = (await main(id_periode=id_periode, muat_ulang=fresh)).semua()
 
         if not rank_results:
+            rank_cache.set(kunci_cache, [])
             return []
 
         # 2. Ambil semua 'id_pendaftaran' dari hasil peringkat
         pendaftaran_ids = [item['id_pendaftaran'] for item in rank_results]
 
         # 3. Ambil data detail dari Supabase untuk semua ID yang relevan
-        response = supabase.table("pendaftaran") \
+        response = await run_in_thread(supabase.table("pendaftaran") \
             .select("*, siswa(*, kelas(nama_kelas))") \
             .in_("id_pendaftaran", pendaftaran_ids) \
-            .execute()
+            .execute)
 
         if not response.data:
             raise HTTPException(status_code=404, detail="Data detail pendaftar tidak ditemukan.")
@@ -356,6 +782,7 @@ async def get_rank_beasiswa():
             )
             final_response.append(full_data)
 
+        rank_cache.set(kunci_cache, final_response)
         return final_response
 
     except Exception as e:
@@ -364,49 +791,213 @@ async def get_rank_beasiswa():
             detail=f"Terjadi kesalahan: {str(e)}"
         )
 
+def susun_matriks_bobot(kode: List[str], bobot_dasar: np.ndarray, skenario: List[SkenarioBobot]) -> np.ndarray:
+    """
+    Menyusun matriks bobot (kriteria x skenario). Bobot yang tidak disebut diambil dari
+    bobot saat ini, lalu setiap skenario dinormalisasi agar jumlahnya 1 seperti `normalize_bobot`.
+    """
+    matriks_bobot = np.tile(bobot_dasar[:, None], (1, len(skenario)))
+    indeks = {k: i for i, k in enumerate(kode)}
+    for j, item in enumerate(skenario):
+        tidak_dikenal = set(item.bobot) - set(indeks)
+        if tidak_dikenal:
+            raise ValueError(f"Skenario {j + 1}: kriteria {sorted(tidak_dikenal)} tidak dikenal.")
+        for k, nilai in item.bobot.items():
+            if nilai < 0:
+                raise ValueError(f"Skenario {j + 1}: bobot {k} tidak boleh negatif.")
+            matriks_bobot[indeks[k], j] = nilai
+
+    total = matriks_bobot.sum(axis=0)
+    if np.any(total <= 0):
+        raise ValueError("Jumlah bobot setiap skenario harus lebih dari 0.")
+    return matriks_bobot / total
+
+@app.post(
+    "/beasiswa/rank/what-if",
+    response_model=WhatIfResponse,
+    response_model_exclude_none=True,
+    tags=["Perhitungan Beasiswa"],
+    summary="Analisis Sensitivitas Bobot Kriteria",
+    description="Menilai banyak skenario bobot kriteria terhadap pendaftar periode yang sama "
+                "tanpa mengubah `kriteria_saw`, lalu membandingkan hasilnya dengan peringkat saat ini."
+)
+async def what_if_rank(request_data: WhatIfRequest):
+    """
+    Semua skenario dinilai dengan satu perkalian matriks terhadap matriks ternormalisasi R
+    yang disimpan mesin peringkat periode tersebut. Untuk setiap skenario dikembalikan
+    Kendall tau terhadap peringkat dasar, anggota top-N, serta pendaftar yang masuk/keluar top-N.
+    Semua pendaftar dirujuk dengan `id_pendaftaran`.
+    """
+    try:
+        mesin = await ambil_mesin(request_data.id_periode)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan saat memuat data peringkat: {str(e)}"
+        )
+
+    # Bobot dasar dinormalisasi dengan cara yang sama seperti skenario agar skenario
+    # tanpa perubahan menghasilkan peringkat yang persis sama (Kendall tau = 1)
+    bobot_dasar = mesin.bobot / mesin.bobot.sum()
+    try:
+        matriks_bobot = susun_matriks_bobot(mesin.kode, bobot_dasar, request_data.skenario)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    ids, matriks_r = mesin.matriks_r()
+    urutan_dasar, urutan, kendall_tau = analisis_sensitivitas(matriks_r, bobot_dasar, matriks_bobot)
+
+    top_n = max(request_data.top_n, 0)
+    top_n_dasar = ids[urutan_dasar[:top_n]].tolist()
+    hasil = []
+    for j, item in enumerate(request_data.skenario):
+        top_n_skenario = ids[urutan[j, :top_n]].tolist()
+        hasil.append(HasilSkenario(
+            nama=item.nama,
+            bobot=dict(zip(mesin.kode, matriks_bobot[:, j].tolist())),
+            kendall_tau=float(kendall_tau[j]),
+            top_n=top_n_skenario,
+            masuk_top_n=[i for i in top_n_skenario if i not in top_n_dasar],
+            keluar_top_n=[i for i in top_n_dasar if i not in top_n_skenario],
+            peringkat=ids[urutan[j]].tolist() if request_data.sertakan_peringkat else None
+        ))
+
+    return WhatIfResponse(
+        id_periode=request_data.id_periode,
+        jumlah_pendaftar=len(ids),
+        bobot_dasar=dict(zip(mesin.kode, bobot_dasar.tolist())),
+        top_n_dasar=top_n_dasar,
+        skenario=hasil
+    )
+
+def kunci_check_siswa(data: SiswaCheckRequest) -> str:
+    identitas = "\x1f".join([data.nisn, data.nis, data.nik, data.tanggal_lahir.isoformat(), str(data.id_periode)])
+    return hashlib.sha256(identitas.encode()).hexdigest()
+
+def lupakan_check_siswa(id_siswa: Optional[int] = None):
+    """Membuang hasil /siswa/check milik satu siswa, atau seluruh cache jika `id_siswa` tidak diberikan."""
+    if id_siswa is None:
+        siswa_check_cache.clear()
+        kunci_check_per_siswa.clear()
+        return
+    for kunci in kunci_check_per_siswa.pop(int(id_siswa), ()):
+        siswa_check_cache.pop(kunci)
+
 @app.post(
     "/siswa/check",
     response_model=SiswaCheckResponse,
     tags=["Pendaftaran Beasiswa"],
     summary="Verifikasi Data Siswa",
-    description="Mengecek apakah siswa ada di database berdasarkan NISN, NIS, NIK, dan Tanggal Lahir."
+    description="Mengecek apakah siswa ada di database berdasarkan NISN, NIS, NIK, dan Tanggal Lahir, "
+                "serta apakah siswa sudah mendaftar pada periode yang diminta."
 )
 async def check_siswa(request_data: SiswaCheckRequest):
-    try:
-        response = supabase.table("siswa") \
-            .select("id_siswa") \
-            .eq("nisn", request_data.nisn) \
-            .eq("nis", request_data.nis) \
-            .eq("nik", request_data.nik) \
-            .eq("tanggal_lahir", str(request_data.tanggal_lahir)) \
-            .maybe_single() \
-            .execute()
-
-        siswa_data = response.data
-
-        # Jika tidak ada data yang ditemukan
-        if not siswa_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Siswa tidak ditemukan dengan kombinasi data yang diberikan."
+    kunci = kunci_check_siswa(request_data)
+    hasil = siswa_check_cache.get(kunci, False)
+
+    if hasil is False:
+        try:
+            # Satu query: siswa dicocokkan lewat index komposit (lihat sql/004_siswa_check_index.sql)
+            # dan pendaftarannya pada periode ini ikut di-embed, cukup satu baris untuk tahu sudah/belum.
+            response = await run_in_thread(supabase.table("siswa") \
+                .select("id_siswa, pendaftaran(id_pendaftaran)") \
+                .eq("nisn", request_data.nisn) \
+                .eq("nis", request_data.nis) \
+                .eq("nik", request_data.nik) \
+                .eq("tanggal_lahir", request_data.tanggal_lahir.isoformat()) \
+                .eq("pendaftaran.id_periode", request_data.id_periode) \
+                .limit(1, foreign_table="pendaftaran") \
+                .maybe_single() \
+                .execute)
+
+        except Exception as e:
+            # Menangani kemungkinan error lain dari Supabase atau proses
+            logger.exception("Gagal memeriksa data siswa")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        # maybe_single() mengembalikan None (bukan response kosong) jika tidak ada baris
+        siswa_data = response.data if response else None
+        if siswa_data:
+            hasil = SiswaCheckResponse(
+                id_siswa=siswa_data["id_siswa"],
+                sudah_mendaftar=bool(siswa_data.get("pendaftaran"))
             )
+            siswa_check_cache.set(
+                kunci, hasil, ttl=SISWA_CHECK_TTL if hasil.sudah_mendaftar else SISWA_CHECK_TTL_NEGATIF
+            )
+            kunci_siswa = kunci_check_per_siswa.get(hasil.id_siswa) or set()
+            kunci_siswa.add(kunci)
+            kunci_check_per_siswa.set(hasil.id_siswa, kunci_siswa)
+        else:
+            hasil = None
+            siswa_check_cache.set(kunci, None, ttl=SISWA_CHECK_TTL_NEGATIF)
+
+    # Jika tidak ada data yang ditemukan
+    if hasil is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Siswa tidak ditemukan dengan kombinasi data yang diberikan."
+        )
 
-        # Sekarang kita bisa menggunakan .get() dengan aman pada dictionary siswa_data
-        id_siswa = siswa_data.get("id_siswa")
-
-        # Cek apakah list 'pendaftaran' berisi data. Jika ya, berarti sudah mendaftar.
-        # Logika ini sekarang berfungsi karena kita meminta data pendaftaran di .select()
-        sudah_mendaftar = bool(siswa_data.get("pendaftaran"))
-
-        return SiswaCheckResponse(
-            id_siswa=id_siswa,
-            sudah_mendaftar=sudah_mendaftar
+    return hasil
+
+STORAGE_BUCKET = "berkas-pendukung"
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 4))
+
+def url_publik(file_path: str) -> str:
+    """URL publik objek di bucket, dibentuk langsung tanpa memanggil API Storage."""
+    return f"{url.rstrip('/')}/storage/v1/object/public/{STORAGE_BUCKET}/{file_path}"
+
+def _baca_berkas(upload_file: UploadFile, ukuran: int = -1) -> bytes:
+    berkas = upload_file.file
+    berkas.seek(0)
+    isi = berkas.read(ukuran)
+    berkas.seek(0)
+    return isi
+
+def _unggah_sync(file_path: str, upload_file: UploadFile, content_type: str):
+    berkas = upload_file.file
+    berkas.seek(0)
+    if upload_file.size is not None and upload_file.size > MultiPartParser.spool_max_size:
+        # Melewati batas spool berarti file sudah dipindah ke disk: httpx mengirimnya
+        # per chunk tanpa memuat seluruh isi
+        with open(berkas.fileno(), "rb", closefd=False) as isi:
+            supabase.storage.from_(STORAGE_BUCKET).upload(
+                path=file_path, file=isi, file_options={"content-type": content_type}
+            )
+    else:
+        supabase.storage.from_(STORAGE_BUCKET).upload(
+            path=file_path, file=berkas.read(), file_options={"content-type": content_type}
         )
 
+async def unggah_berkas(file_path: str, upload_file: UploadFile, semaphore: asyncio.Semaphore):
+    """
+    Mengunggah satu file ke Storage, dibatasi oleh `semaphore` agar paralelisme terkendali.
+    Gambar dan PDF dikompres dulu di process pool; format lain dialirkan apa adanya.
+    """
+    async with semaphore:
+        with span("storage.upload"):
+            header = await run_in_thread(_baca_berkas, upload_file, 16)
+            content_type = deteksi_tipe(header) or upload_file.content_type
+            if not bisa_dikompres(content_type):
+                await run_in_thread(_unggah_sync, file_path, upload_file, content_type)
+                return
+
+            with span("storage.kompres"):
+                data, content_type = await kompres(await run_in_thread(_baca_berkas, upload_file), content_type)
+            await run_in_thread(
+                supabase.storage.from_(STORAGE_BUCKET).upload,
+                path=file_path, file=data, file_options={"content-type": content_type}
+            )
+
+async def hapus_berkas(file_paths: List[str]):
+    """Kompensasi: menghapus objek yang sudah terunggah ketika pendaftaran gagal disimpan."""
+    if not file_paths:
+        return
+    try:
+        await run_in_thread(supabase.storage.from_(STORAGE_BUCKET).remove, file_paths)
     except Exception as e:
-        # Menangani kemungkinan error lain dari Supabase atau proses
-        print(e)
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.warning("Gagal menghapus file %s: %s", file_paths, e)
 
 @app.post("/beasiswa/daftar/submit", tags=["Pendaftaran Beasiswa"])
 async def submit_pendaftaran(
@@ -432,70 +1023,86 @@ async def submit_pendaftaran(
             detail={"message": "Struktur data JSON pada 'payload' tidak valid.", "errors": e.errors()}
         )
 
-    # 2. Upload file ke Supabase Storage dan kumpulkan URL-nya
-    file_urls = {}
+    # Data yang wajib ada diperiksa sebelum mengunggah, agar kegagalan di sini tidak
+    # meninggalkan file yatim di Storage
+    if payload.detailKeluarga is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Data 'detailKeluarga' wajib diisi."
+        )
+    if file_kartu_keluarga is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="File 'file_kartu_keluarga' wajib diunggah."
+        )
+
+    # 2. Siapkan data untuk dimasukkan ke tabel 'pendaftaran'; path file diisi setelah unggah
+    pendaftaran_data = {
+        "id_siswa": payload.id_siswa,
+        "id_periode": payload.id_periode,
+        **payload.detailKeluarga.dict(),  # Gabungkan semua data dari detail_keluarga
+        "status_validasi": "belum divalidasi"  # Set status awal
+    }
+
+    # 3. Upload file ke Supabase Storage secara bersamaan dan kumpulkan URL-nya
     files_to_process = {
         "file_keterangan_penghasilan": file_keterangan_penghasilan,
         "file_kartu_keluarga": file_kartu_keluarga,
         "file_pbb": file_pbb,
         "file_rapor": file_rapor,
     }
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    uploads = {
+        field_name: (f"{payload.id_siswa}-{field_name}-{timestamp}", upload_file)
+        for field_name, upload_file in files_to_process.items() if upload_file
+    }
 
-    for field_name, upload_file in files_to_process.items():
-        if upload_file:
-            try:
-                # Baca konten file
-                contents = upload_file.file.read()
-                # Tentukan path di dalam bucket
-                file_path = f"{payload.id_siswa}-{field_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-
-                # Upload file
-                supabase.storage.from_('berkas-pendukung').upload(
-                    path=file_path,
-                    file=contents,
-                    file_options={"content-type": upload_file.content_type}
-                )
-
-                # Dapatkan URL publik dari file yang di-upload
-                response = supabase.storage.from_('berkas-pendukung').get_public_url(file_path)
-                file_urls[field_name] = response
-
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Gagal mengunggah file '{upload_file.filename}': {str(e)}"
-                )
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    hasil_upload = await asyncio.gather(
+        *(unggah_berkas(file_path, upload_file, semaphore) for file_path, upload_file in uploads.values()),
+        return_exceptions=True
+    )
+    terunggah = [path for path, hasil in zip((p for p, _ in uploads.values()), hasil_upload)
+                 if not isinstance(hasil, BaseException)]
+    for (file_path, upload_file), hasil in zip(uploads.values(), hasil_upload):
+        if isinstance(hasil, BaseException):
+            # Batalkan file lain yang sudah terlanjur terunggah
+            await hapus_berkas(terunggah)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Gagal mengunggah file '{upload_file.filename}': {str(hasil)}"
+            )
 
-    # 3. Siapkan data untuk dimasukkan ke tabel 'pendaftaran'
-    print(file_urls)
-    pendaftaran_data = {
-        "id_siswa": payload.id_siswa,
-        "id_periode": 1,
-        **payload.detailKeluarga.dict(),  # Gabungkan semua data dari detail_keluarga
-        # Tambahkan path file
-        "file_keterangan_penghasilan": file_urls.get("file_keterangan_penghasilan"),
-        "file_kartu_keluarga": file_urls["file_kartu_keluarga"],
-        "file_pbb": file_urls.get("file_pbb"),
-        "file_rapor": file_urls.get("file_rapor"),
-        "status_validasi": "belum divalidasi"  # Set status awal
-    }
+    # Tambahkan path file
+    pendaftaran_data.update({
+        field_name: url_publik(uploads[field_name][0]) if field_name in uploads else None
+        for field_name in files_to_process
+    })
 
     try:
         # 4. Update data siswa (email & no_telepon) di tabel 'siswa'
-        supabase.table("siswa").update(payload.personal_data.dict()).eq("id_siswa", payload.id_siswa).execute()
+        await run_in_thread(supabase.table("siswa").update(payload.personal_data.dict()).eq("id_siswa", payload.id_siswa).execute)
 
         # 5. Masukkan data pendaftaran ke tabel 'pendaftaran'
-        insert_response =  supabase.table("pendaftaran").insert(pendaftaran_data).execute()
+        insert_response =  await run_in_thread(supabase.table("pendaftaran").insert(pendaftaran_data).execute)
 
         if not insert_response.data:
             raise HTTPException(status_code=500, detail="Gagal menyimpan data pendaftaran ke database.")
 
     except Exception as e:
+        # Pendaftaran gagal disimpan: hapus file yang sudah diunggah agar tidak menjadi sampah
+        await hapus_berkas(terunggah)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Terjadi kesalahan pada database: {str(e)}"
         )
 
+    await perbarui_pendaftar(insert_response.data[0])
+    await statistik.perbarui(insert_response.data[0])
+    lupakan_check_siswa(payload.id_siswa)
+    await lupakan_siswa(payload.id_siswa)
+    invalidasi_ranking()
+
     return {
         "message": "Pendaftaran berhasil diterima!",
         "data_tersimpan": insert_response.data[0]
@@ -514,10 +1121,10 @@ async def update_pendaftaran_status(id_pendaftaran: int, status_update: StatusUp
     """
     try:
         # Update data di tabel 'pendaftaran' berdasarkan id_pendaftaran
-        response = supabase.table("pendaftaran") \
+        response = await run_in_thread(supabase.table("pendaftaran") \
             .update({"status_validasi": status_update.status_validasi}) \
             .eq("id_pendaftaran", id_pendaftaran) \
-            .execute()
+            .execute)
 
         # Jika tidak ada baris yang diupdate, berarti ID tidak ditemukan
         if not response.data:
@@ -526,6 +1133,10 @@ async def update_pendaftaran_status(id_pendaftaran: int, status_update: StatusUp
                 detail=f"Pendaftaran dengan ID {id_pendaftaran} tidak ditemukan."
             )
 
+        await perbarui_pendaftar(response.data[0])
+        await statistik.perbarui(response.data[0])
+        invalidasi_ranking()
+
         return {"message": "Status berhasil diperbarui", "data": response.data[0]}
 
     except Exception as e:
@@ -534,6 +1145,55 @@ async def update_pendaftaran_status(id_pendaftaran: int, status_update: StatusUp
             detail=f"Terjadi kesalahan pada server: {str(e)}"
         )
 
+@app.patch(
+    "/pendaftaran/status",
+    response_model=BulkStatusUpdateResponse,
+    tags=["Pendaftaran Beasiswa"],
+    summary="Update Status Validasi Banyak Pendaftaran",
+    description="Mengubah status validasi banyak pendaftaran sekaligus dalam satu transaksi."
+)
+async def bulk_update_pendaftaran_status(items: List[StatusUpdateItem], conn: asyncpg.Connection = Depends(get_db)):
+    """
+    Menerima daftar `{id_pendaftaran, status_validasi}`. Pembaruan dikelompokkan per status
+    tujuan (satu UPDATE per status) di dalam satu transaksi. Jika satu ID muncul lebih dari
+    sekali, status terakhir yang dipakai.
+    """
+    target = {item.id_pendaftaran: item.status_validasi for item in items}
+    per_status: Dict[str, List[int]] = {}
+    for id_pendaftaran, status_validasi in target.items():
+        per_status.setdefault(status_validasi, []).append(id_pendaftaran)
+
+    try:
+        rows = []
+        async with conn.transaction():
+            for status_validasi, ids in per_status.items():
+                rows += await conn.fetch(
+                    """
+                    UPDATE pendaftaran p SET status_validasi = $1
+                    FROM siswa s
+                    WHERE s.id_siswa = p.id_siswa AND p.id_pendaftaran = ANY($2::int[])
+                    RETURNING p.*, s.nama_siswa
+                    """,
+                    status_validasi, ids
+                )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan pada server: {str(e)}"
+        )
+
+    # Satu pembaruan mesin peringkat dan satu invalidasi cache untuk seluruh batch
+    rows = [dict(row) for row in rows]
+    perbarui_banyak_pendaftar(rows)
+    statistik.perbarui_banyak(rows)
+    invalidasi_ranking()
+
+    diperbarui = {row["id_pendaftaran"] for row in rows}
+    return BulkStatusUpdateResponse(
+        diperbarui=sorted(diperbarui),
+        tidak_ditemukan=sorted(set(target) - diperbarui)
+    )
+
 @app.get(
     "/pendaftaran/status/{id_siswa}",
     response_model=PendaftaranStatusResponse,
@@ -549,24 +1209,25 @@ async def check_pendaftaran_status(id_siswa: int):
     - Jika ditemukan, akan mengembalikan `{"sudah_mendaftar": true}` beserta ID pendaftarannya.
     - Jika tidak ditemukan, akan mengembalikan `{"sudah_mendaftar": false}`.
     """
-    try:
+    async def muat():
         # Query ke Supabase untuk mencari data.
         # Kita hanya butuh 'id_pendaftaran' dan membatasi hanya 1 hasil untuk efisiensi.
-        response = supabase.table("pendaftaran") \
+        response = await run_in_thread(supabase.table("pendaftaran") \
             .select("id_pendaftaran") \
             .eq("id_siswa", id_siswa) \
             .limit(1) \
-            .execute()
+            .execute)
 
         # Jika query mengembalikan data (list tidak kosong)
         if response.data:
-            return PendaftaranStatusResponse(
-                sudah_mendaftar=True,
-                id_pendaftaran=response.data[0]['id_pendaftaran']
-            )
+            return {"sudah_mendaftar": True, "id_pendaftaran": response.data[0]['id_pendaftaran']}
 
         # Jika tidak ada data yang ditemukan
-        return PendaftaranStatusResponse(sudah_mendaftar=False)
+        return {"sudah_mendaftar": False}
+
+    try:
+        # Dibaca dari cache per siswa; cache dibuang saat siswa mendaftar atau pendaftarannya dihapus
+        return PendaftaranStatusResponse(**await siswa_cache.ambil_atau_muat(f"siswa:{id_siswa}:pendaftaran", muat))
 
     except Exception as e:
         raise HTTPException(
@@ -574,54 +1235,82 @@ async def check_pendaftaran_status(id_siswa: int):
             detail=f"Terjadi kesalahan saat memeriksa data: {str(e)}")
 
 
-@app.get(
-    "/siswa/pendaftar",  # Nama endpoint diubah agar lebih deskriptif
-    response_model=List[SiswaDataResponse],
-    tags=["Siswa"],
-    summary="Dapatkan Semua Siswa yang Sudah Mendaftar",
-    description="Mengambil data siswa yang memiliki data pendaftaran beasiswa."
-)
-async def get_all_pendaftar():
-    """
-    Endpoint ini melakukan INNER JOIN untuk mendapatkan daftar siswa yang sudah mendaftar.
-    """
-    try:
-        # --- PERUBAHAN UTAMA: Menggunakan INNER JOIN ---
-        # Ganti !left(*) menjadi !inner(*) untuk hanya mengambil siswa yang punya data pendaftaran.
-        response = supabase.table("siswa") \
-            .select("*, kelas(nama_kelas), pendaftaran!inner(*)") \
-            .order("id_siswa", desc=True) \
-            .execute()
+# Kolom yang boleh diminta melalui parameter `fields=` pada daftar siswa
+SISWA_KOLOM = [f for f in PersonalData.__fields__ if f != "kelas"]
+PENDAFTARAN_KOLOM = list(PendaftaranData.__fields__)
 
-        if not response.data:
-            return []
+def susun_select_siswa(fields: Optional[str], join: str) -> str:
+    """
+    Menyusun select PostgREST untuk daftar siswa.
 
-        # --- Transformasi Data yang Disederhanakan ---
-        results = []
-        for record in response.data:
-            kelas_data = record.get("kelas")
-            personal_data_obj = PersonalData(
-                id_siswa=record.get("id_siswa"),
-                nis=record.get("nis"),
-                nisn=record.get("nisn"),
-                nik=record.get("nik"),
-                tanggal_lahir=record.get("tanggal_lahir"),
-                nama_siswa=record.get("nama_siswa"),
-                kelas=kelas_data.get("nama_kelas") if kelas_data else "Belum ada kelas",
-                alamat_email=record.get("alamat_email"),
-                no_telepon=record.get("no_telepon")
-            )
+    - **fields**: daftar kolom dipisah koma (kolom siswa, `kelas`, atau kolom pendaftaran).
+      Jika kosong, semua kolom diambil.
+    - **join**: `inner` atau `left` untuk relasi `pendaftaran`.
+    """
+    if not fields:
+        return f"*, kelas(nama_kelas), pendaftaran!{join}(*)"
 
-            # Karena menggunakan INNER JOIN, 'pendaftaran' dijamin ada.
-            pendaftaran_raw = record["pendaftaran"][0]
-            pendaftaran_data_obj = PendaftaranData(**pendaftaran_raw)
+    diminta = [f.strip() for f in fields.split(",") if f.strip()]
+    tidak_dikenal = [f for f in diminta if f not in SISWA_KOLOM and f not in PENDAFTARAN_KOLOM and f != "kelas"]
+    if tidak_dikenal:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Kolom tidak dikenal pada 'fields': {', '.join(tidak_dikenal)}"
+        )
 
-            results.append(SiswaDataResponse(
-                personal_data=personal_data_obj,
-                pendaftaran_data=pendaftaran_data_obj
-            ))
+    # id_siswa selalu diambil karena dipakai sebagai cursor
+    bagian = ["id_siswa"] + [f for f in SISWA_KOLOM if f in diminta and f != "id_siswa"]
+    if "kelas" in diminta:
+        bagian.append("kelas(nama_kelas)")
+    kolom_pendaftaran = [f for f in PENDAFTARAN_KOLOM if f in diminta and f != "id_pendaftaran"]
+    if kolom_pendaftaran or join == "inner":
+        bagian.append(f"pendaftaran!{join}({', '.join(['id_pendaftaran'] + kolom_pendaftaran)})")
+    return ", ".join(bagian)
+
+def siswa_data_response(record: dict) -> SiswaDataResponse:
+    """Mengubah satu baris siswa hasil join menjadi model respons, hanya dengan kolom yang diambil."""
+    personal_data = {k: record[k] for k in SISWA_KOLOM if k in record}
+    if "kelas" in record:
+        kelas_data = record["kelas"]
+        personal_data["kelas"] = kelas_data.get("nama_kelas") if kelas_data else "Belum ada kelas"
+    result = SiswaDataResponse(personal_data=PersonalData(**personal_data))
+
+    if "pendaftaran" in record:
+        # Ambil data pendaftaran pertama jika ada (biasanya hanya satu per siswa)
+        pendaftaran_data_list = record["pendaftaran"] or []
+        result.pendaftaran_data = PendaftaranData(**pendaftaran_data_list[0]) if pendaftaran_data_list else None
+    return result
+
+def query_daftar_siswa(select: str, limit: int, cursor: Optional[int], id_kelas: Optional[int],
+                       status_validasi: Optional[str], id_periode: Optional[int]):
+    """Query siswa dengan keyset pagination (id_siswa menurun) dan filter yang didorong ke PostgREST."""
+    query = supabase.table("siswa").select(select)
+    if cursor is not None:
+        query = query.lt("id_siswa", cursor)
+    if id_kelas is not None:
+        query = query.eq("id_kelas", id_kelas)
+    if status_validasi is not None:
+        query = query.eq("pendaftaran.status_validasi", status_validasi)
+    if id_periode is not None:
+        query = query.eq("pendaftaran.id_periode", id_periode)
+    return query.order("id_siswa", desc=True).limit(limit)
+
+async def daftar_siswa(response: Response, join: str, fields: Optional[str], limit: int, cursor: Optional[int],
+                       id_kelas: Optional[int], status_validasi: Optional[str], id_periode: Optional[int]):
+    """Mengambil satu halaman daftar siswa dan menaruh cursor halaman berikutnya di header `X-Next-Cursor`."""
+    # Filter pada data pendaftaran hanya membatasi siswa jika relasinya INNER JOIN
+    if status_validasi is not None or id_periode is not None:
+        join = "inner"
+    select = susun_select_siswa(fields, join)
 
-        return results
+    try:
+        query_response = await run_in_thread(
+            query_daftar_siswa(select, limit, cursor, id_kelas, status_validasi, id_periode).execute
+        )
+        records = query_response.data or []
+        if len(records) == limit:
+            response.headers["X-Next-Cursor"] = str(records[-1]["id_siswa"])
+        return [siswa_data_response(record) for record in records]
 
     except Exception as e:
         raise HTTPException(
@@ -629,6 +1318,32 @@ async def get_all_pendaftar():
             detail=f"Terjadi kesalahan saat mengambil data siswa: {str(e)}")
 
 
+@app.get(
+    "/siswa/pendaftar",  # Nama endpoint diubah agar lebih deskriptif
+    response_model=List[SiswaDataResponse],
+    response_model_exclude_unset=True,
+    tags=["Siswa"],
+    summary="Dapatkan Semua Siswa yang Sudah Mendaftar",
+    description="Mengambil data siswa yang memiliki data pendaftaran beasiswa, per halaman."
+)
+async def get_all_pendaftar(
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[int] = Query(None, description="Nilai header `X-Next-Cursor` dari halaman sebelumnya."),
+        id_kelas: Optional[int] = None,
+        status_validasi: Optional[str] = None,
+        id_periode: Optional[int] = None,
+        fields: Optional[str] = Query(None, description="Kolom yang diambil, dipisah koma.")
+):
+    """
+    Endpoint ini melakukan INNER JOIN untuk mendapatkan daftar siswa yang sudah mendaftar.
+
+    - Diurutkan berdasarkan `id_siswa` menurun, dengan keyset pagination melalui `cursor`.
+    - Jika masih ada halaman berikutnya, header `X-Next-Cursor` berisi cursor-nya.
+    """
+    return await daftar_siswa(response, "inner", fields, limit, cursor, id_kelas, status_validasi, id_periode)
+
+
 # ===========================================================================
 # Siswa
 # ===========================================================================
@@ -643,30 +1358,26 @@ async def get_siswa_by_id(id_siswa: int):
     """
     Endpoint ini mengambil detail siswa, termasuk nama kelasnya, berdasarkan `id_siswa`.
     """
-    try:
+    async def muat():
         # Query ke Supabase untuk mengambil data dari tabel 'siswa'
         # dan melakukan 'join' ke tabel 'kelas'
-        response = supabase.table("siswa") \
+        response = await run_in_thread(supabase.table("siswa") \
             .select("nis, nisn, nik, tanggal_lahir, nama_siswa, kelas(nama_kelas)") \
             .eq("id_siswa", id_siswa) \
             .maybe_single() \
-            .execute()
-
-        siswa_data = response.data
+            .execute)
 
-        # Jika siswa dengan ID tersebut tidak ditemukan
+        # maybe_single() mengembalikan None jika siswa tidak ditemukan; hasil kosong tidak di-cache
+        siswa_data = response.data if response else None
         if not siswa_data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Siswa dengan ID {id_siswa} tidak ditemukan."
-            )
+            return None
 
         # --- Transformasi Data ---
         # Respon dari Supabase untuk join akan berbentuk nested dictionary.
         # Kita perlu meratakannya agar sesuai dengan model Pydantic.
         kelas_data = siswa_data.get("kelas")
 
-        result = {
+        return {
             "nis": siswa_data.get("nis"),
             "nisn": siswa_data.get("nisn"),
             "nik": siswa_data.get("nik"),
@@ -674,87 +1385,46 @@ async def get_siswa_by_id(id_siswa: int):
             "nama_siswa": siswa_data.get("nama_siswa"),
             "kelas": kelas_data.get("nama_kelas") if kelas_data else "Belum ada kelas"
         }
-        return result
 
+    try:
+        result = await siswa_cache.ambil_atau_muat(f"siswa:{id_siswa}:detail", muat)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    # Jika siswa dengan ID tersebut tidak ditemukan
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Siswa dengan ID {id_siswa} tidak ditemukan."
+        )
+    return result
+
 
 @app.get(
     "/siswa/all",
     response_model=List[SiswaDataResponse],
+    response_model_exclude_unset=True,
     tags=["Siswa"],
     summary="Dapatkan Semua Data Siswa dan Pendaftarannya",
-    description="Mengambil seluruh data siswa, termasuk data pendaftaran jika ada."
+    description="Mengambil data siswa per halaman, termasuk data pendaftaran jika ada."
 )
-async def get_all_siswa():
+async def get_all_siswa(
+        response: Response,
+        limit: int = Query(100, ge=1, le=1000),
+        cursor: Optional[int] = Query(None, description="Nilai header `X-Next-Cursor` dari halaman sebelumnya."),
+        id_kelas: Optional[int] = None,
+        status_validasi: Optional[str] = None,
+        id_periode: Optional[int] = None,
+        fields: Optional[str] = Query(None, description="Kolom yang diambil, dipisah koma.")
+):
     """
-    Endpoint ini melakukan query ke Supabase untuk mendapatkan daftar semua siswa.
+    Endpoint ini melakukan query ke Supabase untuk mendapatkan daftar siswa.
     - Menggunakan LEFT JOIN untuk menyertakan data pendaftaran.
     - Jika siswa belum mendaftar, `pendaftaran_data` akan bernilai `null`.
+    - Filter `status_validasi`/`id_periode` hanya menyertakan siswa yang punya pendaftaran yang cocok.
+    - Jika masih ada halaman berikutnya, header `X-Next-Cursor` berisi cursor-nya.
     """
-    try:
-        # Query Supabase dengan LEFT JOIN ke tabel pendaftaran
-        # Syntax !left(*) adalah cara PostgREST untuk melakukan LEFT JOIN
-        response = supabase.table("siswa") \
-            .select("*, kelas(nama_kelas), pendaftaran!left(*)") \
-            .order("id_siswa", desc=True) \
-            .execute()
-
-        if not response.data:
-            return []
-
-        # --- Transformasi Data ---
-        # Respon Supabase perlu diubah strukturnya agar sesuai dengan model output
-        results = []
-        for record in response.data:
-            # Siapkan data personal
-            kelas_data = record.get("kelas")
-            personal_data_obj = PersonalData(
-                id_siswa=record.get("id_siswa"),
-                nis=record.get("nis"),
-                nisn=record.get("nisn"),
-                nik=record.get("nik"),
-                tanggal_lahir=record.get("tanggal_lahir"),
-                nama_siswa=record.get("nama_siswa"),
-                kelas=kelas_data.get("nama_kelas") if kelas_data else "Belum ada kelas",
-                alamat_email=record.get("alamat_email"),
-                no_telepon=record.get("no_telepon")
-            )
-
-            # Siapkan data pendaftaran (jika ada)
-            pendaftaran_data_list = record.get("pendaftaran", [])
-            pendaftaran_data_obj = None
-            if pendaftaran_data_list:
-                # Ambil data pendaftaran pertama jika ada (biasanya hanya satu per siswa)
-                pendaftaran_raw = pendaftaran_data_list[0]
-                pendaftaran_data_obj = PendaftaranData(
-                    id_pendaftaran=pendaftaran_raw.get("id_pendaftaran"),
-                    status_validasi=pendaftaran_raw.get("status_validasi"),
-                    penghasilan_orangtua=pendaftaran_raw.get("penghasilan_orangtua"),
-                    jumlah_tanggungan=pendaftaran_raw.get("jumlah_tanggungan"),
-                    luas_rumah=pendaftaran_raw.get("luas_rumah"),
-                    peringkat_kelas=pendaftaran_raw.get("peringkat_kelas"),
-                    rerata_nilai=pendaftaran_raw.get("rerata_nilai"),
-                    file_keterangan_penghasilan=pendaftaran_raw.get("file_keterangan_penghasilan"),
-                    file_kartu_keluarga=pendaftaran_raw.get("file_kartu_keluarga"),
-                    file_pbb=pendaftaran_raw.get("file_pbb"),
-                    file_rapor=pendaftaran_raw.get("file_rapor")
-                    # Map field lain jika perlu
-                )
-
-            # Gabungkan menjadi satu objek dan tambahkan ke list hasil
-            results.append(SiswaDataResponse(
-                personal_data=personal_data_obj,
-                pendaftaran_data=pendaftaran_data_obj
-            ))
-
-        return results
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Terjadi kesalahan saat mengambil data siswa: {str(e)}")
+    return await daftar_siswa(response, "left", fields, limit, cursor, id_kelas, status_validasi, id_periode)
 
 
 @app.post(
@@ -779,7 +1449,7 @@ async def create_siswa(siswa_data: SiswaCreate):
         data_to_insert['tanggal_lahir'] = data_to_insert['tanggal_lahir'].isoformat()
 
         # Eksekusi perintah INSERT ke tabel 'siswa'
-        response = supabase.table("siswa").insert(data_to_insert).execute()
+        response = await run_in_thread(supabase.table("siswa").insert(data_to_insert).execute)
 
         # Jika Supabase tidak mengembalikan data, berarti ada masalah
         if not response.data:
@@ -788,6 +1458,11 @@ async def create_siswa(siswa_data: SiswaCreate):
                 detail="Gagal menambahkan siswa. Periksa kembali data Anda."
             )
 
+        invalidasi_ranking()
+        # Siswa baru mungkin tercatat sebagai "tidak ditemukan" di cache verifikasi
+        lupakan_check_siswa()
+        await lupakan_siswa(response.data[0].get("id_siswa"))
+
         # Mengembalikan data siswa yang baru saja dibuat
         return response.data[0]
 
@@ -805,6 +1480,156 @@ async def create_siswa(siswa_data: SiswaCreate):
             detail=f"Terjadi kesalahan pada server: {str(e)}"
         )
 
+SISWA_IMPORT_WAJIB = ["id_kelas", "nis", "nisn", "nik", "nama_siswa", "tanggal_lahir"]
+SISWA_IMPORT_KOLOM = SISWA_IMPORT_WAJIB + ["alamat_email", "no_telepon"]
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+
+async def baca_data_import(request: Request) -> pd.DataFrame:
+    """Membaca data import dari body JSON (array objek) atau file CSV/XLSX pada field form `file`."""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            data = await request.json()
+            if not isinstance(data, list):
+                raise ValueError("Body JSON harus berupa array objek siswa.")
+            return pd.DataFrame(data, dtype=object)
+
+        form = await request.form()
+        upload_file = form.get("file")
+        if upload_file is None or isinstance(upload_file, str):
+            raise ValueError("Kirim array JSON atau file CSV/XLSX pada field 'file'.")
+        isi = await upload_file.read()
+        if (upload_file.filename or "").lower().endswith(".xlsx"):
+            return pd.read_excel(io.BytesIO(isi), dtype=str)
+        return pd.read_csv(io.BytesIO(isi), dtype=str, keep_default_na=False, na_values=[""])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Data import tidak dapat dibaca: {str(e)}")
+
+def validasi_data_import(df: pd.DataFrame, kelas_valid: set) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Validasi seluruh baris sekaligus (tanpa loop per baris).
+    Mengembalikan DataFrame yang sudah dinormalisasi dan Series pesan error per baris ('' jika valid).
+    """
+    df = df.reindex(columns=SISWA_IMPORT_KOLOM)
+    for kolom in ["nis", "nisn", "nik", "nama_siswa", "alamat_email", "no_telepon"]:
+        teks = df[kolom].astype("string").str.strip()
+        df[kolom] = teks.mask(teks == "")
+
+    id_kelas = pd.to_numeric(df["id_kelas"], errors="coerce")
+    # Nilai pecahan (mis. 1.5) tidak bisa di-cast ke Int64: dianggap tidak valid seperti teks
+    id_kelas = id_kelas.where(id_kelas % 1 == 0)
+    tanggal_lahir = pd.to_datetime(df["tanggal_lahir"], errors="coerce")
+    df["id_kelas"] = id_kelas.astype("Int64")
+    df["tanggal_lahir"] = tanggal_lahir.dt.date
+
+    pesan = pd.Series("", index=df.index, dtype=object)
+    def tandai(mask: pd.Series, teks: str):
+        pesan.loc[mask & (pesan == "")] = teks
+
+    for kolom in SISWA_IMPORT_WAJIB:
+        tandai(df[kolom].isna(), f"Kolom '{kolom}' wajib diisi dengan nilai yang valid.")
+    tandai(~id_kelas.isin(list(kelas_valid)), "id_kelas tidak ditemukan.")
+    tandai(df["nisn"].duplicated(keep="first") & df["nisn"].notna(), "NISN duplikat di dalam file.")
+    tandai(df["nik"].duplicated(keep="first") & df["nik"].notna(), "NIK duplikat di dalam file.")
+    return df, pesan
+
+async def insert_siswa_chunk(conn: asyncpg.Connection, chunk: pd.DataFrame) -> Dict[str, int]:
+    """Insert banyak siswa dalam satu statement; baris yang bentrok data unik dilewati. Mengembalikan {nisn: id_siswa}."""
+    rows = await conn.fetch(
+        """
+        INSERT INTO siswa (id_kelas, nis, nisn, nik, nama_siswa, tanggal_lahir, alamat_email, no_telepon)
+        SELECT * FROM unnest($1::int[], $2::text[], $3::text[], $4::text[], $5::text[], $6::date[], $7::text[], $8::text[])
+        ON CONFLICT DO NOTHING
+        RETURNING id_siswa, nisn
+        """,
+        *[
+            [None if pd.isna(v) else (int(v) if kolom == "id_kelas" else v) for v in chunk[kolom]]
+            for kolom in SISWA_IMPORT_KOLOM
+        ]
+    )
+    return {row["nisn"]: row["id_siswa"] for row in rows}
+
+@app.post(
+    "/siswa/bulk",
+    response_model=BulkImportResponse,
+    tags=["Siswa"],
+    summary="Import Banyak Siswa Sekaligus",
+    description="Menambahkan banyak siswa dari array JSON atau file CSV/XLSX dalam beberapa batch insert."
+)
+async def bulk_import_siswa(
+        request: Request,
+        chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=5000),
+        conn: asyncpg.Connection = Depends(get_db)
+):
+    """
+    Endpoint import siswa massal.
+
+    - Menerima `application/json` (array objek seperti `POST /siswa`) atau form dengan field `file` (CSV/XLSX).
+    - Validasi dilakukan sekaligus untuk semua baris, baris yang tidak valid dilaporkan tanpa membatalkan batch.
+    - Baris yang NISN/NIK-nya sudah terdaftar dilaporkan sebagai konflik per baris.
+    - Jika satu batch insert gagal, baris-barisnya dilaporkan gagal dan batch lain tetap disimpan.
+    - `baris` pada laporan adalah nomor baris data, dimulai dari 1.
+    """
+    df = await baca_data_import(request)
+    if df.empty:
+        return BulkImportResponse(jumlah_baris=0, berhasil=0, gagal=[])
+
+    try:
+        kelas_valid = {row["id_kelas"] for row in await conn.fetch("SELECT id_kelas FROM kelas")}
+        df, pesan = validasi_data_import(df, kelas_valid)
+
+        # Tandai baris yang NISN/NIK-nya sudah ada di database
+        valid = pesan == ""
+        terdaftar = await conn.fetch(
+            "SELECT nisn, nik FROM siswa WHERE nisn = ANY($1::text[]) OR nik = ANY($2::text[])",
+            list(df.loc[valid, "nisn"]), list(df.loc[valid, "nik"])
+        )
+        pesan.loc[valid & df["nisn"].isin({r["nisn"] for r in terdaftar})] = "NISN sudah terdaftar."
+        pesan.loc[(pesan == "") & df["nik"].isin({r["nik"] for r in terdaftar})] = "NIK sudah terdaftar."
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan pada server: {str(e)}"
+        )
+
+    # Setiap chunk adalah satu statement (atomik). Chunk yang gagal dilaporkan per baris
+    # tanpa membatalkan chunk yang sudah tersimpan, sehingga invalidasi di bawah tetap berjalan.
+    siap = df[pesan == ""]
+    berhasil = 0
+    for awal in range(0, len(siap), chunk_size):
+        chunk = siap.iloc[awal:awal + chunk_size]
+        try:
+            tersimpan = await insert_siswa_chunk(conn, chunk)
+        except Exception as e:
+            logger.exception("Gagal menyimpan chunk import siswa")
+            pesan.loc[chunk.index] = f"Gagal menyimpan: {str(e)}"
+            continue
+        berhasil += len(tersimpan)
+        # Baris yang tidak kembali dari RETURNING bentrok dengan data yang masuk bersamaan
+        pesan.loc[chunk.index[~chunk["nisn"].isin(tersimpan)]] = "NISN atau NIK sudah terdaftar."
+
+    if berhasil:
+        invalidasi_ranking()
+        lupakan_check_siswa()
+
+    gagal = df[pesan != ""]
+    return BulkImportResponse(
+        jumlah_baris=len(df),
+        berhasil=berhasil,
+        gagal=[
+            BulkImportError(
+                baris=int(idx) + 1,
+                nisn=None if pd.isna(nisn) else nisn,
+                nik=None if pd.isna(nik) else nik,
+                pesan=pesan[idx]
+            )
+            for idx, nisn, nik in zip(gagal.index, gagal["nisn"], gagal["nik"])
+        ]
+    )
+
 # ===========================================================================
 # Statistik
 # ===========================================================================
@@ -814,39 +1639,71 @@ async def create_siswa(siswa_data: SiswaCreate):
     response_model=StatistikPendaftaranResponse,
     tags=["Statistik"],
     summary="Dapatkan Statistik Pendaftaran",
-    description="Mengambil data agregat seperti jumlah pendaftar, rata-rata nilai, dan rata-rata peringkat dari semua pendaftar."
+    description="Mengambil data agregat seperti jumlah pendaftar, rata-rata nilai, rata-rata peringkat, "
+                "serta sebaran per status validasi dan per kelas."
 )
-async def get_statistik_pendaftaran():
+async def get_statistik_pendaftaran(id_periode: Optional[int] = None, status_validasi: Optional[str] = None):
     """
-    Memanggil fungsi RPC `get_statistik_pendaftaran` di Supabase untuk
-    mendapatkan data agregat secara efisien.
+    Dibaca dari agregat berjalan di memori (lihat `statistik.py`) yang diperbarui setiap kali
+    pendaftaran ditambah, diubah statusnya, atau dihapus. Tanpa `id_periode`, semua periode digabung.
     """
     try:
-        # Panggil RPC function yang sudah dibuat di Supabase
-        response = supabase.rpc("get_statistik_pendaftaran").execute()
+        agregat = await statistik.agregat(id_periode, status_validasi)
 
-        # RPC akan mengembalikan list dengan satu dictionary di dalamnya
-        if not response.data:
-            # Ini terjadi jika fungsi RPC tidak mengembalikan baris, misal karena error tak terduga
-            # atau jika tabel kosong, COUNT akan 0 dan AVG akan NULL.
-            return StatistikPendaftaranResponse(jumlah_pendaftar=0, rerata_nilai=0.0, rerata_peringkat=0.0)
+        return StatistikPendaftaranResponse(
+            jumlah_pendaftar=agregat.jumlah,
+            rerata_nilai=round(agregat.rerata_nilai.rerata or 0, 2),
+            rerata_peringkat=round(agregat.peringkat_kelas.rerata or 0, 2),
+            per_status=dict(agregat.per_status),
+            per_kelas=dict(sorted(agregat.per_kelas.items()))
+        )
 
-        stats_data = response.data[0]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan saat mengambil statistik: {str(e)}"
+        )
 
-        # Konversi nilai ke float, tangani kasus NULL dari AVG jika tabel kosong
-        rerata_nilai_val = float(stats_data.get('rerata_nilai') or 0)
-        rerata_peringkat_val = float(stats_data.get('rerata_peringkat') or 0)
+@app.get(
+    "/statistik/kriteria",
+    response_model=List[DistribusiKriteriaResponse],
+    tags=["Statistik"],
+    summary="Distribusi Semua Kriteria",
+    description="Sebaran nilai setiap kriteria SAW: rata-rata, simpangan baku, dan jumlah pendaftar per band skor."
+)
+async def get_distribusi_kriteria(id_periode: Optional[int] = None, status_validasi: Optional[str] = None):
+    try:
+        agregat = await statistik.agregat(id_periode, status_validasi)
+        return [statistik.distribusi(agregat, kode) for kode in statistik.kode]
 
-        return StatistikPendaftaranResponse(
-            jumlah_pendaftar=stats_data.get('jumlah_pendaftar', 0),
-            rerata_nilai=round(rerata_nilai_val, 2),
-            rerata_peringkat=round(rerata_peringkat_val, 2)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan saat mengambil distribusi kriteria: {str(e)}"
+        )
+
+@app.get(
+    "/statistik/kriteria/{kode}",
+    response_model=DistribusiKriteriaResponse,
+    tags=["Statistik"],
+    summary="Distribusi Satu Kriteria",
+    description="Sebaran nilai satu kriteria SAW (mis. C1) per band skor."
+)
+async def get_distribusi_satu_kriteria(kode: str, id_periode: Optional[int] = None,
+                                       status_validasi: Optional[str] = None):
+    if kode not in statistik.kode:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Kriteria '{kode}' tidak ditemukan."
         )
+    try:
+        agregat = await statistik.agregat(id_periode, status_validasi)
+        return statistik.distribusi(agregat, kode)
 
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Terjadi kesalahan saat mengambil statistik: {str(e)}"
+            detail=f"Terjadi kesalahan saat mengambil distribusi kriteria: {str(e)}"
         )
 
 # ===========================================================================
@@ -867,63 +1724,315 @@ async def update_publish_status(id_periode: int, publish_data: PublishStatusUpda
     """
     try:
         # Update kolom 'is_publish' di tabel 'periode_beasiswa'
-        response = supabase.table("periode_beasiswa") \
+        response = await run_in_thread(supabase.table("periode_beasiswa") \
             .update({"is_publish": publish_data.is_publish}) \
             .eq("id_periode", id_periode) \
-            .execute()
+            .execute)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan pada server: {str(e)}"
+        )
 
-        # Jika tidak ada baris yang diupdate, berarti ID tidak ditemukan
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
-            )
+    # Jika tidak ada baris yang diupdate, berarti ID tidak ditemukan
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
+        )
 
-        return {
-            "message": "Status publikasi berhasil diperbarui.",
-            "data": response.data[0]
-        }
+    # Cache status langsung diperbarui dan pelanggan SSE diberi tahu
+    publikasi.set_status(id_periode, response.data[0].get("is_publish", publish_data.is_publish))
 
+    return {
+        "message": "Status publikasi berhasil diperbarui.",
+        "data": response.data[0]
+    }
+
+@app.patch(
+    "/periode/{id_periode}/kuota",
+    tags=["Periode Beasiswa"],
+    summary="Update Kuota Rekomendasi Periode",
+    description="Mengubah jumlah pendaftar yang direkomendasikan pada sebuah periode beasiswa."
+)
+async def update_kuota_periode(id_periode: int, kuota_data: KuotaUpdate):
+    """
+    Endpoint untuk mengupdate `kuota` dari sebuah periode beasiswa.
+    Kuota baru berlaku pada perhitungan berikutnya (`POST /beasiswa/rank/save`).
+
+    - **id_periode**: ID dari periode yang akan diupdate.
+    - **Request Body**: `{"kuota": 10}`, atau `{"kuota": null}` untuk kuota bawaan.
+    """
+    if kuota_data.kuota is not None and kuota_data.kuota < 0:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Kuota tidak boleh negatif."
+        )
+
+    try:
+        response = await run_in_thread(supabase.table("periode_beasiswa") \
+            .update({"kuota": kuota_data.kuota}) \
+            .eq("id_periode", id_periode) \
+            .execute)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Terjadi kesalahan pada server: {str(e)}"
         )
 
-    # --- ENDPOINT API (Baru) ---
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
+        )
+
+    invalidasi_ranking()
+    return {
+        "message": "Kuota rekomendasi berhasil diperbarui.",
+        "data": response.data[0]
+    }
+
+async def muat_status_publikasi(id_periode: int) -> Optional[bool]:
+    # Ambil hanya kolom 'is_publish' untuk efisiensi
+    response = await run_in_thread(supabase.table("periode_beasiswa") \
+        .select("is_publish") \
+        .eq("id_periode", id_periode) \
+        .maybe_single() \
+        .execute)
+    # maybe_single() mengembalikan None jika periode tidak ditemukan
+    return bool(response.data['is_publish']) if response and response.data else None
+
+async def muat_hasil_publikasi(id_periode: int) -> List[dict]:
+    return [item.dict() for item in await get_rank_snapshot(id_periode) or []]
+
+# Status publikasi dan snapshot peringkat yang dipublikasikan, di-cache beserta ETag-nya
+publikasi = CachePublikasi(muat_status_publikasi, muat_hasil_publikasi)
+PUBLIKASI_SSE_HEARTBEAT = float(os.getenv("PUBLIKASI_SSE_HEARTBEAT", 15))
+
+def respons_etag(request: Request, isi: bytes, etag: str) -> Response:
+    """Respons JSON dengan ETag; 304 tanpa body jika `If-None-Match` cocok."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    cocok = request.headers.get("if-none-match")
+    if cocok and (cocok.strip() == "*" or etag in (t.strip().removeprefix("W/") for t in cocok.split(","))):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=isi, media_type="application/json", headers=headers)
+
 @app.get(
     "/periode/{id_periode}/is-publish",
     response_model=IsPublishResponse,
     tags=["Periode Beasiswa"],
     summary="Cek Status Publikasi Periode",
-    description="Mendapatkan status 'is_publish' (true atau false) dari sebuah periode beasiswa."
+    description="Mendapatkan status 'is_publish' (true atau false) dari sebuah periode beasiswa. "
+                "Mendukung `If-None-Match`: jika status belum berubah, dikembalikan 304 tanpa body."
 )
-async def check_is_publish(id_periode: int):
+async def check_is_publish(id_periode: int, request: Request):
     """
     Endpoint untuk mengecek status `is_publish` dari sebuah periode beasiswa.
+    Status dibaca dari cache yang diperbarui oleh `PATCH /periode/{id_periode}/publish`.
 
     - **id_periode**: ID dari periode yang akan diperiksa.
     """
     try:
-        # Ambil hanya kolom 'is_publish' untuk efisiensi
-        response = supabase.table("periode_beasiswa") \
-            .select("is_publish") \
-            .eq("id_periode", id_periode) \
-            .maybe_single() \
-            .execute()
+        status_periode = await publikasi.status(id_periode)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan pada server: {str(e)}"
+        )
 
-        # Jika tidak ada record yang ditemukan
-        if not response.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
-            )
+    # Jika tidak ada record yang ditemukan
+    if status_periode.is_publish is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
+        )
 
-        # Kembalikan data dalam format yang sesuai dengan model respons
-        return IsPublishResponse(is_publish=response.data['is_publish'])
+    return respons_etag(request, status_periode.isi, status_periode.etag)
 
+@app.get(
+    "/periode/{id_periode}/is-publish/stream",
+    tags=["Periode Beasiswa"],
+    summary="Langganan Status Publikasi Periode (SSE)",
+    description="Server-sent events: mengirim event `status` berisi `{\"is_publish\": ...}` saat tersambung "
+                "dan setiap kali status publikasi berubah, sehingga klien tidak perlu polling."
+)
+async def stream_is_publish(id_periode: int, request: Request):
+    """
+    Setiap event memakai ETag status sebagai `id`, sehingga klien yang tersambung ulang
+    dengan `Last-Event-ID` hanya menerima event jika statusnya berubah sejak itu.
+    Komentar `: ping` dikirim setiap `PUBLIKASI_SSE_HEARTBEAT` detik agar koneksi tidak diputus proxy.
+    """
+    try:
+        status_periode = await publikasi.status(id_periode)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Terjadi kesalahan pada server: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+    if status_periode.is_publish is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Periode beasiswa dengan ID {id_periode} tidak ditemukan."
+        )
+
+    async def aliran() -> AsyncIterator[str]:
+        terakhir = request.headers.get("last-event-id")
+        while not await request.is_disconnected():
+            status_periode = await publikasi.status(id_periode)
+            # Event diambil sebelum mengirim agar perubahan di antaranya tidak terlewat
+            berubah = status_periode.berubah
+            if status_periode.etag != terakhir:
+                terakhir = status_periode.etag
+                yield f"id: {terakhir}\nevent: status\ndata: {status_periode.isi.decode()}\n\n"
+            else:
+                yield ": ping\n\n"
+            try:
+                await asyncio.wait_for(berubah.wait(), PUBLIKASI_SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(
+        aliran(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get(
+    "/periode/{id_periode}/hasil",
+    response_model=List[RankDetailResponse],
+    tags=["Periode Beasiswa"],
+    summary="Hasil Peringkat yang Dipublikasikan",
+    description="Mengembalikan snapshot peringkat periode yang sudah dipublikasikan. "
+                "Mendukung `If-None-Match`: jika hasil belum berubah, dikembalikan 304 tanpa body."
+)
+async def get_hasil_publikasi(id_periode: int, request: Request):
+    try:
+        status_periode = await publikasi.hasil(id_periode)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan pada server: {str(e)}"
+        )
+
+    if status_periode is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Hasil periode beasiswa dengan ID {id_periode} belum dipublikasikan."
+        )
+
+    return respons_etag(request, status_periode.hasil_isi, status_periode.hasil_etag)
+
+# ===========================================================================
+# Export
+# ===========================================================================
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", 1000))
+EXPORT_SISWA_KOLOM = SISWA_KOLOM + ["kelas"] + PENDAFTARAN_KOLOM
+EXPORT_RANK_KOLOM = ["peringkat"] + list(RankDetailResponse.__fields__)
+
+async def halaman_siswa(halaman_pertama: List[dict]) -> AsyncIterator[List[dict]]:
+    """Menghasilkan halaman-halaman data siswa (sudah diratakan) mengikuti cursor `id_siswa`."""
+    records = halaman_pertama
+    while records:
+        yield [
+            {**item.personal_data.dict(), **(item.pendaftaran_data.dict() if item.pendaftaran_data else {})}
+            for item in map(siswa_data_response, records)
+        ]
+        if len(records) < EXPORT_PAGE_SIZE:
+            return
+        query = query_daftar_siswa("*, kelas(nama_kelas), pendaftaran!left(*)", EXPORT_PAGE_SIZE,
+                                   records[-1]["id_siswa"], None, None, None)
+        records = (await run_in_thread(query.execute)).data
+
+async def halaman_rank(id_periode: int, halaman_pertama: List[dict]) -> AsyncIterator[List[dict]]:
+    """Menghasilkan halaman-halaman snapshot peringkat mengikuti cursor `peringkat`."""
+    records = halaman_pertama
+    while records:
+        halaman = []
+        for item in records:
+            detail = rank_detail_dari_snapshot(item)
+            if detail is not None:
+                halaman.append({"peringkat": item["peringkat"], **detail.dict()})
+        yield halaman
+        if len(records) < EXPORT_PAGE_SIZE:
+            return
+        query = query_rank_snapshot(id_periode).gt("peringkat", records[-1]["peringkat"]).limit(EXPORT_PAGE_SIZE)
+        records = (await run_in_thread(query.execute)).data
+
+async def serialisasi(halaman: AsyncIterator[List[dict]], kolom: List[str], format: str) -> AsyncIterator[str]:
+    """Mengubah aliran halaman menjadi baris NDJSON atau CSV tanpa menampung seluruh data."""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=kolom, extrasaction="ignore")
+        writer.writeheader()
+        async for rows in halaman:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        async for rows in halaman:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+def streaming_export(isi: AsyncIterator[str], nama_file: str, format: str) -> StreamingResponse:
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        isi,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nama_file}.{format}"'}
+    )
+
+@app.get(
+    "/export/siswa",
+    tags=["Export"],
+    summary="Export Semua Siswa dan Pendaftarannya",
+    description="Mengalirkan seluruh data siswa beserta data pendaftaran sebagai NDJSON atau CSV."
+)
+async def export_siswa(format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Data diambil per halaman (`EXPORT_PAGE_SIZE` baris) dan langsung dikirim,
+    sehingga memori tetap konstan berapa pun jumlah siswanya.
+    """
+    try:
+        # Halaman pertama diambil sebelum respons dimulai agar error tetap menjadi status HTTP yang benar
+        query = query_daftar_siswa("*, kelas(nama_kelas), pendaftaran!left(*)", EXPORT_PAGE_SIZE, None, None, None, None)
+        halaman_pertama = (await run_in_thread(query.execute)).data
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan saat mengambil data siswa: {str(e)}")
+
+    isi = serialisasi(halaman_siswa(halaman_pertama), EXPORT_SISWA_KOLOM, format)
+    return streaming_export(isi, "siswa", format)
+
+@app.get(
+    "/export/rank",
+    tags=["Export"],
+    summary="Export Hasil Peringkat Beasiswa",
+    description="Mengalirkan hasil peringkat tersimpan (`hasil_saw`) sebagai NDJSON atau CSV."
+)
+async def export_rank(id_periode: int = ID_PERIODE_AKTIF, format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Membaca snapshot `hasil_saw` per halaman. Jika belum ada snapshot,
+    hasil perhitungan langsung yang dikirim.
+    """
+    try:
+        query = query_rank_snapshot(id_periode).limit(EXPORT_PAGE_SIZE)
+        halaman_pertama = (await run_in_thread(query.execute)).data
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan saat mengambil data peringkat: {str(e)}")
+
+    if halaman_pertama:
+        halaman = halaman_rank(id_periode, halaman_pertama)
+    else:
+        # Belum ada snapshot: hasil perhitungan langsung sudah berada di memori
+        hasil_live = await get_rank_beasiswa(id_periode=id_periode, fresh=True)
+
+        async def halaman_live():
+            yield [{"peringkat": i, **item.dict()} for i, item in enumerate(hasil_live, start=1)]
+        halaman = halaman_live()
+
+    isi = serialisasi(halaman, EXPORT_RANK_KOLOM, format)
+    return streaming_export(isi, f"peringkat-periode-{id_periode}", format)
@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket histogram (detik), sama dengan bawaan client Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Label = Tuple[Tuple[str, str], ...]
+
+
+def _label(label: Dict[str, str]) -> Label:
+    return tuple(sorted((k, str(v)) for k, v in label.items()))
+
+
+def _format_label(label: Label, tambahan: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pasangan = label + tambahan
+    if not pasangan:
+        return ""
+    isi = ",".join(
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in pasangan
+    )
+    return "{" + isi + "}"
+
+
+class Counter:
+    def __init__(self, nama: str, bantuan: str):
+        self.nama, self.bantuan = nama, bantuan
+        self._nilai: Dict[Label, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, jumlah: float = 1.0, **label):
+        kunci = _label(label)
+        with self._lock:
+            self._nilai[kunci] = self._nilai.get(kunci, 0.0) + jumlah
+
+    def render(self) -> List[str]:
+        baris = [f"# HELP {self.nama} {self.bantuan}", f"# TYPE {self.nama} counter"]
+        with self._lock:
+            baris += [f"{self.nama}{_format_label(k)} {v}" for k, v in self._nilai.items()]
+        return baris
+
+
+class Histogram:
+    def __init__(self, nama: str, bantuan: str, buckets: Tuple[float, ...] = BUCKETS):
+        self.nama, self.bantuan, self.buckets = nama, bantuan, buckets
+        # label -> [jumlah per bucket..., jumlah total, jumlah nilai]
+        self._nilai: Dict[Label, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, nilai: float, **label):
+        kunci = _label(label)
+        with self._lock:
+            data = self._nilai.setdefault(kunci, [0] * len(self.buckets) + [0.0, 0])
+            for i, batas in enumerate(self.buckets):
+                if nilai <= batas:
+                    data[i] += 1
+            data[-2] += nilai
+            data[-1] += 1
+
+    def render(self) -> List[str]:
+        baris = [f"# HELP {self.nama} {self.bantuan}", f"# TYPE {self.nama} histogram"]
+        with self._lock:
+            for kunci, data in self._nilai.items():
+                for batas, jumlah in zip(self.buckets, data):
+                    baris.append(f"{self.nama}_bucket{_format_label(kunci, (('le', repr(batas)),))} {jumlah}")
+                baris.append(f"{self.nama}_bucket{_format_label(kunci, (('le', '+Inf'),))} {data[-1]}")
+                baris.append(f"{self.nama}_sum{_format_label(kunci)} {data[-2]}")
+                baris.append(f"{self.nama}_count{_format_label(kunci)} {data[-1]}")
+        return baris
+
+
+class Gauge:
+    """Gauge yang nilainya dibaca dari `fn` saat /metrics diminta."""
+
+    def __init__(self, nama: str, bantuan: str, fn: Callable[[], float]):
+        self.nama, self.bantuan, self.fn = nama, bantuan, fn
+
+    def render(self) -> List[str]:
+        try:
+            nilai = self.fn()
+        except Exception:
+            logger.exception("Gagal membaca gauge %s", self.nama)
+            return []
+        if nilai is None:
+            return []
+        return [f"# HELP {self.nama} {self.bantuan}", f"# TYPE {self.nama} gauge", f"{self.nama} {float(nilai)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrik = []
+
+    def counter(self, nama: str, bantuan: str) -> Counter:
+        return self._daftar(Counter(nama, bantuan))
+
+    def histogram(self, nama: str, bantuan: str, buckets: Tuple[float, ...] = BUCKETS) -> Histogram:
+        return self._daftar(Histogram(nama, bantuan, buckets))
+
+    def gauge(self, nama: str, bantuan: str, fn: Callable[[], float]) -> Gauge:
+        return self._daftar(Gauge(nama, bantuan, fn))
+
+    def _daftar(self, metrik):
+        self._metrik.append(metrik)
+        return metrik
+
+    def render(self) -> str:
+        """Format teks eksposisi Prometheus (text/plain; version=0.0.4)."""
+        return "\n".join(baris for metrik in self._metrik for baris in metrik.render()) + "\n"
+
+
+registry = Registry()
+
+HTTP_DURASI = registry.histogram("dss_http_request_duration_seconds", "Durasi permintaan HTTP per route.")
+HTTP_TOTAL = registry.counter("dss_http_requests_total", "Jumlah permintaan HTTP per route dan status.")
+SPAN_DURASI = registry.histogram("dss_span_duration_seconds", "Durasi span bernama (Supabase, tahapan SAW, upload).")
+SPAN_GAGAL = registry.counter("dss_span_errors_total", "Jumlah span yang berakhir dengan exception.")
+CACHE_BACA = registry.counter("dss_cache_reads_total", "Jumlah pembacaan cache read-through per hasil (hit/miss/error).")
+
+
+@contextmanager
+def span(nama: str) -> Iterator[None]:
+    """
+    Mengukur durasi satu blok kode sebagai span bernama. Bisa dipakai di kode sinkron
+    maupun async (`with span(...)`), termasuk di sekitar `await`.
+    """
+    mulai = time.perf_counter()
+    gagal = False
+    try:
+        yield
+    except BaseException:
+        gagal = True
+        raise
+    finally:
+        durasi = time.perf_counter() - mulai
+        SPAN_DURASI.observe(durasi, span=nama)
+        if gagal:
+            SPAN_GAGAL.inc(span=nama)
+        logger.debug("span", extra={"span": nama, "durasi_ms": round(durasi * 1000, 3), "gagal": gagal})
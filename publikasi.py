@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Status publikasi setiap periode (dan snapshot peringkat yang sudah dipublikasikan) disimpan
+# di memori beserta ETag-nya, sehingga polling pendaftar yang menunggu hasil tidak perlu
+# menyentuh database selama datanya belum berubah.
+logger = logging.getLogger(__name__)
+
+# Setelah sekian detik status dibaca ulang dari database, agar perubahan dari worker lain
+# tetap terlihat. Perubahan lewat worker ini langsung berlaku tanpa menunggu TTL.
+PUBLIKASI_TTL = float(os.getenv("PUBLIKASI_TTL", 30))
+
+
+def _etag(isi: bytes) -> str:
+    # Diturunkan dari isi respons, sehingga sama di semua worker untuk data yang sama
+    return f'"{hashlib.sha256(isi).hexdigest()[:32]}"'
+
+
+def _json(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+
+class StatusPeriode:
+    """Status publikasi satu periode beserta respons JSON dan ETag yang sudah dihitung."""
+    __slots__ = ("is_publish", "isi", "etag", "dimuat_pada",
+                 "hasil_isi", "hasil_etag", "hasil_dimuat_pada", "berubah")
+
+    def __init__(self):
+        self.is_publish: Optional[bool] = None   # None: periode tidak ditemukan
+        self.isi = b""
+        self.etag = ""
+        self.dimuat_pada = 0.0
+        self.hasil_isi: Optional[bytes] = None
+        self.hasil_etag: Optional[str] = None
+        self.hasil_dimuat_pada = 0.0
+        # Diganti dengan Event baru setiap kali status berubah; yang lama di-set
+        # untuk membangunkan semua pelanggan SSE sekaligus.
+        self.berubah = asyncio.Event()
+
+
+class CachePublikasi:
+    """
+    Cache berversi untuk status publikasi dan snapshot peringkat yang dipublikasikan.
+
+    `muat_status(id_periode)` mengembalikan `is_publish` (None jika periode tidak ada) dan
+    `muat_hasil(id_periode)` mengembalikan daftar baris peringkat yang JSON-serializable.
+    ETag (versi) status hanya berganti jika `is_publish` benar-benar berubah.
+    """
+
+    def __init__(self, muat_status: Callable[[int], Awaitable[Optional[bool]]],
+                 muat_hasil: Callable[[int], Awaitable[List[dict]]], ttl: float = PUBLIKASI_TTL):
+        self.muat_status = muat_status
+        self.muat_hasil = muat_hasil
+        self.ttl = ttl
+        self._status: Dict[int, StatusPeriode] = {}
+        self._kunci: Dict[int, asyncio.Lock] = {}
+
+    def __len__(self):
+        return len(self._status)
+
+    def _periode(self, id_periode: int) -> StatusPeriode:
+        status = self._status.get(id_periode)
+        if status is None:
+            status = self._status[id_periode] = StatusPeriode()
+            self._kunci[id_periode] = asyncio.Lock()
+        return status
+
+    def _basi(self, dimuat_pada: float) -> bool:
+        return not dimuat_pada or (self.ttl > 0 and time.monotonic() - dimuat_pada > self.ttl)
+
+    def set_status(self, id_periode: int, is_publish: Optional[bool]):
+        """Menerapkan status publikasi terbaru; pelanggan dibangunkan jika statusnya berubah."""
+        status = self._periode(id_periode)
+        status.dimuat_pada = time.monotonic()
+        if status.isi and status.is_publish == is_publish:
+            return
+        status.is_publish = is_publish
+        status.isi = _json({"is_publish": is_publish})
+        status.etag = _etag(status.isi)
+        # Snapshot hasil dimuat ulang saat dibaca berikutnya (publikasi baru atau ditarik)
+        status.hasil_isi = status.hasil_etag = None
+        status.hasil_dimuat_pada = 0.0
+        berubah, status.berubah = status.berubah, asyncio.Event()
+        berubah.set()
+        logger.info("Status publikasi berubah", extra={"id_periode": id_periode, "is_publish": is_publish})
+
+    async def status(self, id_periode: int) -> StatusPeriode:
+        """Status publikasi periode; database hanya dibaca jika belum dimuat atau melewati TTL."""
+        status = self._periode(id_periode)
+        if self._basi(status.dimuat_pada):
+            async with self._kunci[id_periode]:
+                # Permintaan serentak menunggu satu pemuatan yang sama
+                if self._basi(status.dimuat_pada):
+                    self.set_status(id_periode, await self.muat_status(id_periode))
+        return status
+
+    async def hasil(self, id_periode: int) -> Optional[StatusPeriode]:
+        """
+        Status periode dengan snapshot hasil terisi, atau None jika periode belum
+        dipublikasikan. ETag hasil tetap sama selama isinya tidak berubah.
+        """
+        status = await self.status(id_periode)
+        if not status.is_publish:
+            return None
+        if self._basi(status.hasil_dimuat_pada):
+            async with self._kunci[id_periode]:
+                if self._basi(status.hasil_dimuat_pada):
+                    isi = _json(await self.muat_hasil(id_periode))
+                    if isi != status.hasil_isi:
+                        status.hasil_isi, status.hasil_etag = isi, _etag(isi)
+                    status.hasil_dimuat_pada = time.monotonic()
+        return status if status.is_publish else None
+
+    def invalidasi_hasil(self, id_periode: Optional[int] = None):
+        """Menandai snapshot hasil (satu periode atau semua) untuk dimuat ulang saat dibaca berikutnya."""
+        for periode, status in self._status.items():
+            if id_periode is None or periode == id_periode:
+                status.hasil_dimuat_pada = 0.0
@@ -0,0 +1,4 @@
+-- Index untuk membaca snapshot peringkat per periode secara terurut
+-- (GET /beasiswa/rank membaca hasil_saw ... WHERE id_periode = $1 ORDER BY peringkat).
+CREATE INDEX IF NOT EXISTS idx_hasil_saw_periode_peringkat
+    ON hasil_saw (id_periode, peringkat);
@@ -0,0 +1,4 @@
+-- Satu baris hasil per pendaftar per periode; dipakai penyimpanan berbasis diff
+-- (POST /beasiswa/rank/save) untuk mencocokkan hasil lama dan baru.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_hasil_saw_periode_pendaftaran
+    ON hasil_saw (id_periode, id_pendaftaran);
@@ -0,0 +1,2 @@
+-- Kuota rekomendasi per periode. NULL berarti memakai bawaan KUOTA_REKOMENDASI (5).
+ALTER TABLE periode_beasiswa ADD COLUMN IF NOT EXISTS kuota integer CHECK (kuota >= 0);
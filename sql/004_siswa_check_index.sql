@@ -0,0 +1,10 @@
+-- Index komposit untuk verifikasi siswa di form pendaftaran
+-- (POST /siswa/check mencocokkan nisn, nis, nik, dan tanggal_lahir sekaligus).
+-- nisn diletakkan di depan karena paling selektif.
+CREATE INDEX IF NOT EXISTS idx_siswa_verifikasi
+    ON siswa (nisn, nis, nik, tanggal_lahir);
+
+-- Pendaftaran siswa pada satu periode, dipakai embed `pendaftaran(...)` pada /siswa/check
+-- dan pengecekan status pendaftaran.
+CREATE INDEX IF NOT EXISTS idx_pendaftaran_siswa_periode
+    ON pendaftaran (id_siswa, id_periode);
@@ -0,0 +1,334 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from supabase import Client
+
+from calculate_saw import ATURAN_KRITERIA, AturanKriteria
+from database import run_in_thread
+from metrics import span
+
+# Statistik pendaftaran disimpan sebagai agregat berjalan per (periode, status_validasi)
+# dan diperbarui setiap kali pendaftaran ditambah, diubah statusnya, atau dihapus, sehingga
+# dashboard tidak perlu mengagregasi seluruh tabel `pendaftaran` pada setiap permintaan.
+logger = logging.getLogger(__name__)
+
+# Agregat dibangun ulang dari database setelah sekian detik (0 = tidak pernah) agar penulisan
+# dari worker lain atau langsung ke database tetap terbaca dalam batas waktu ini.
+STATISTIK_TTL = float(os.getenv("STATISTIK_TTL", 300))
+# Baris dimuat per halaman dengan `.range()`: PostgREST memotong satu select pada max-rows
+# (1000 di Supabase) tanpa error, jadi ukuran halaman tidak boleh melebihi batas itu.
+STATISTIK_HALAMAN = int(os.getenv("STATISTIK_HALAMAN", 1000))
+
+KELAS_KOSONG = "N/A"
+
+
+class Kontribusi(NamedTuple):
+    """Bagian satu baris `pendaftaran` pada agregat, disimpan agar bisa dikurangkan kembali."""
+    id_periode: int
+    status_validasi: str
+    kelas: str
+    rerata_nilai: Optional[float]
+    peringkat_kelas: Optional[float]
+    # Nilai mentah dan indeks band setiap kriteria (urutan kode kriteria), None jika kosong
+    nilai: Tuple[Optional[float], ...]
+    band: Tuple[Optional[int], ...]
+
+
+class Momen:
+    """Jumlah data, total, dan total kuadrat: cukup untuk rata-rata dan simpangan baku yang bisa dikurangi."""
+    __slots__ = ("n", "total", "total_kuadrat")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_kuadrat = 0.0
+
+    def tambah(self, nilai: Optional[float], tanda: int = 1):
+        if nilai is None:
+            return
+        self.n += tanda
+        self.total += tanda * nilai
+        self.total_kuadrat += tanda * nilai * nilai
+
+    def gabung(self, lain: "Momen"):
+        self.n += lain.n
+        self.total += lain.total
+        self.total_kuadrat += lain.total_kuadrat
+
+    @property
+    def rerata(self) -> Optional[float]:
+        return self.total / self.n if self.n else None
+
+    @property
+    def simpangan_baku(self) -> Optional[float]:
+        if not self.n:
+            return None
+        rerata = self.total / self.n
+        return math.sqrt(max(self.total_kuadrat / self.n - rerata * rerata, 0.0))
+
+
+class Agregat:
+    """Agregat satu kelompok pendaftar: jumlah, momen nilai/peringkat, sebaran kelas, dan band kriteria."""
+    __slots__ = ("jumlah", "rerata_nilai", "peringkat_kelas", "per_status", "per_kelas", "kriteria", "band")
+
+    def __init__(self, n_kriteria: int):
+        self.jumlah = 0
+        self.rerata_nilai = Momen()
+        self.peringkat_kelas = Momen()
+        self.per_status: Counter = Counter()
+        self.per_kelas: Counter = Counter()
+        self.kriteria = [Momen() for _ in range(n_kriteria)]
+        self.band = [Counter() for _ in range(n_kriteria)]
+
+    def tambah(self, k: Kontribusi, tanda: int = 1):
+        self.jumlah += tanda
+        self.rerata_nilai.tambah(k.rerata_nilai, tanda)
+        self.peringkat_kelas.tambah(k.peringkat_kelas, tanda)
+        _hitung(self.per_status, k.status_validasi, tanda)
+        _hitung(self.per_kelas, k.kelas, tanda)
+        for momen, band, nilai, indeks in zip(self.kriteria, self.band, k.nilai, k.band):
+            momen.tambah(nilai, tanda)
+            if indeks is not None:
+                _hitung(band, indeks, tanda)
+
+    def gabung(self, lain: "Agregat"):
+        self.jumlah += lain.jumlah
+        self.rerata_nilai.gabung(lain.rerata_nilai)
+        self.peringkat_kelas.gabung(lain.peringkat_kelas)
+        self.per_status.update(lain.per_status)
+        self.per_kelas.update(lain.per_kelas)
+        for momen, band, momen_lain, band_lain in zip(self.kriteria, self.band, lain.kriteria, lain.band):
+            momen.gabung(momen_lain)
+            band.update(band_lain)
+
+
+def _hitung(counter: Counter, kunci, tanda: int):
+    # Entri yang turun ke nol dibuang agar sebaran tidak menampilkan kelompok kosong
+    counter[kunci] += tanda
+    if counter[kunci] <= 0:
+        del counter[kunci]
+
+
+def _angka(nilai) -> Optional[float]:
+    return None if nilai is None else float(nilai)
+
+
+def kelas_dari_baris(row: dict) -> Optional[str]:
+    """Nama kelas dari embed `siswa(kelas(nama_kelas))`, None jika baris tidak memuatnya."""
+    siswa = row.get('siswa')
+    if not isinstance(siswa, dict) or 'kelas' not in siswa:
+        return None
+    kelas = siswa['kelas']
+    return kelas.get('nama_kelas') if kelas else KELAS_KOSONG
+
+
+class StatistikPendaftaran:
+    """
+    Agregat statistik pendaftaran per (periode, status_validasi) di memori proses.
+
+    Dimuat dari database sekali (lazy, satu query) lalu dijaga tetap sinkron lewat
+    `perbarui`, `perbarui_banyak`, dan `hapus` yang dipanggil endpoint penulis pendaftaran.
+    Kontribusi setiap baris ikut disimpan sehingga perubahan status atau penghapusan
+    cukup mengurangkan kontribusi lama dan menambahkan yang baru.
+    """
+
+    def __init__(self, client: Client, aturan: Dict[str, AturanKriteria] = None):
+        self.client = client
+        self.aturan = aturan or ATURAN_KRITERIA
+        self.kode = sorted(self.aturan)
+        self._kontribusi: Optional[Dict[int, Kontribusi]] = None
+        self._agregat: Dict[Tuple[int, str], Agregat] = {}
+        self._dimuat_pada = 0.0
+        self._versi = 0
+        self._kunci_muat = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._kontribusi) if self._kontribusi is not None else 0
+
+    # --- Memuat dari database ---
+
+    def _select(self) -> str:
+        kolom = ", ".join(sorted({a.kolom for a in self.aturan.values()} - {"rerata_nilai", "peringkat_kelas"}))
+        return (f"id_pendaftaran, id_siswa, id_periode, status_validasi, rerata_nilai, peringkat_kelas, "
+                f"{kolom}, siswa(kelas(nama_kelas))")
+
+    def _susun(self, rows: List[dict]) -> Tuple[Dict[int, Kontribusi], Dict[Tuple[int, str], Agregat]]:
+        """Membangun kontribusi dan agregat dari banyak baris; band dihitung per kolom sekaligus."""
+        nilai_per_kode = []
+        band_per_kode = []
+        for kode in self.kode:
+            aturan = self.aturan[kode]
+            nilai = [_angka(row.get(aturan.kolom)) for row in rows]
+            arr = np.array([np.nan if x is None else x for x in nilai], dtype=float)
+            band = aturan.band(arr).tolist() if len(arr) else []
+            nilai_per_kode.append(nilai)
+            band_per_kode.append([None if x is None else b for x, b in zip(nilai, band)])
+
+        kontribusi: Dict[int, Kontribusi] = {}
+        agregat: Dict[Tuple[int, str], Agregat] = {}
+        for i, row in enumerate(rows):
+            k = Kontribusi(
+                id_periode=int(row['id_periode']),
+                status_validasi=row.get('status_validasi'),
+                kelas=kelas_dari_baris(row) or KELAS_KOSONG,
+                rerata_nilai=_angka(row.get('rerata_nilai')),
+                peringkat_kelas=_angka(row.get('peringkat_kelas')),
+                nilai=tuple(nilai[i] for nilai in nilai_per_kode),
+                band=tuple(band[i] for band in band_per_kode),
+            )
+            kontribusi[row['id_pendaftaran']] = k
+            self._tambah_ke(agregat, k, 1)
+        return kontribusi, agregat
+
+    def _tambah_ke(self, agregat: Dict[Tuple[int, str], Agregat], k: Kontribusi, tanda: int):
+        kunci = (k.id_periode, k.status_validasi)
+        bagian = agregat.get(kunci)
+        if bagian is None:
+            bagian = agregat[kunci] = Agregat(len(self.kode))
+        bagian.tambah(k, tanda)
+        if bagian.jumlah <= 0:
+            del agregat[kunci]
+
+    async def _ambil_semua_baris(self) -> List[dict]:
+        """Seluruh baris `pendaftaran`, per halaman terurut id sampai halaman terakhir yang tidak penuh."""
+        rows: List[dict] = []
+        while True:
+            response = await run_in_thread(self.client.table("pendaftaran")
+                                           .select(self._select())
+                                           .order("id_pendaftaran")
+                                           .range(len(rows), len(rows) + STATISTIK_HALAMAN - 1)
+                                           .execute)
+            rows.extend(response.data)
+            if len(response.data) < STATISTIK_HALAMAN:
+                return rows
+
+    async def _muat(self) -> Dict[Tuple[int, str], Agregat]:
+        async with self._kunci_muat:
+            if self._kontribusi is not None and not self._kedaluwarsa():
+                return self._agregat
+            versi_awal = self._versi
+            with span("statistik.muat"):
+                kontribusi, agregat = self._susun(await self._ambil_semua_baris())
+            # Sama seperti mesin peringkat: jika ada perubahan selama query berjalan,
+            # hasilnya hanya dipakai untuk panggilan ini dan tidak disimpan.
+            if self._versi == versi_awal:
+                self._kontribusi, self._agregat = kontribusi, agregat
+                self._dimuat_pada = time.monotonic()
+                logger.info("statistik dimuat", extra={"jumlah_pendaftar": len(kontribusi)})
+            return agregat
+
+    def _kedaluwarsa(self) -> bool:
+        return STATISTIK_TTL > 0 and time.monotonic() - self._dimuat_pada > STATISTIK_TTL
+
+    async def _ambil_agregat(self) -> Dict[Tuple[int, str], Agregat]:
+        if self._kontribusi is None or self._kedaluwarsa():
+            return await self._muat()
+        return self._agregat
+
+    def invalidasi(self):
+        """Membuang agregat; permintaan berikutnya membangunnya ulang dari database."""
+        self._versi += 1
+        self._kontribusi = None
+        self._agregat = {}
+
+    # --- Pembaruan inkremental ---
+
+    def _kontribusi_dari(self, row: dict, kelas: str) -> Kontribusi:
+        nilai = tuple(_angka(row.get(self.aturan[kode].kolom)) for kode in self.kode)
+        band = tuple(None if x is None else int(self.aturan[kode].band(x))
+                     for kode, x in zip(self.kode, nilai))
+        return Kontribusi(
+            id_periode=int(row['id_periode']),
+            status_validasi=row.get('status_validasi'),
+            kelas=kelas,
+            rerata_nilai=_angka(row.get('rerata_nilai')),
+            peringkat_kelas=_angka(row.get('peringkat_kelas')),
+            nilai=nilai,
+            band=band,
+        )
+
+    def _ganti(self, id_pendaftaran: int, baru: Optional[Kontribusi]):
+        lama = self._kontribusi.pop(id_pendaftaran, None)
+        if lama is not None:
+            self._tambah_ke(self._agregat, lama, -1)
+        if baru is not None:
+            self._kontribusi[id_pendaftaran] = baru
+            self._tambah_ke(self._agregat, baru, 1)
+
+    async def perbarui(self, row: dict):
+        """Menerapkan satu baris `pendaftaran` yang baru disimpan (insert atau perubahan status)."""
+        self._versi += 1
+        if self._kontribusi is None:
+            return
+        lama = self._kontribusi.get(row['id_pendaftaran'])
+        kelas = kelas_dari_baris(row) or (lama.kelas if lama else None)
+        if kelas is None:
+            # Pendaftaran baru: kelas siswanya belum diketahui, ambil sekali
+            response = await run_in_thread(self.client.table("siswa") \
+                .select("kelas(nama_kelas)") \
+                .eq("id_siswa", row['id_siswa']) \
+                .maybe_single() \
+                .execute)
+            kelas = kelas_dari_baris({"siswa": response.data}) if response and response.data else None
+            if self._kontribusi is None:
+                return
+        self._ganti(row['id_pendaftaran'], self._kontribusi_dari(row, kelas or KELAS_KOSONG))
+
+    def perbarui_banyak(self, rows: List[dict]):
+        """Menerapkan banyak baris `pendaftaran` yang sudah ada (mis. perubahan status massal)."""
+        self._versi += 1
+        if self._kontribusi is None:
+            return
+        for row in rows:
+            lama = self._kontribusi.get(row['id_pendaftaran'])
+            kelas = kelas_dari_baris(row) or (lama.kelas if lama else None)
+            if kelas is None:
+                # Baris yang belum pernah terlihat: agregat tidak bisa dipercaya lagi
+                self.invalidasi()
+                return
+            self._ganti(row['id_pendaftaran'], self._kontribusi_dari(row, kelas))
+
+    def hapus(self, id_pendaftaran: int):
+        """Mengurangkan kontribusi pendaftaran yang dihapus."""
+        self._versi += 1
+        if self._kontribusi is not None:
+            self._ganti(id_pendaftaran, None)
+
+    # --- Pembacaan ---
+
+    async def agregat(self, id_periode: Optional[int] = None, status_validasi: Optional[str] = None) -> Agregat:
+        """
+        Agregat gabungan untuk filter yang diminta. Biayanya sebanding dengan jumlah kelompok
+        (periode x status), bukan jumlah pendaftar.
+        """
+        hasil = Agregat(len(self.kode))
+        for (periode, status_validasi_kelompok), bagian in (await self._ambil_agregat()).items():
+            if id_periode is not None and periode != id_periode:
+                continue
+            if status_validasi is not None and status_validasi_kelompok != status_validasi:
+                continue
+            hasil.gabung(bagian)
+        return hasil
+
+    def distribusi(self, agregat: Agregat, kode: str) -> dict:
+        """Sebaran satu kriteria: ringkasan nilai mentah dan jumlah pendaftar di setiap band."""
+        j = self.kode.index(kode)
+        aturan = self.aturan[kode]
+        momen = agregat.kriteria[j]
+        return {
+            "kode": kode,
+            "kolom": aturan.kolom,
+            "jumlah": momen.n,
+            "rerata": momen.rerata,
+            "simpangan_baku": momen.simpangan_baku,
+            "band": [
+                {"label": label, "skor": float(skor), "jumlah": agregat.band[j].get(i, 0)}
+                for i, (label, skor) in enumerate(zip(aturan.label, aturan.tabel))
+            ],
+        }
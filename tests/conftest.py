@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Modul aplikasi berada di root repo (layout datar)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# calculate_saw membuat client Supabase saat diimpor; pengujian kernel tidak memakai jaringan,
+# jadi cukup nilai berformat valid bila env belum diset.
+os.environ.setdefault("SUPABASE_API_URL_DSS", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_API_KEY_DSS", "eyJhbGciOiJIUzI1NiJ9.e30.dGVzdA")
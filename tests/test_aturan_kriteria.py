@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from calculate_saw import ATURAN_KRITERIA, kompilasi_aturan
+
+OPERATOR = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+}
+
+ATURAN_UJI = {
+    '<': [{'op': '<', 'nilai': 10, 'skor': 1.0}, {'op': '<', 'nilai': 20, 'skor': 0.5}],
+    '<=': [{'op': '<=', 'nilai': 10, 'skor': 1.0}, {'op': '<=', 'nilai': 20, 'skor': 0.5}],
+    '>': [{'op': '>', 'nilai': 20, 'skor': 1.0}, {'op': '>', 'nilai': 10, 'skor': 0.5}],
+    '>=': [{'op': '>=', 'nilai': 20, 'skor': 1.0}, {'op': '>=', 'nilai': 10, 'skor': 0.5}],
+}
+
+
+def skor_np_select(aturan, nilai, default):
+    """Perilaku awal: aturan dicocokkan dari atas dengan np.select, NaN jatuh ke default."""
+    kondisi = [OPERATOR[item['op']](nilai, item['nilai']) for item in aturan]
+    return np.select(kondisi, [item['skor'] for item in aturan], default=default)
+
+
+@pytest.mark.parametrize("op", sorted(ATURAN_UJI))
+def test_skor_sama_dengan_np_select(op):
+    aturan = ATURAN_UJI[op]
+    nilai = np.array([np.nan, -1, 9, 10, 10.5, 19, 20, 21, np.nan, 100])
+    kompilasi = kompilasi_aturan('x', aturan, default=0.1)
+    np.testing.assert_array_equal(kompilasi.skor(nilai), skor_np_select(aturan, nilai, 0.1))
+
+
+@pytest.mark.parametrize("op", sorted(ATURAN_UJI))
+def test_nan_mendapat_skor_default(op):
+    kompilasi = kompilasi_aturan('x', ATURAN_UJI[op], default=0.0)
+    assert kompilasi.skor(np.array([np.nan])).tolist() == [0.0]
+
+
+@pytest.mark.parametrize("kode", sorted(ATURAN_KRITERIA))
+def test_nan_pada_aturan_kriteria_bawaan(kode):
+    aturan = ATURAN_KRITERIA[kode]
+    assert aturan.skor(np.array([np.nan, None], dtype=float)).tolist() == [aturan.default] * 2
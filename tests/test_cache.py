@@ -0,0 +1,25 @@
+from cache import LRUCache, TTLCache
+
+
+def test_lru_memanggil_saat_dibuang():
+    dibuang = []
+    cache = LRUCache(maxsize=2, saat_dibuang=lambda key, value: dibuang.append((key, value)))
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert dibuang == [('b', 2)]
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+
+
+def test_indeks_yang_dibuang_ikut_membuang_entri():
+    entri = TTLCache(maxsize=10, ttl=60)
+    indeks = LRUCache(maxsize=1, saat_dibuang=lambda key, kunci: [entri.pop(k) for k in kunci])
+    entri.set('x1', 'siswa 1')
+    indeks.set(1, {'x1'})
+    entri.set('x2', 'siswa 2')
+    indeks.set(2, {'x2'})
+
+    assert entri.get('x1') is None
+    assert entri.get('x2') == 'siswa 2'
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import database
+
+
+class PoolPenuh:
+    async def acquire(self, timeout=None):
+        raise asyncio.TimeoutError()
+
+
+def test_pool_penuh_menjadi_503(monkeypatch):
+    monkeypatch.setattr(database, "pool", PoolPenuh())
+
+    async def pinjam():
+        async for _ in database.get_db():
+            pass
+
+    with pytest.raises(HTTPException) as galat:
+        asyncio.run(pinjam())
+    assert galat.value.status_code == 503
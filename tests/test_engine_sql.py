@@ -0,0 +1,125 @@
+"""
+Kesetaraan engine SQL (`susun_query_saw`) dengan kernel numpy (`hitung_saw`).
+
+Membutuhkan Postgres dari `SUPABASE_DB_URL_DSS`; dilewati jika tidak diset. Tabel uji dibuat
+sebagai tabel TEMP yang menutupi tabel asli hanya di koneksi pengujian dan hilang saat koneksi ditutup.
+"""
+import os
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculate_saw import ATURAN_KRITERIA, hitung_saw, susun_query_saw
+
+asyncpg = pytest.importorskip("asyncpg")
+DATABASE_URL = os.getenv("SUPABASE_DB_URL_DSS")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="SUPABASE_DB_URL_DSS tidak diset")
+
+KRITERIA = pd.DataFrame({
+    'kode_kriteria': ['C1', 'C2', 'C3', 'C4', 'C5'],
+    'jenis': ['cost', 'cost', 'benefit', 'cost', 'benefit'],
+    'normalize_bobot': [0.3, 0.2, 0.2, 0.15, 0.15],
+})
+KOLOM = [ATURAN_KRITERIA[kode].kolom for kode in KRITERIA['kode_kriteria']]
+
+
+async def _jalankan_sql(rows):
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await conn.execute(f"""
+            CREATE TEMP TABLE siswa (id_siswa int PRIMARY KEY, nama_siswa text);
+            CREATE TEMP TABLE pendaftaran (
+                id_pendaftaran int PRIMARY KEY, id_siswa int, id_periode int, status_validasi text,
+                {", ".join(f"{k} int" for k in KOLOM)}
+            );
+        """)
+        await conn.executemany(
+            "INSERT INTO siswa VALUES ($1, $2)",
+            [(row['id_pendaftaran'], f"Siswa {row['id_pendaftaran']}") for row in rows]
+        )
+        await conn.executemany(
+            f"INSERT INTO pendaftaran VALUES ({', '.join(f'${i}' for i in range(1, len(KOLOM) + 5))})",
+            [(row['id_pendaftaran'], row['id_pendaftaran'], row['id_periode'], row['status_validasi'],
+              *(row[k] for k in KOLOM)) for row in rows]
+        )
+        periode = sorted({row['id_periode'] for row in rows})
+        return [dict(r) for r in await conn.fetch(susun_query_saw(KRITERIA), periode)]
+    finally:
+        await conn.close()
+
+
+def _hitung_numpy(rows):
+    """Peringkat per periode dari hitung_saw; baris diurutkan per id agar pemutus terakhir sama dengan SQL."""
+    hasil = []
+    for id_periode in sorted({row['id_periode'] for row in rows}):
+        valid = sorted((row for row in rows if row['id_periode'] == id_periode and row['status_validasi'] == 'valid'),
+                       key=lambda row: row['id_pendaftaran'])
+        mentah = np.array([[row[k] for k in KOLOM] for row in valid], dtype=float).reshape(len(valid), len(KOLOM))
+        nilai_akhir, peringkat = hitung_saw(mentah, KRITERIA)
+        hasil += sorted(
+            ({'id_periode': id_periode, 'id_pendaftaran': row['id_pendaftaran'],
+              'nilai_akhir': float(skor), 'peringkat': int(p)}
+             for row, skor, p in zip(valid, nilai_akhir, peringkat)),
+            key=lambda row: row['peringkat']
+        )
+    return hasil
+
+
+def _bandingkan(rows):
+    hasil_sql = asyncio.run(_jalankan_sql(rows))
+    hasil_numpy = _hitung_numpy(rows)
+    kunci = ['id_periode', 'id_pendaftaran', 'peringkat']
+    assert [tuple(r[k] for k in kunci) for r in hasil_sql] == [tuple(r[k] for k in kunci) for r in hasil_numpy]
+    np.testing.assert_allclose([r['nilai_akhir'] for r in hasil_sql],
+                               [r['nilai_akhir'] for r in hasil_numpy], rtol=0, atol=1e-12)
+
+
+def _buat_rows(n, seed, periode=(1,)):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'id_pendaftaran': i,
+            'id_periode': periode[i % len(periode)],
+            'status_validasi': 'valid' if i % 5 else 'belum divalidasi',
+            'penghasilan_orangtua': int(rng.integers(0, 3_000_000)),
+            'peringkat_kelas': int(rng.integers(1, 36)),
+            'jumlah_tanggungan': int(rng.integers(0, 8)),
+            'luas_rumah': int(rng.integers(20, 200)),
+            'rerata_nilai': int(rng.integers(30, 100)),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_data_acak_beberapa_periode():
+    _bandingkan(_buat_rows(300, seed=1, periode=(1, 2, 3)))
+
+
+def test_nilai_seri_diputus_kriteria_lalu_id():
+    # Rentang nilai sempit: banyak pendaftar jatuh ke band yang sama di semua kriteria
+    rows = _buat_rows(120, seed=2)
+    for row in rows:
+        row['penghasilan_orangtua'] = 400_000 if row['id_pendaftaran'] % 2 else 900_000
+        row['jumlah_tanggungan'] = 5
+    _bandingkan(rows)
+
+
+def test_maksimum_dan_minimum_nol():
+    rows = _buat_rows(60, seed=3)
+    for row in rows:
+        row['jumlah_tanggungan'] = 0        # benefit: semua skor 0, max = 0
+        row['penghasilan_orangtua'] = 5_000_000 if row['id_pendaftaran'] % 3 else 100_000  # cost: min = 0
+        row['luas_rumah'] = 500             # cost: semua skor 0
+    _bandingkan(rows)
+
+
+def test_kriteria_kosong():
+    rows = _buat_rows(80, seed=4)
+    for row in rows:
+        i = row['id_pendaftaran']
+        for j, kolom in enumerate(KOLOM):
+            if (i + j) % 4 == 0:
+                row[kolom] = None
+    _bandingkan(rows)
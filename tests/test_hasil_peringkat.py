@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculate_saw import ATURAN_KRITERIA, HasilPeringkat, PeringkatInkremental, hitung_saw, kompilasi_aturan
+
+KRITERIA = pd.DataFrame({
+    'kode_kriteria': ['C1', 'C2', 'C3', 'C4', 'C5'],
+    'jenis': ['cost', 'cost', 'benefit', 'cost', 'benefit'],
+    'normalize_bobot': [0.3, 0.2, 0.2, 0.15, 0.15],
+})
+KOLOM = [ATURAN_KRITERIA[kode].kolom for kode in KRITERIA['kode_kriteria']]
+
+
+def _baris_mentah(n, seed=0):
+    # Sedikit variasi nilai agar banyak pendaftar seri, termasuk di batas kuota
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(np.arange(1, n + 1)).tolist()
+    return [
+        {'id_pendaftaran': i, 'status_validasi': 'valid', 'nama_siswa': f"Siswa {i}",
+         **{k: int(v) for k, v in zip(KOLOM, rng.choice([0, 1_000_000, 3_000_000], size=len(KOLOM)))}}
+        for i in ids
+    ]
+
+
+def buat_mesin(n, seed=0):
+    mesin = PeringkatInkremental(KRITERIA)
+    mesin.muat_ulang(_baris_mentah(n, seed))
+    return mesin
+
+
+@pytest.mark.parametrize("kuota", [0, 1, 7, 40, 100])
+def test_peringkat_sama_dengan_mesin(kuota):
+    mesin = buat_mesin(40)
+    hasil = HasilPeringkat.dari_mesin(1, mesin, kuota)
+    semua = hasil.semua()
+
+    assert len(semua) == len(mesin)
+    assert [row['peringkat'] for row in semua] == list(range(1, len(mesin) + 1))
+    for row in semua:
+        assert mesin.peringkat(row['id_pendaftaran']) == row['peringkat']
+        direkomendasikan = row['peringkat'] <= kuota
+        assert row['status_rekomendasi'] == ('direkomendasikan' if direkomendasikan else 'tidak direkomendasikan')
+
+
+def test_sisa_hanya_dibentuk_saat_diminta():
+    dibaca = []
+    baris = buat_mesin(20).hasil()
+
+    def ambil(mulai=0, batas=None):
+        dibaca.append((mulai, batas))
+        return baris[mulai:batas]
+
+    hasil = HasilPeringkat(1, len(baris), 5, ambil)
+    assert dibaca == [(0, 5)]
+    assert len(hasil.rekomendasi) == 5
+
+    hasil.semua()
+    hasil.baris_database()
+    assert dibaca == [(0, 5), (5, None)]
+
+
+def test_potret_tidak_berubah_setelah_mesin_diperbarui():
+    mesin = buat_mesin(10)
+    hasil = HasilPeringkat.dari_mesin(1, mesin, 3)
+    sebelum = [row['id_pendaftaran'] for row in mesin.hasil()]
+    mesin.hapus(sebelum[-1])
+
+    assert [row['id_pendaftaran'] for row in hasil.semua()] == sebelum
+
+
+# Dua kriteria benefit; K2 berbobot lebih besar walaupun urutannya kedua
+ATURAN_SERI = {
+    kode: kompilasi_aturan(kolom, [{'op': '>=', 'nilai': 2, 'skor': 1.0}, {'op': '>=', 'nilai': 1, 'skor': 0.5}],
+                           default=0.25)
+    for kode, kolom in [('K1', 'a'), ('K2', 'b')]
+}
+KRITERIA_SERI = pd.DataFrame({'kode_kriteria': ['K1', 'K2'], 'jenis': ['benefit', 'benefit'],
+                              'normalize_bobot': [0.4, 0.6]})
+# id 1: R = (1.0, 0.5), id 2: R = (0.25, 1.0); keduanya bernilai akhir 0.7
+PENDAFTAR_SERI = [
+    {'id_pendaftaran': 1, 'status_validasi': 'valid', 'nama_siswa': 'A', 'a': 2, 'b': 1},
+    {'id_pendaftaran': 2, 'status_validasi': 'valid', 'nama_siswa': 'B', 'a': 0, 'b': 2},
+    {'id_pendaftaran': 3, 'status_validasi': 'valid', 'nama_siswa': 'C', 'a': 2, 'b': 2},
+]
+
+
+def test_nilai_seri_di_batas_kuota_diputus_kriteria_berbobot_terbesar():
+    mesin = PeringkatInkremental(KRITERIA_SERI, ATURAN_SERI)
+    mesin.muat_ulang(PENDAFTAR_SERI)
+    hasil = HasilPeringkat.dari_mesin(1, mesin, 2)
+
+    nilai = {row['id_pendaftaran']: row['nilai_akhir'] for row in hasil.semua()}
+    assert nilai[1] == nilai[2]
+    # id 2 lebih baik pada K2 (bobot terbesar), jadi menang walaupun id-nya lebih besar
+    assert [row['id_pendaftaran'] for row in hasil.rekomendasi] == [3, 2]
+    assert [row['id_pendaftaran'] for row in hasil.sisa()] == [1]
+    assert mesin.peringkat(2) == 2 and mesin.peringkat(1) == 3
+
+    mentah = np.array([[row['a'], row['b']] for row in PENDAFTAR_SERI], dtype=float)
+    _, peringkat = hitung_saw(mentah, KRITERIA_SERI, ATURAN_SERI)
+    assert peringkat.tolist() == [3, 2, 1]
+
+
+def test_jalur_inkremental_sama_dengan_hitung_penuh():
+    penuh = buat_mesin(60, seed=3)
+    inkremental = PeringkatInkremental(KRITERIA)
+    baris = _baris_mentah(60, seed=3)
+    inkremental.muat_ulang(baris[:30])
+    for row in baris[30:]:
+        inkremental.upsert(row)
+
+    assert [row['id_pendaftaran'] for row in inkremental.hasil()] == [row['id_pendaftaran'] for row in penuh.hasil()]
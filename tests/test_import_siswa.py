@@ -0,0 +1,35 @@
+import pandas as pd
+
+from main import validasi_data_import
+
+
+def buat_baris(**ubah):
+    row = {'id_kelas': 1, 'nis': '11', 'nisn': '0000000011', 'nik': '0000000000000011',
+           'nama_siswa': 'Siswa', 'tanggal_lahir': '2008-01-02'}
+    row.update(ubah)
+    return row
+
+
+def test_baris_valid():
+    df, pesan = validasi_data_import(pd.DataFrame([buat_baris()]), {1})
+    assert pesan.tolist() == ['']
+    assert df['id_kelas'].tolist() == [1]
+
+
+def test_id_kelas_pecahan_menjadi_error_per_baris():
+    df = pd.DataFrame([
+        buat_baris(),
+        buat_baris(id_kelas=1.5, nisn='0000000012', nik='0000000000000012'),
+        buat_baris(id_kelas='2.0', nisn='0000000013', nik='0000000000000013'),
+        buat_baris(id_kelas='abc', nisn='0000000014', nik='0000000000000014'),
+    ])
+    df, pesan = validasi_data_import(df, {1, 2})
+
+    wajib = "Kolom 'id_kelas' wajib diisi dengan nilai yang valid."
+    assert pesan.tolist() == ['', wajib, '', wajib]
+    assert df['id_kelas'].iloc[2] == 2
+
+
+def test_id_kelas_tidak_terdaftar():
+    _, pesan = validasi_data_import(pd.DataFrame([buat_baris(id_kelas=9)]), {1})
+    assert pesan.tolist() == ["id_kelas tidak ditemukan."]
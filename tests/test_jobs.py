@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+from jobs import Job, JobManager, MemoryJobStore, SqliteJobStore
+
+
+def buat_job(kunci, klaim=None, umur=0.0):
+    waktu = datetime.now() - timedelta(seconds=umur)
+    return Job(id=f"job-{kunci}-{umur}", jenis="uji", kunci=kunci, klaim=klaim or [kunci],
+               dibuat=waktu, diperbarui=waktu)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buat_store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryJobStore()
+        return lambda: store
+    # Setiap pemanggilan membuka koneksi baru ke file yang sama, seperti worker yang berbeda
+    return lambda: SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_klaim_yang_sama_hanya_satu(buat_store):
+    batas = datetime.now() - timedelta(seconds=60)
+    pertama = buat_job("rank:1")
+    assert buat_store().klaim(pertama, batas) is None
+    assert buat_store().klaim(buat_job("rank:1", umur=1), batas).id == pertama.id
+
+
+def test_job_banyak_periode_bentrok_dengan_satu_periode(buat_store):
+    batas = datetime.now() - timedelta(seconds=60)
+    banyak = buat_job("rank:1,2", klaim=["rank:1", "rank:2"])
+    assert buat_store().klaim(banyak, batas) is None
+    assert buat_store().klaim(buat_job("rank:2"), batas).id == banyak.id
+    assert buat_store().klaim(buat_job("rank:3"), batas) is None
+
+
+def test_pemegang_basi_dihentikan(buat_store):
+    lama = buat_job("rank:1", umur=120)
+    store = buat_store()
+    assert store.klaim(lama, datetime.now() - timedelta(seconds=600)) is None
+
+    baru = buat_job("rank:1")
+    assert store.klaim(baru, datetime.now() - timedelta(seconds=60)) is None
+    assert store.ambil(lama.id).status == "gagal"
+    assert store.aktif_untuk("rank:1").id == baru.id
+
+
+def test_klaim_dilepas_setelah_selesai(buat_store):
+    batas = datetime.now() - timedelta(seconds=60)
+    store = buat_store()
+    job = buat_job("rank:1", klaim=["rank:1", "rank:2"])
+    store.klaim(job, batas)
+    job.status = "selesai"
+    store.simpan(job)
+
+    assert store.aktif_untuk("rank:1") is None
+    assert store.klaim(buat_job("rank:2"), batas) is None
+
+
+def test_heartbeat_menyegarkan_job_berjalan(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT", 0.01)
+
+    async def jalankan():
+        manager = JobManager(MemoryJobStore())
+        job = manager.submit("uji", "rank:1", lambda lapor: asyncio.sleep(0.1, result={}))
+        mulai = manager.ambil(job.id).diperbarui
+        await asyncio.sleep(0.05)
+        masih_berjalan = manager.ambil(job.id)
+        assert masih_berjalan.status == "berjalan" and masih_berjalan.diperbarui > mulai
+        return await manager.tunggu(job.id)
+
+    assert asyncio.run(jalankan()).status == "selesai"
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import main as app_main
+
+
+class QueryUji:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, kolom):
+        return self
+
+    def in_(self, kolom, nilai):
+        self.rows = [row for row in self.rows if row[kolom] in nilai]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+
+def pasang_tiruan(monkeypatch):
+    dipanggil = []
+    detail = [{'id_pendaftaran': 1, 'penghasilan_orangtua': 1, 'jumlah_tanggungan': 1, 'luas_rumah': 1,
+               'rerata_nilai': 80, 'peringkat_kelas': 1, 'siswa': {'kelas': {'nama_kelas': 'XII-1'}}}]
+
+    async def main_uji(id_periode, muat_ulang=False):
+        dipanggil.append(muat_ulang)
+        baris = [{'id_pendaftaran': 1, 'nama_siswa': 'A', 'nilai_akhir': 0.5,
+                  'status_rekomendasi': 'direkomendasikan'}]
+        return SimpleNamespace(semua=lambda: baris)
+
+    async def tanpa_snapshot(id_periode):
+        return None
+
+    monkeypatch.setattr(app_main, "main", main_uji)
+    monkeypatch.setattr(app_main, "get_rank_snapshot", tanpa_snapshot)
+    monkeypatch.setattr(app_main, "supabase", SimpleNamespace(table=lambda nama: QueryUji(detail)))
+    monkeypatch.setattr(app_main, "rank_cache", app_main.TTLCache(maxsize=8, ttl=60))
+    return dipanggil
+
+
+def test_fresh_membangun_ulang_mesin_setiap_kali(monkeypatch):
+    dipanggil = pasang_tiruan(monkeypatch)
+
+    for _ in range(2):
+        hasil = asyncio.run(app_main.get_rank_beasiswa(id_periode=1, fresh=True))
+        assert [item.skor for item in hasil] == [0.5]
+    assert dipanggil == [True, True]
+
+
+def test_tanpa_fresh_memakai_mesin_dan_cache(monkeypatch):
+    dipanggil = pasang_tiruan(monkeypatch)
+
+    for _ in range(2):
+        asyncio.run(app_main.get_rank_beasiswa(id_periode=1, fresh=False))
+    assert dipanggil == [False]
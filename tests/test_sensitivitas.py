@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from calculate_saw import analisis_sensitivitas, hitung_inversi
+
+
+def inversi_brute(p):
+    return sum(p[i] > p[j] for i, j in itertools.combinations(range(len(p)), 2))
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7, 8, 33, 100])
+def test_hitung_inversi_sama_dengan_brute_force(n):
+    rng = np.random.default_rng(n)
+    p = np.array([rng.permutation(n) for _ in range(5)] + [np.arange(n), np.arange(n)[::-1]])
+    assert hitung_inversi(p).tolist() == [inversi_brute(baris) for baris in p]
+    assert hitung_inversi(p)[-1] == n * (n - 1) // 2
+
+
+def test_sensitivitas_perturbasi_bobot_yang_diketahui():
+    # Skor dengan bobot dasar (0.7, 0.3): A 0.70, D 0.69, C 0.50, B 0.30
+    matriks_r = np.array([[1.0, 0.0], [0.0, 1.0], [0.5, 0.5], [0.9, 0.2]])
+    bobot_dasar = np.array([0.7, 0.3])
+    # dasar; A dan D bertukar tempat; urutan terbalik seluruhnya
+    matriks_bobot = np.array([[0.7, 0.6, 0.0], [0.3, 0.4, 1.0]])
+
+    urutan_dasar, urutan, tau = analisis_sensitivitas(matriks_r, bobot_dasar, matriks_bobot)
+
+    assert urutan_dasar.tolist() == [0, 3, 2, 1]
+    assert urutan.tolist() == [[0, 3, 2, 1], [3, 0, 2, 1], [1, 2, 3, 0]]
+    # Satu dari enam pasangan berbalik: tau = 1 - 4 * 1 / (4 * 3)
+    assert tau == pytest.approx([1.0, 2 / 3, -1.0])
+
+
+def test_kendall_tau_sama_dengan_hitungan_pasangan():
+    rng = np.random.default_rng(7)
+    matriks_r = rng.random((50, 4))
+    bobot_dasar = np.full(4, 0.25)
+    matriks_bobot = rng.dirichlet(np.ones(4), size=6).T
+
+    _, _, tau = analisis_sensitivitas(matriks_r, bobot_dasar, matriks_bobot)
+
+    dasar = matriks_r @ bobot_dasar
+    for j in range(matriks_bobot.shape[1]):
+        skenario = matriks_r @ matriks_bobot[:, j]
+        tanda = [np.sign(dasar[a] - dasar[b]) * np.sign(skenario[a] - skenario[b])
+                 for a, b in itertools.combinations(range(len(dasar)), 2)]
+        assert tau[j] == pytest.approx(np.mean(tanda))
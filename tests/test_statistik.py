@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+import statistik
+from statistik import StatistikPendaftaran
+
+MAX_ROWS = 1000
+
+
+class QueryUji:
+    """Tiruan query PostgREST: select dipotong pada MAX_ROWS seperti Supabase."""
+
+    def __init__(self, rows, dipanggil):
+        self.rows = rows
+        self.dipanggil = dipanggil
+        self.awal, self.akhir = 0, None
+
+    def select(self, kolom):
+        return self
+
+    def order(self, kolom):
+        self.rows = sorted(self.rows, key=lambda row: row[kolom])
+        return self
+
+    def range(self, awal, akhir):
+        self.awal, self.akhir = awal, akhir
+        return self
+
+    def execute(self):
+        self.dipanggil.append((self.awal, self.akhir))
+        akhir = len(self.rows) if self.akhir is None else self.akhir + 1
+        return SimpleNamespace(data=self.rows[self.awal:akhir][:MAX_ROWS])
+
+
+class ClientUji:
+    def __init__(self, rows):
+        self.rows = rows
+        self.dipanggil = []
+
+    def table(self, nama):
+        return QueryUji(self.rows, self.dipanggil)
+
+
+def buat_baris(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'id_pendaftaran': i, 'id_siswa': i, 'id_periode': 1 + i % 2,
+            'status_validasi': 'valid' if i % 3 else 'belum divalidasi',
+            'rerata_nilai': int(rng.integers(60, 100)), 'peringkat_kelas': int(rng.integers(1, 30)),
+            'penghasilan_orangtua': int(rng.integers(0, 5_000_000)), 'jumlah_tanggungan': int(rng.integers(0, 6)),
+            'luas_rumah': int(rng.integers(20, 200)),
+            'siswa': {'kelas': {'nama_kelas': f"XII-{i % 4}"}},
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_memuat_lebih_dari_max_rows(monkeypatch):
+    monkeypatch.setattr(statistik, "STATISTIK_HALAMAN", MAX_ROWS)
+    rows = buat_baris(2500)
+    client = ClientUji(rows)
+    stat = StatistikPendaftaran(client)
+
+    semua = asyncio.run(stat.agregat())
+    assert semua.jumlah == len(rows)
+    assert len(client.dipanggil) == 3
+    assert abs(semua.rerata_nilai.rerata - np.mean([row['rerata_nilai'] for row in rows])) < 1e-9
+
+    periode_1 = asyncio.run(stat.agregat(id_periode=1, status_validasi='valid'))
+    assert periode_1.jumlah == sum(r['id_periode'] == 1 and r['status_validasi'] == 'valid' for r in rows)
+
+
+def test_halaman_penuh_terakhir_diikuti_halaman_kosong(monkeypatch):
+    monkeypatch.setattr(statistik, "STATISTIK_HALAMAN", MAX_ROWS)
+    client = ClientUji(buat_baris(2000))
+    assert asyncio.run(StatistikPendaftaran(client).agregat()).jumlah == 2000
+    assert len(client.dipanggil) == 3